@@ -0,0 +1,5 @@
+"""
+Benchmarks of the library hot paths (pagination, CLI helpers, restore id remapping and
+inventory matching, end-to-end backup/restore against mlib.simulator).
+Run them from the repository root with "python3 -m benchmarks.run" (see benchmarks/run.py).
+"""
@@ -0,0 +1,347 @@
+"""
+Benchmark cases. Each case is a context manager called with the scale of the datasets:
+it prepares the data (not measured), yields the parameters of the benchmark and the
+function to measure, and cleans up when the benchmark is done.
+
+At scale 1, the datasets have 10k sites, 100k devices and 1M clients (the end-to-end
+backup/restore cases use 1000 sites, as every object is sent through HTTP).
+"""
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import uuid
+from collections import deque
+
+import mlib
+from mlib import cli
+from mlib.__req import Req
+from mlib.__response import MistResponse, dump_json
+from mlib.backup import load as load_backup, open_writer
+from mlib.cassette import Cassette, _key
+from mlib.container import Container
+from mlib.download import Downloader
+from mlib.simulator import MistSimulator
+
+import org_conf_backup
+import org_conf_restore
+import org_inventory_backup
+import org_inventory_restore
+
+from . import datasets
+
+SITES = 10000
+DEVICES = 100000
+CLIENTS = 1000000
+E2E_SITES = 1000
+
+CASES = {}
+
+
+def case(function):
+    CASES[function.__name__] = contextlib.contextmanager(function)
+    return function
+
+
+def _count(base, scale):
+    return max(1, int(base * scale))
+
+
+@contextlib.contextmanager
+def _in_temp_dir():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="mlib_bench_") as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            yield temp_dir
+        finally:
+            os.chdir(cwd)
+
+
+def _simulator_session(simulator):
+    return mlib.Mist_Session(host=simulator.host, scheme="http", apitoken=simulator.apitoken, load_settings=False, requests_per_hour=None)
+
+
+######## PAGINATED GET ########
+
+def _paginated_get(items, uri):
+    """Replay a paginated list from a cassette, to measure the pages assembly of
+    Req.mist_get without the network"""
+    limit = 100
+    req = Req()
+    req.host = "bench.local"
+    req.rate_limiter = None
+    interactions = {}
+    total = len(items)
+    for page in range(1, -(-total // limit) + 1):
+        url = req._get_url(uri, {}, page, limit)
+        interactions[_key("GET", url)] = [{
+            "method": "GET",
+            "url": url,
+            "status_code": 200,
+            "headers": {"Content-Type": "application/json", "X-Page-Limit": str(limit), "X-Page-Page": str(page), "X-Page-Total": str(total)},
+            "body": json.dumps(items[(page - 1) * limit:page * limit]),
+            "elapsed": 0,
+        }]
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        cassette_file = f.name
+    req.cassette = Cassette.replay(cassette_file)
+
+    def run():
+        # the cassette returns each response once
+        req.cassette.interactions = {key: deque(value) for key, value in interactions.items()}
+        result = req.mist_get(uri)["result"]
+        assert len(result) == total
+
+    try:
+        yield {"items": total, "pages": len(interactions)}, run
+    finally:
+        os.remove(cassette_file)
+
+
+@case
+def mist_get_sites(scale):
+    sites = datasets.sites(_count(SITES, scale))
+    yield from _paginated_get(sites, "/api/v1/orgs/%s/sites" % sites[0]["org_id"])
+
+
+@case
+def mist_get_devices(scale):
+    sites = datasets.sites(_count(SITES, scale))
+    devices = datasets.devices(_count(DEVICES, scale), sites)
+    yield from _paginated_get(devices, "/api/v1/orgs/%s/inventory" % sites[0]["org_id"])
+
+
+def _device_pages(scale):
+    sites = datasets.sites(_count(SITES, scale))
+    devices = datasets.devices(_count(DEVICES, scale), sites)
+    return [json.dumps(devices[index:index + 100]).encode() for index in range(0, len(devices), 100)], len(devices)
+
+
+@case
+def save_decoded(scale):
+    """Save a paginated result to a file by decoding and encoding it again"""
+    bodies, total = _device_pages(scale)
+    with _in_temp_dir():
+
+        def run():
+            response = MistResponse(200, "", list(bodies), {"X-Page-Limit": "100"})
+            with open("devices.json", "w") as f:
+                json.dump(response["result"], f)
+
+        yield {"items": total, "pages": len(bodies)}, run
+
+
+@case
+def save_raw(scale):
+    """Save a paginated result to a file as received from the API"""
+    bodies, total = _device_pages(scale)
+    with _in_temp_dir():
+
+        def run():
+            response = MistResponse(200, "", list(bodies), {"X-Page-Limit": "100"})
+            with open("devices.json", "w") as f:
+                dump_json(response.raw_result(), f)
+
+        yield {"items": total, "pages": len(bodies)}, run
+
+
+######## CLI ########
+
+@case
+def extract_field(scale):
+    count = _count(CLIENTS, scale)
+    # the rows are taken from a pool of distinct clients, to keep the memory low
+    pool = datasets.clients(min(count, 10000))
+    fields = ["mac", "hostname", "os.name", "stats.tx_bytes", "location.map_id"]
+
+    def run():
+        for row in itertools.islice(itertools.cycle(pool), count):
+            for field in fields:
+                cli.extract_field(row, field)
+
+    yield {"rows": count, "fields": len(fields)}, run
+
+
+@case
+def save_to_csv(scale):
+    sites = datasets.sites(_count(SITES, scale))
+    devices = datasets.devices(_count(DEVICES, scale), sites)
+    fields = ["id", "name", "mac", "serial", "model", "site_id", "x", "y"]
+    rows = [[str(device[field]) for field in fields] for device in devices]
+    with _in_temp_dir():
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                cli.save_to_csv("devices.csv", rows, fields)
+
+        yield {"rows": len(rows), "fields": len(fields)}, run
+
+
+@case
+def show(scale):
+    sites = datasets.sites(_count(SITES, scale))
+    response = {"result": sites}
+
+    def run():
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                cli.show(response)
+
+    yield {"rows": len(sites)}, run
+
+
+######## RESTORE ########
+
+@case
+def replace_id(scale):
+    sites = datasets.sites(_count(SITES, scale))
+    devices = datasets.devices(_count(DEVICES, scale), sites)
+    old_ids = [device["id"] for device in devices]
+    new_ids = {old_id: str(uuid.uuid4()) for old_id in old_ids}
+
+    def run():
+        org_conf_restore._replace_id(old_ids, new_ids)
+        for old_id in old_ids:
+            org_conf_restore._replace_id(old_id, new_ids)
+
+    yield {"ids": len(old_ids)}, run
+
+
+@case
+def inventory_match(scale):
+    """Restore the devices of some sites, each device being matched with the org
+    inventory of the source org"""
+    sites = datasets.sites(_count(SITES, scale))
+    devices = datasets.devices(_count(DEVICES, scale), sites)
+    inventory = datasets.inventory(devices)
+    restored_sites = _count(100, scale)
+    site_devices = {}
+    for device in devices:
+        if device["site_id"] in site_devices or len(site_devices) < restored_sites:
+            site_devices.setdefault(device["site_id"], []).append(device)
+    with MistSimulator() as simulator, _in_temp_dir():
+        dest_org = simulator.seed(orgs=1, sites=restored_sites, devices=0, maps=0, wlans=0, org_wlans=0, templates=0)[0]
+        dest_sites = list(simulator.store.collections["/api/v1/orgs/%s/sites" % dest_org["id"]].values())
+        mist_session = _simulator_session(simulator)
+
+        def run():
+            for (site_id, site_device_list), dest_site in zip(site_devices.items(), dest_sites):
+                org_inventory_restore._restore_devices(
+                    mist_session, sites[0]["org_id"], dest_org["id"], dest_site["id"], dest_site["name"],
+                    {}, {}, [dict(device) for device in site_device_list], inventory, None
+                )
+
+        yield {"sites": len(site_devices), "devices": sum(len(value) for value in site_devices.values()), "inventory": len(inventory)}, run
+
+
+def _inventory_backup(scale):
+    # org_inventory_backup.py backup of the datasets
+    sites = datasets.sites(_count(SITES, scale))
+    devices = datasets.devices(_count(DEVICES, scale), sites)
+    org = {"id": sites[0]["org_id"], "sites": {}, "sites_ids": {}, "sites_names": [], "deviceprofiles_ids": {}, "inventory": datasets.inventory(devices)}
+    site_names = {}
+    for site in sites:
+        org["sites"][site["name"]] = {"id": site["id"], "maps_ids": {}, "devices": []}
+        org["sites_ids"][site["name"]] = {"old_id": site["id"]}
+        org["sites_names"].append(site["name"])
+        site_names[site["id"]] = site["name"]
+    for device in devices:
+        org["sites"][site_names[device["site_id"]]]["devices"].append(device)
+    return {"org": org}
+
+
+@case
+def load_site_json(scale):
+    """Load one site of an inventory backup saved as a single JSON file"""
+    backup = _inventory_backup(scale)
+    site_name = backup["org"]["sites_names"][-1]
+    with _in_temp_dir():
+        with open("org_inventory_file.json", "w") as f:
+            json.dump(backup, f)
+
+        def run():
+            with open("org_inventory_file.json") as f:
+                site = json.load(f)["org"]["sites"][site_name]
+
+        yield {"sites": len(backup["org"]["sites"]), "size": os.path.getsize("org_inventory_file.json")}, run
+
+
+@case
+def load_site_container(scale):
+    """Load one site (and the org sections) of an inventory backup saved as a container"""
+    backup = _inventory_backup(scale)
+    site_name = backup["org"]["sites_names"][-1]
+    with _in_temp_dir():
+        with contextlib.redirect_stdout(io.StringIO()):
+            org_inventory_backup._save_to_file(org_inventory_backup.backup_file, backup)
+
+        def run():
+            with Container(org_inventory_backup.backup_file) as container:
+                site = container.org()["sites"][site_name]
+
+        yield {"sites": len(backup["org"]["sites"]), "size": os.path.getsize(org_inventory_backup.backup_file)}, run
+
+
+######## END TO END ########
+
+def _backup(mist_session, org, incremental=False):
+    with Downloader(mist_session, org_conf_backup.download_workers) as downloader:
+        # no full backup between the incremental backups of the benchmark
+        with open_writer(org_conf_backup.backup_file, incremental, full_interval=sys.maxsize) as writer:
+            org_conf_backup._backup_full_org(mist_session, downloader, writer, org["id"], org["name"])
+
+
+@case
+def backup_e2e(scale):
+    """Backup an org from the local simulator"""
+    sites = _count(E2E_SITES, scale)
+    with MistSimulator() as simulator, _in_temp_dir():
+        org = simulator.seed(orgs=1, sites=sites)[0]
+        mist_session = _simulator_session(simulator)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                _backup(mist_session, org)
+
+        yield {"sites": sites}, run
+
+
+@case
+def backup_incremental_e2e(scale):
+    """Incremental backup of an unchanged org from the local simulator, after a full
+    backup"""
+    sites = _count(E2E_SITES, scale)
+    with MistSimulator() as simulator, _in_temp_dir():
+        org = simulator.seed(orgs=1, sites=sites)[0]
+        mist_session = _simulator_session(simulator)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _backup(mist_session, org)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                _backup(mist_session, org, incremental=True)
+
+        yield {"sites": sites}, run
+
+
+@case
+def restore_e2e(scale):
+    """Restore the backup of an org into a new org of the local simulator"""
+    sites = _count(E2E_SITES, scale)
+    with MistSimulator() as simulator, _in_temp_dir():
+        org = simulator.seed(orgs=1, sites=sites)[0]
+        mist_session = _simulator_session(simulator)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _backup(mist_session, org)
+
+        def run():
+            dest_org = simulator.seed(orgs=1, sites=0, org_wlans=0, templates=0)[0]
+            # the sites are read from the backup file during the restore
+            backup = load_backup(org_conf_backup.backup_file)
+            org_conf_restore._restore_org(mist_session, dest_org["id"], dest_org["name"], backup.org)
+
+        yield {"sites": sites}, run
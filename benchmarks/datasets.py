@@ -0,0 +1,95 @@
+"""
+Synthetic datasets shaped like the Mist API objects. The datasets are generated with a
+seeded random generator, so every run uses the same data.
+"""
+import random
+import uuid
+
+MODELS = ["AP41", "AP43", "AP32", "AP33", "AP12", "AP63"]
+
+
+def _uuid(rand):
+    return str(uuid.UUID(int=rand.getrandbits(128), version=4))
+
+
+def sites(count, org_id=None, seed=1):
+    rand = random.Random(seed)
+    if org_id == None:
+        org_id = _uuid(rand)
+    result = []
+    for index in range(count):
+        result.append({
+            "id": _uuid(rand),
+            "name": "Site %s" % index,
+            "org_id": org_id,
+            "timezone": "Europe/Paris",
+            "country_code": rand.choice(["FR", "US", "GB", "DE"]),
+            "address": "%s Benchmark Street" % index,
+            "latlng": {"lat": rand.uniform(-90, 90), "lng": rand.uniform(-180, 180)},
+            "rftemplate_id": None,
+            "sitegroup_ids": [],
+            "created_time": 1600000000 + index,
+            "modified_time": 1600000000 + index,
+        })
+    return result
+
+
+def devices(count, site_list, seed=2):
+    """Return: list of devices, spread over the sites of site_list"""
+    rand = random.Random(seed)
+    result = []
+    for index in range(count):
+        site = site_list[index % len(site_list)]
+        result.append({
+            "id": _uuid(rand),
+            "mac": "5c5b35%06x" % (index % 0xffffff),
+            "serial": "A%011d" % index,
+            "model": rand.choice(MODELS),
+            "type": "ap",
+            "name": "AP %s" % index,
+            "site_id": site["id"],
+            "org_id": site["org_id"],
+            "map_id": None,
+            "deviceprofile_id": None,
+            "x": rand.randint(0, 1000),
+            "y": rand.randint(0, 800),
+            "created_time": 1600000000 + index,
+            "modified_time": 1600000000 + index,
+        })
+    return result
+
+
+def inventory(device_list):
+    """Return: org inventory entries of the devices"""
+    result = []
+    for device in device_list:
+        result.append({
+            "id": device["id"],
+            "mac": device["mac"],
+            "serial": device["serial"],
+            "model": device["model"],
+            "type": "ap",
+            "magic": device["serial"] + "MAGIC",
+            "site_id": device["site_id"],
+            "org_id": device["org_id"],
+            "connected": True,
+        })
+    return result
+
+
+def clients(count, seed=3):
+    """Return: list of wireless clients, with nested fields"""
+    rand = random.Random(seed)
+    result = []
+    for index in range(count):
+        result.append({
+            "mac": "%012x" % index,
+            "hostname": "client-%s" % index,
+            "ip": "10.%s.%s.%s" % (index >> 16 & 255, index >> 8 & 255, index & 255),
+            "ssid": rand.choice(["Corp", "Guest", "IoT"]),
+            "band": rand.choice(["24", "5", "6"]),
+            "rssi": rand.randint(-90, -30),
+            "os": {"name": rand.choice(["iOS", "Android", "Windows", "macOS"]), "version": "%s" % rand.randint(1, 15)},
+            "stats": {"tx_bytes": rand.getrandbits(32), "rx_bytes": rand.getrandbits(32)},
+        })
+    return result
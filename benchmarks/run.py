@@ -0,0 +1,139 @@
+"""
+Run the benchmarks, and append the results (wall-clock time and peak memory) to a JSON
+lines file, so they can be compared over time. Each result is compared with the previous
+result of the same benchmark and parameters.
+
+    python3 -m benchmarks.run                       # all the benchmarks, at scale 1
+    python3 -m benchmarks.run --scale 0.1 show      # 1k sites
+    python3 -m benchmarks.run --check 0.2           # exit 1 if a benchmark is 20% slower
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+from mlib.__debug import configure
+
+from .cases import CASES
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(RESULTS_FILE)).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _load_results(results_file):
+    results = []
+    if os.path.isfile(results_file):
+        with open(results_file) as f:
+            for line in f:
+                if line.strip():
+                    results.append(json.loads(line))
+    return results
+
+
+def _previous(results, name, params):
+    for result in reversed(results):
+        if result["name"] == name and result["params"] == params:
+            return result
+    return None
+
+
+def measure(name, scale=1, repeat=1, memory=True):
+    """Run a benchmark
+    Params: benchmark name, scale of the datasets, number of measured runs, measure the
+        peak memory (with an additional run, as tracemalloc slows down the code)
+    Return: result dict"""
+    with CASES[name](scale) as (params, run):
+        walls = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            walls.append(time.perf_counter() - start)
+        peak = None
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return {
+        "name": name,
+        "params": params,
+        "wall": min(walls),
+        "peak_memory": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="mlib benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default to all): %s" % ", ".join(CASES))
+    parser.add_argument("--scale", type=float, default=1, help="scale of the datasets (default 1: 10k sites, 100k devices, 1M clients)")
+    parser.add_argument("--repeat", type=int, default=1, help="number of measured runs, the best one is kept")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure the peak memory")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON lines file where the results are appended")
+    parser.add_argument("--no-save", action="store_true", help="do not save the results")
+    parser.add_argument("--check", type=float, default=None, metavar="RATIO", help="exit with 1 if a benchmark is slower than its previous result by more than RATIO (e.g. 0.2)")
+    parser.add_argument("--verbose", action="store_true", help="display the mlib logs")
+    args = parser.parse_args(argv)
+
+    for name in args.names:
+        if not name in CASES:
+            parser.error("unknown benchmark %s" % name)
+    if not args.verbose:
+        configure(stream=None)
+
+    previous_results = _load_results(args.results)
+    run_info = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "scale": args.scale,
+    }
+    table = []
+    regressions = []
+    for name in args.names or list(CASES):
+        result = dict(run_info)
+        result.update(measure(name, args.scale, args.repeat, not args.no_memory))
+        previous = _previous(previous_results, name, result["params"])
+        change = ""
+        if previous != None and previous["wall"] > 0:
+            ratio = result["wall"] / previous["wall"] - 1
+            change = "%+.1f%%" % (ratio * 100)
+            if args.check != None and ratio > args.check:
+                regressions.append(name)
+        if result["peak_memory"] == None:
+            memory = ""
+        else:
+            memory = "%.1f" % (result["peak_memory"] / 1024 / 1024)
+        table.append([name, json.dumps(result["params"]), "%.3f" % result["wall"], memory, change])
+        print("%s: %.3fs %s" % (name, result["wall"], change), flush=True)
+        if not args.no_save:
+            with open(args.results, "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+    print()
+    print(tabulate(table, ["benchmark", "params", "wall (s)", "peak memory (MB)", "vs previous"]))
+    if regressions:
+        print("\nslower than the previous results: %s" % ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
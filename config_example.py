@@ -31,6 +31,11 @@ OTHER
 Log level: you can define the log level displayed on the console with the following variable (default 
 is 6):
 log_level = 6
+Logs can also be written to a file as JSON lines (one JSON object per message):
+log_json_file = "./mlib_logs.jsonl"
+And the logs can be written by a background thread, so the scripts never wait for the console
+or the log file:
+log_queue = True
 
 ------ 
 COMPLETE EXAMPLE
@@ -0,0 +1,130 @@
+import fnmatch
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from .__uri import route_template
+
+# Time to live (in seconds) of the cached responses, by templated API path.
+# Only the GET requests matching one of these patterns are cached.
+DEFAULT_TTLS = {
+    "/api/v1/const/*": 86400,
+    "/api/v1/orgs/{id}": 3600,
+    "/api/v1/orgs/{id}/sites": 300,
+    "/api/v1/orgs/{id}/templates": 300,
+    "/api/v1/orgs/{id}/templates/{id}": 300,
+}
+
+# headers stored with the cached responses
+_STORED_HEADERS = ["Content-Type", "ETag", "Last-Modified", "X-Page-Limit", "X-Page-Page", "X-Page-Total"]
+
+
+class ResponseCache:
+    """Persistent cache of the GET responses, stored in a SQLite file.
+
+    Cached responses are used as long as their TTL is not expired. Once expired, if the
+    server returned an ETag or Last-Modified header, the next request is sent as a
+    conditional request, and a 304 response only refreshes the cached entry.
+    """
+
+    def __init__(self, file_path, ttls=None):
+        """Params:
+            file_path: SQLite file (":memory:" for a non persistent cache)
+            ttls: dict of {templated path pattern: TTL in seconds}, see DEFAULT_TTLS"""
+        if ttls == None:
+            ttls = DEFAULT_TTLS
+        self.ttls = ttls
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(file_path, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            path TEXT,
+            status_code INTEGER,
+            headers TEXT,
+            body BLOB,
+            stored_at REAL,
+            ttl REAL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_path ON responses (path)")
+        self.db.commit()
+
+    def ttl(self, url):
+        """Return: TTL of the url, or None if the url must not be cached"""
+        template = route_template(urlsplit(url).path)
+        for pattern, ttl in self.ttls.items():
+            if fnmatch.fnmatchcase(template, pattern):
+                return ttl
+        return None
+
+    def get(self, url):
+        """Return: (requests response, fresh) or (None, False) if the url is not cached"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status_code, headers, body, stored_at, ttl FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row == None:
+            return (None, False)
+        status_code, headers, body, stored_at, ttl = row
+        resp = requests.models.Response()
+        resp.status_code = status_code
+        resp.headers.update(json.loads(headers))
+        resp._content = body
+        resp.url = url
+        resp.encoding = "utf-8"
+        return (resp, time.time() - stored_at < ttl)
+
+    def validators(self, resp):
+        """Return: conditional request headers for a cached response"""
+        headers = {}
+        if "ETag" in resp.headers:
+            headers["If-None-Match"] = resp.headers["ETag"]
+        if "Last-Modified" in resp.headers:
+            headers["If-Modified-Since"] = resp.headers["Last-Modified"]
+        return headers
+
+    def store(self, url, resp, ttl):
+        headers = {}
+        for header in _STORED_HEADERS:
+            if header in resp.headers:
+                headers[header] = resp.headers[header]
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, urlsplit(url).path, resp.status_code, json.dumps(headers), resp.content, time.time(), ttl)
+            )
+            self.db.commit()
+
+    def refresh(self, url):
+        """Restart the TTL of a cached response (after a 304 response)"""
+        with self.lock:
+            self.db.execute("UPDATE responses SET stored_at = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+
+    def invalidate(self, path):
+        """Remove the cached responses which may be modified by a POST/PUT/DELETE request
+        on `path`: the path itself and its sub-paths, its parent collection, and the
+        collections with the same name in other scopes (e.g. a PUT on /api/v1/sites/<id>
+        invalidates /api/v1/orgs/<org_id>/sites)
+        Params: path (without host nor query string)"""
+        path = path.split("?")[0].rstrip("/")
+        segments = path.split("/")
+        if route_template(path).endswith("/{id}"):
+            collection = segments[-2]
+        else:
+            collection = segments[-1]
+        conditions = ["path = ?", "path LIKE ?", "path LIKE ?"]
+        params = [path, path + "/%", "%/" + collection]
+        if len(segments) > 4:
+            conditions.append("path = ?")
+            params.append("/".join(segments[:-1]))
+        with self.lock:
+            self.db.execute("DELETE FROM responses WHERE " + " OR ".join(conditions), params)
+            self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
@@ -1,3 +1,10 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
 def red(text): return '\033[0;31m' + text + '\033[0m'
 def green(text): return '\033[0;32m' + text + '\033[0m'
 def yellow(text): return '\033[0;33m' + text + '\033[0m'
@@ -6,6 +13,126 @@ def magenta(text): return '\033[0;35m' + text + '\033[0m'
 def cyan(text): return '\033[0;36m' + text + '\033[0m'
 def white(text): return '\033[0;37m' + text + '\033[0m'
 
+# logging levels of the syslog severities used by Console
+EMERGENCY = 60
+ALERT = 55
+NOTICE = 25
+logging.addLevelName(EMERGENCY, "EMERGENCY")
+logging.addLevelName(ALERT, "ALERT")
+logging.addLevelName(NOTICE, "NOTICE")
+
+_colors = {
+    "EMERGENCY": magenta,
+    "ALERT": magenta,
+    "CRITICAL": magenta,
+    "ERROR": red,
+    "WARNING": yellow,
+    "NOTICE": blue,
+    "INFO": green,
+    "DEBUG": white,
+}
+
+# attributes of every LogRecord, the other ones are fields given with "extra"
+_record_attributes = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+logger = logging.getLogger("mlib")
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+_listener = None
+
+
+class ColorFormatter(logging.Formatter):
+    """Human readable format: "LEVEL: message", with the level colored when the stream
+    is a terminal"""
+
+    def __init__(self, colors=True):
+        super().__init__()
+        self.colors = colors
+
+    def format(self, record):
+        message = super().format(record)
+        prefix = "%s: " % record.levelname
+        if self.colors:
+            prefix = _colors.get(record.levelname, white)(prefix)
+        return prefix + message
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line, with the time, level, logger, message and the fields
+    given with extra={...}"""
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if not key in _record_attributes:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(stream=sys.stdout, colors=None, json_file=None, use_queue=False):
+    """Configure the handlers of the "mlib" logger used by Console. Called with the
+    default parameters (or the ones from config.py) when this module is imported.
+    Params:
+        stream: stream where the human readable logs are written. None to disable it
+        colors: color the levels. Default to True if the stream is a terminal
+        json_file: file where the logs are written as JSON lines. None to disable it
+        use_queue: the handlers are called by a background thread, so logging never
+            blocks the caller on I/O"""
+    global _listener
+    if _listener != None:
+        _listener.stop()
+        _listener = None
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handlers = []
+    if stream != None:
+        if colors == None:
+            colors = hasattr(stream, "isatty") and stream.isatty()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(ColorFormatter(colors))
+        handlers.append(handler)
+    if json_file != None:
+        handler = logging.FileHandler(json_file)
+        handler.setFormatter(JsonLinesFormatter())
+        handlers.append(handler)
+    if not handlers:
+        # without any handler, logging would write the warnings to stderr
+        handlers.append(logging.NullHandler())
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
+
+def _stop_listener():
+    if _listener != None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
+
+try:
+    from config import log_json_file
+except:
+    log_json_file = None
+try:
+    from config import log_queue
+except:
+    log_queue = False
+configure(json_file=log_json_file, use_queue=log_queue)
+
 
 class Console:
     """
@@ -17,39 +144,43 @@ class Console:
     5: notice
     6: info
     7: debug
+
+    The messages are sent to the "mlib" logger (see configure()). Like the logging
+    module, the arguments are only merged into the message with "%" if the message is
+    displayed, e.g. console.debug("Request body: %s", body)
     """
 
     def __init__(self, level=6):
         self.level = level
 
-    def emergency(self, message):
+    def emergency(self, message, *args, **kwargs):
         if self.level >= 0:
-            print(magenta('EMERGENCY: ') + message)
+            logger.log(EMERGENCY, message, *args, **kwargs)
 
-    def alert(self, message):
+    def alert(self, message, *args, **kwargs):
         if self.level >= 1:
-            print(magenta('ALERT: ') + message)
+            logger.log(ALERT, message, *args, **kwargs)
 
-    def critical(self, message):
+    def critical(self, message, *args, **kwargs):
         if self.level >= 2:
-            print(magenta('CRITICAL: ') + message)
+            logger.log(logging.CRITICAL, message, *args, **kwargs)
 
-    def error(self, message):
+    def error(self, message, *args, **kwargs):
         if self.level >= 3:
-            print(red('ERROR: ') + message)
+            logger.log(logging.ERROR, message, *args, **kwargs)
 
-    def warning(self, message):
+    def warning(self, message, *args, **kwargs):
         if self.level >= 4:
-            print(yellow('WARNING: ') + message)
+            logger.log(logging.WARNING, message, *args, **kwargs)
 
-    def notice(self, message):
+    def notice(self, message, *args, **kwargs):
         if self.level >= 5:
-            print(blue('NOTICE: ') + message)
+            logger.log(NOTICE, message, *args, **kwargs)
 
-    def info(self, message):
+    def info(self, message, *args, **kwargs):
         if self.level >= 6:
-            print(green('INFO: ') + message)
+            logger.log(logging.INFO, message, *args, **kwargs)
 
-    def debug(self, message):
+    def debug(self, message, *args, **kwargs):
         if self.level >= 7:
-            print(white('DEBUG: ') + message)
+            logger.log(logging.DEBUG, message, *args, **kwargs)
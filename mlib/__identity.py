@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class IdentityCache:
+    """Cache of the /api/v1/self responses (user information and privileges), stored in
+    a JSON file and keyed by a hash of the host and of the API token (or session
+    cookies), so a new session with the same credentials can start without requesting
+    them again. The credentials themselves are never stored in the file.
+    """
+
+    def __init__(self, file_path, ttl=300):
+        """Params:
+            file_path: JSON file where the identities are stored
+            ttl: time (in seconds) during which a stored identity is used"""
+        self.file_path = file_path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(host, secret):
+        """Return: cache key of the credentials, or None if there are no credentials"""
+        if not secret:
+            return None
+        return hashlib.sha256(("%s|%s" % (host, secret)).encode()).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.file_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        """Return: /api/v1/self result, or None if not stored or expired"""
+        if key == None:
+            return None
+        with self.lock:
+            entry = self._load().get(key)
+        if entry == None or time.time() - entry["stored_at"] >= self.ttl:
+            return None
+        return entry["identity"]
+
+    def store(self, key, identity):
+        if key == None:
+            return
+        with self.lock:
+            entries = self._load()
+            now = time.time()
+            for entry_key in list(entries):
+                if now - entries[entry_key]["stored_at"] >= self.ttl:
+                    del entries[entry_key]
+            entries[key] = {"stored_at": now, "identity": identity}
+            self._save(entries)
+
+    def forget(self, key):
+        if key == None:
+            return
+        with self.lock:
+            entries = self._load()
+            if key in entries:
+                del entries[key]
+                self._save(entries)
+
+    def _save(self, entries):
+        # the file gives access to the privileges of the account, keep it private
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
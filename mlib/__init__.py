@@ -1,3 +1,31 @@
-from .requests import orgs
-from .requests import sites
-from .mist import Mist_Session
\ No newline at end of file
+import importlib
+
+# the modules are only imported when they are used (PEP 562), so "import mlib" is
+# fast and a script only loads the parts of the library it needs.
+# name: (module, attribute of the module or None for the module itself)
+_attributes = {
+    "orgs": (".requests.orgs", None),
+    "sites": (".requests.sites", None),
+    "mist": (".mist", None),
+    "Mist_Session": (".mist", "Mist_Session"),
+    "AsyncMist_Session": (".async_mist", "AsyncMist_Session"),
+    "bulk": (".bulk", None),
+    "requests": (".requests", None),
+    "models": (".models", None),
+}
+__all__ = list(_attributes)
+
+
+def __getattr__(name):
+    if name in _attributes:
+        module_name, attribute = _attributes[name]
+        value = importlib.import_module(module_name, __name__)
+        if attribute != None:
+            value = getattr(value, attribute)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_attributes))
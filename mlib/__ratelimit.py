@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket, used to pace the requests sent with the same API token.
+
+    The bucket holds at most `burst` tokens and is refilled at a rate computed so that,
+    in any one-hour window, no more than `requests_per_hour` requests are sent
+    (burst + refill during one hour <= requests_per_hour).
+
+    Tokens are reserved: reserve() never blocks, takes one token (the bucket may go
+    negative) and returns how long the caller has to wait before sending its request.
+    This way the same bucket can be shared by threads (acquire()) and by coroutines
+    (await asyncio.sleep(reserve())).
+    """
+
+    def __init__(self, requests_per_hour=5000, burst=100):
+        self.requests_per_hour = requests_per_hour
+        self.burst = min(burst, requests_per_hour)
+        if requests_per_hour > self.burst:
+            self.rate = (requests_per_hour - self.burst) / 3600
+        else:
+            self.rate = requests_per_hour / 3600
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def reserve(self):
+        """Reserve one token.
+        Return: time to wait (in seconds) before sending the request"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """Block the current thread until a token is available.
+        Return: time waited (in seconds)"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, delay):
+        """Stop delivering tokens for `delay` seconds (e.g. after a 429 response with a
+        Retry-After header), for every thread sharing this bucket.
+        Params: delay in seconds"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = min(self.tokens, 0)
@@ -1,7 +1,22 @@
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+from urllib3.util.retry import Retry
 
 import json
+import math
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+from .__ratelimit import RateLimiter
+from .__singleflight import SingleFlight
+from .__upload import MultipartFile
+from .__response import MistResponse, decode_error
+from .metrics import RequestEvent
+from .models.privilege import Privileges
 
 try:
     from config import log_level
@@ -16,85 +31,318 @@ class Req:
 
     def __init__(self):
         self.host = ""
-        self.session = requests.session()
-        self.privileges = ""
-        
+        self.scheme = "https"
+        self.adapter = None
+        self.keep_alive = True
+        self.timeout = None
+        self.cache = None
+        self.singleflight = SingleFlight()
+        self.session = self._new_session()
+        self.privileges = Privileges([])
+        self.page_workers = 1
+        self.rate_limiter = RateLimiter()
+        self.max_retries = 5
+        self.hooks = []
+        self.cassette = None
+
+    @staticmethod
+    def new_adapter(pool_connections=10, pool_maxsize=50, max_retries=3):
+        """Create a HTTPAdapter (connection pool) which can be shared by several sessions
+        Params: number of pooled hosts, number of connections kept per host, number of
+            retries on connection errors (requests which have not been sent)
+        Return: HTTPAdapter"""
+        retries = Retry(total=max_retries, connect=max_retries, read=False, status=False, redirect=False)
+        return HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retries)
+
+    def _new_session(self):
+        """Create the requests session, with the connection pool self.adapter
+        Return: requests session"""
+        session = requests.session()
+        if self.adapter != None:
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+        if not self.keep_alive:
+            session.headers.update({"Connection": "close"})
+        return session
+
+    def add_hook(self, hook):
+        """Register a function called after each HTTP request with a RequestEvent
+        (method, templated route, status code, size, time to first byte, latency,
+        retries, page), e.g. a mlib.metrics.RequestMetrics. Hooks are called from the
+        thread which sent the request, and must not raise exceptions.
+        Params: hook function"""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _emit(self, event):
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as err:
+                console.warning("Request hook %s failed: %s", hook, err)
+
+    def _body_size(self, resp):
+        """Size of the response body, without reading it: the Content-Length header, or
+        the length of the body if it was already read (0 if unknown)
+        Params: requests response
+        Return: size in bytes"""
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit():
+            return int(length)
+        if resp._content_consumed:
+            return len(resp.content)
+        return 0
 
     def _url(self, uri):
         """Generate the url with the host (in the object) and the uri
         Params: uri
         Return: url"""
-        return "https://" + self.host + uri
+        return self.scheme + "://" + self.host + uri
+
+    def _retry_delay(self, resp, retry):
+        """Compute how long to wait before retrying a request. The Retry-After header
+        is honoured if present, otherwise exponential backoff with full jitter is used.
+        Params: requests response, number of retries already done
+        Return: delay in seconds"""
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay != None:
+                return max(delay, 0) + random.uniform(0, 1)
+        return random.uniform(0, min(60, 2 ** retry))
+
+    def _send(self, method, url, **kwargs):
+        """Send a HTTP request with the shared session. The request is paced by the rate
+        limiter, and retried on 429 responses (and on 5xx responses for idempotent
+        methods) up to self.max_retries times.
+        Params: HTTP method, url, requests parameters
+        Return: requests response"""
+        retry = 0
+        start = None
+        while True:
+            if hasattr(kwargs.get("data"), "seek"):
+                # streamed body, rewind it before each attempt
+                kwargs["data"].seek(0)
+            if self.rate_limiter != None:
+                self.rate_limiter.acquire()
+            if start == None:
+                # the latency does not include the first wait for the rate limiter
+                start = time.monotonic()
+            kwargs.setdefault("timeout", self.timeout)
+            try:
+                if self.cassette != None:
+                    resp = self.cassette.request(self.session, method, url, **kwargs)
+                else:
+                    resp = self.session.request(method, url, **kwargs)
+            except Exception as err:
+                if self.hooks:
+                    self._emit(RequestEvent(method, url, latency=time.monotonic() - start, retries=retry, error=str(err)))
+                raise
+            if resp.status_code == 429:
+                retryable = True
+            elif resp.status_code >= 500:
+                retryable = method in ["GET", "PUT", "DELETE"]
+            else:
+                retryable = False
+            if not retryable or retry >= self.max_retries:
+                if self.hooks:
+                    self._emit(RequestEvent(
+                        method, url, resp.status_code,
+                        size=self._body_size(resp),
+                        ttfb=resp.elapsed.total_seconds(),
+                        latency=time.monotonic() - start,
+                        retries=retry,
+                        page=resp.headers.get("X-Page-Page")
+                    ))
+                return resp
+            delay = self._retry_delay(resp, retry)
+            if resp.status_code == 429 and self.rate_limiter != None:
+                self.rate_limiter.pause(delay)
+            retry += 1
+            console.warning("HTTP %s received for %s %s. Retrying in %.1fs (%s/%s)...", resp.status_code, method, url, delay, retry, self.max_retries)
+            if self.cassette != None:
+                self.cassette.sleep(delay)
+            else:
+                time.sleep(delay)
 
     def _check_authorization(self, method, org_id="", site_id=""):
+        """Check the privileges before a POST/PUT/DELETE request. The check is
+        conservative: the request is only blocked when the user privileges are known to
+        be read-only for the org or the site (see Privileges.is_read_only)
+        Params: HTTP method, org_id, site_id
+        Return: True if the request can be sent"""
+        if method in ["POST", "PUT", "DELETE"] and self.privileges.is_read_only(org_id, site_id):
+            console.error("authorization error: read-only access to %s", org_id or site_id)
+            return False
         return True
-        # TODO: current validation may not working in some conditions... Bypassing it
-        if method in ["POST", "PUT", "DELETE"]:
-            if org_id != "":
-                for privilige in self.privileges:
-                    if "org_id" in privilige and privilige['org_id'] == org_id:
-                        if privilige["role"] in ["write", "admin"]:
-                            return True
-                console.error("authorization error")
-                return False
-            elif site_id != "":
-                for privilige in self.privileges:
-                    if "site_id" in privilige and privilige['site_id'] == site_id:
-                        if privilige["role"] in ["write", "admin"]:
-                            return True
-                console.error("authorization error")
-                return False
+
+    def _response(self, resp, uri="", pages=None):
+        """Params: requests response, uri, requests responses of all the pages of a
+            paginated result
+        Return: MistResponse (the result is decoded when used)"""
+        if pages == None:
+            pages = [resp]
+        response = MistResponse(resp.status_code, uri, [page.content for page in pages], resp.headers)
+        console.debug("Response Status Code: %s", resp.status_code)
+        if resp.status_code != 200:
+            console.debug("Response: %s", response["error"])
+        return response
+
+    def _get_url(self, uri, query={}, page=1, limit=100):
+        """Generate the url of a paginated GET request
+        Params: uri, HTTP query, page, limit
+        Return: url"""
+        url = self._url(uri)
+        html_query = "?"
+        if not query == {}:
+            for query_param in query:
+                html_query += "%s=%s&" %(query_param, query[query_param])
+        html_query += "limit=%s&" %limit
+        html_query += "page=%s" %page
+        return url + html_query
+
+    def _get_page(self, uri, query={}, page=1, limit=100):
+        """GET HTTP Request for a single page. Identical concurrent requests share the
+        same HTTP request (and its response).
+        Params: uri, HTTP query, page, limit
+        Return: requests response, or None if the request failed"""
+        url = self._get_url(uri, query, page, limit)
+        return self.singleflight.do(url, self._fetch_page, url)
+
+    def _fetch_page(self, url):
+        """GET HTTP Request for a single page
+        Params: url
+        Return: requests response, or None if the request failed"""
+        try:
+            ttl = None
+            if self.cache != None:
+                ttl = self.cache.ttl(url)
+            if ttl != None:
+                return self._get_cached_page(url, ttl)
+            console.debug("Request > GET %s", url)
+            resp = self._send("GET", url)
+            resp.raise_for_status()
+        except HTTPError as http_err:
+            console.error(f'HTTP error occurred: {http_err}')  # Python 3.6
+            console.error("HTTP error description: %s", decode_error(http_err.response.content))
+        except Exception as err:
+            console.error(f'Other error occurred: {err}')  # Python 3.6
         else:
-            return True
+            return resp
 
-    def _response(self, resp, uri="", multi_pages_result=None):
-        if resp.status_code == 200:
-            if multi_pages_result == None:
-                result = resp.json()
-            else: 
-                result = multi_pages_result
-            error = ""
-            console.debug("Response Status Code: %s" % resp.status_code)
+    def _get_cached_page(self, url, ttl):
+        """GET HTTP Request for a single page, using the response cache. Expired entries
+        are revalidated with a conditional request when possible.
+        Params: url, TTL
+        Return: requests response
+        Raise: HTTPError"""
+        cached_resp, fresh = self.cache.get(url)
+        if fresh:
+            console.debug("Request > GET %s (from cache)", url)
+            return cached_resp
+        headers = {}
+        if cached_resp != None:
+            headers = self.cache.validators(cached_resp)
+        console.debug("Request > GET %s", url)
+        resp = self._send("GET", url, headers=headers)
+        if resp.status_code == 304 and cached_resp != None:
+            self.cache.refresh(url)
+            return cached_resp
+        resp.raise_for_status()
+        self.cache.store(url, resp, ttl)
+        return resp
+
+    def _invalidate(self, uri):
+        """Remove the cached and memoized responses which may be modified by a POST/PUT/DELETE request
+        Params: uri"""
+        self.singleflight.forget()
+        if self.cache != None:
+            self.cache.invalidate(uri)
+
+    def _pages(self, uri, query={}, page=1, limit=100):
+        """Generator following the X-Page-* headers. Yields the requests response of each
+        page, in order. If a page request fails, yields None and stops.
+        When self.page_workers > 1, the remaining pages are known as soon as the first
+        one is received, and are retrieved concurrently by a bounded thread pool.
+        Params: uri, HTTP query, first page, limit
+        Return: generator of requests responses"""
+        while True:
+            resp = self._get_page(uri, query, page, limit)
+            yield resp
+            if resp == None or not "X-Page-Limit" in resp.headers:
+                return
+            x_page_limit = int(resp.headers["X-Page-Limit"])
+            x_page_page = int(resp.headers["X-Page-Page"])
+            x_page_total = int(resp.headers["X-Page-Total"])
+            if x_page_limit * x_page_page >= x_page_total:
+                return
+            page = x_page_page + 1
+            if self.page_workers > 1:
+                last_page = math.ceil(x_page_total / x_page_limit)
+                yield from self._prefetch_pages(uri, query, page, last_page, x_page_limit)
+                return
+
+    def _prefetch_pages(self, uri, query, first_page, last_page, limit):
+        """Retrieve the pages first_page..last_page with self.page_workers threads.
+        At most 2 * self.page_workers pages are pending at the same time, and the
+        responses are yielded in the pages order.
+        Params: uri, HTTP query, first page, last page, limit
+        Return: generator of requests responses"""
+        window = 2 * self.page_workers
+        pending = deque()
+        next_page = first_page
+        with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+            while next_page <= last_page or pending:
+                while next_page <= last_page and len(pending) < window:
+                    pending.append(executor.submit(self._get_page, uri, query, next_page, limit))
+                    next_page += 1
+                resp = pending.popleft().result()
+                yield resp
+                if resp == None:
+                    for future in pending:
+                        future.cancel()
+                    return
+
+    def mist_iter(self, uri, org_id="", site_id="", query={}, page=1, limit=100):
+        """GET HTTP Request, yielding the items of a paginated list page by page, so
+        the first items can be processed while the next pages are not retrieved yet.
+        Non-paginated results are yielded as a single item. Raises RuntimeError if a
+        page can not be retrieved, so the caller does not process a truncated list.
+        Params: uri, HTTP query, first page, limit
+        Return: generator of items"""
+        if self._check_authorization("GET", org_id=org_id, site_id=site_id):
+            for resp in self._pages(uri, query, page, limit):
+                if resp == None:
+                    raise RuntimeError("Unable to retrieve all the pages of %s" % uri)
+                content = resp.json()
+                if type(content) == list:
+                    yield from content
+                else:
+                    yield content
         else:
-            result = ""
-            error = resp.json()
-            console.debug("Response Status Code: %s" % resp.status_code)
-            console.debug("Response: %s" % error)
-        return {"result": result, "status_code": resp.status_code, "error": error, "uri":uri}
+            console.error("you're not authenticated yet...")
 
     def mist_get(self, uri, org_id="", site_id="", query={}, page=1, limit=100):
-        """GET HTTP Request
+        """GET HTTP Request. Paginated results are collected into a single list.
         Params: uri, HTTP query
         Return: HTTP response"""
         if self._check_authorization("GET", org_id=org_id, site_id=site_id):
-            try:
-                url = self._url(uri)
-                html_query = "?"
-                if not query == {}:
-                    for query_param in query:
-                        html_query += "%s=%s&" %(query_param, query[query_param])
-                html_query += "limit=%s&" %limit
-                html_query += "page=%s" %page
-                url += html_query
-                console.debug("Request > GET %s" % url)
-                resp = self.session.get(url)
-                resp.raise_for_status()
-            except HTTPError as http_err:
-                console.error(f'HTTP error occurred: {http_err}')  # Python 3.6
-                console.error(f'HTTP error description: {resp.json()}')
-            except Exception as err:
-                console.error(f'Other error occurred: {err}')  # Python 3.6
-            else: 
-                if "X-Page-Limit" in resp.headers:
-                    content = resp.json()
-                    x_page_limit = int(resp.headers["X-Page-Limit"])
-                    x_page_page = int(resp.headers["X-Page-Page"])
-                    x_page_total = int(resp.headers["X-Page-Total"])
-                    if x_page_limit * x_page_page < x_page_total:
-                        content+=self.mist_get(uri, org_id, site_id, query, page + 1, limit)["result"]
-                    return self._response(resp, uri, content)
-                else:                
+            pages = []
+            for resp in self._pages(uri, query, page, limit):
+                if resp == None:
+                    return
+                if not pages and not "X-Page-Limit" in resp.headers:
                     return self._response(resp, uri)
+                pages.append(resp)
+            return self._response(pages[0], uri, pages)
         else:
             console.error("you're not authenticated yet...")
 
@@ -106,21 +354,22 @@ class Req:
             try: 
                 url = self._url(uri)
                 headers = {'Content-Type': "application/json"}
-                console.debug("Request > POST %s" % url)
-                console.debug("Request body: \r\n%s" % body)
+                console.debug("Request > POST %s", url)
+                console.debug("Request body: \r\n%s", body)
                 if type(body) == str:
-                    resp = self.session.post(url, data=body, headers=headers)
+                    resp = self._send("POST", url, data=body, headers=headers)
                 elif type(body) == dict:
-                    resp = self.session.post(url, json=body, headers=headers)
+                    resp = self._send("POST", url, json=body, headers=headers)
                 else: 
-                    resp = self.session.post(url, json=body, headers=headers)
+                    resp = self._send("POST", url, json=body, headers=headers)
                 resp.raise_for_status()
             except HTTPError as http_err:
                 console.error(f'HTTP error occurred: {http_err}')  # Python 3.6
-                console.error(f'HTTP error description: {resp.json()}')
+                console.error("HTTP error description: %s", decode_error(resp.content))
             except Exception as err:
                 console.error(f'Other error occurred: {err}')  # Python 3.6
             else: 
+                self._invalidate(uri)
                 return self._response(resp, uri)
         else:
             console.error("you're not authenticated yet...")
@@ -132,21 +381,22 @@ class Req:
         if self._check_authorization("PUT", org_id=org_id, site_id=site_id):
             try:
                 url = self._url(uri)
-                console.debug("Request > PUT %s" % url)
-                console.debug("Request body: \r\n%s" % body)
+                console.debug("Request > PUT %s", url)
+                console.debug("Request body: \r\n%s", body)
                 if type(body) == str:
-                    resp = self.session.put(url, data=body)
+                    resp = self._send("PUT", url, data=body)
                 elif type(body) == dict:
-                    resp = self.session.put(url, json=body)
+                    resp = self._send("PUT", url, json=body)
                 else: 
-                    resp = self.session.put(url, json=body)
+                    resp = self._send("PUT", url, json=body)
                 resp.raise_for_status()
             except HTTPError as http_err:
                 console.error(f'HTTP error occurred: {http_err}')  # Python 3.6
-                console.error(f'HTTP error description: {resp.json()}')
+                console.error("HTTP error description: %s", decode_error(resp.content))
             except Exception as err:
                 console.error(f'Other error occurred: {err}')  # Python 3.6
             else: 
+                self._invalidate(uri)
                 return self._response(resp, uri)
 
         else:
@@ -159,36 +409,44 @@ class Req:
         if self._check_authorization("DELETE", org_id=org_id, site_id=site_id):
             try: 
                 url = self._url(uri)
-                console.debug("Request > DELETE %s" % url)
-                resp = self.session.delete(url)
+                console.debug("Request > DELETE %s", url)
+                resp = self._send("DELETE", url)
                 resp.raise_for_status()
             except HTTPError as http_err:
                 console.error(f'HTTP error occurred: {http_err}')  # Python 3.6
             except Exception as err:
                 console.error(f'Other error occurred: {err}')  # Python 3.6
             else: 
+                self._invalidate(uri)
                 return self._response(resp, uri)
         else:
             console.error("you're not authenticated yet...")
 
 
-    def mist_post_file(self, uri, org_id="", site_id="", files=None):
-        """POST HTTP Request
-        Params: uri, HTTP body
+    def mist_post_file(self, uri, org_id="", site_id="", files=None, file_path=None, field_name="file"):
+        """POST HTTP Request (multipart/form-data)
+        Params: uri, files dict ({field_name: content}) or file_path to stream the file
+            from the disk without loading it in memory, form field name
         Return: HTTP response"""
         if self._check_authorization("POST", org_id=org_id, site_id=site_id):
             try:                 
                 url = self._url(uri)
-                console.debug("Request > POST %s" % url)
-                resp = self.session.post(url, files=files)
+                console.debug("Request > POST %s", url)
+                if file_path != None:
+                    with open(file_path, "rb") as f:
+                        body = MultipartFile(f, field_name)
+                        resp = self._send("POST", url, data=body, headers={"Content-Type": body.content_type})
+                else:
+                    resp = self._send("POST", url, files=files)
                 resp.raise_for_status()
             except HTTPError as http_err:
                 console.error(f'HTTP error occurred: {http_err}')  # Python 3.6
-                console.error(f'HTTP error description: {resp.json()}')
+                console.error("HTTP error description: %s", decode_error(resp.content))
                 return resp
             except Exception as err:
                 console.error(f'Other error occurred: {err}')  # Python 3.6
             else: 
+                self._invalidate(uri)
                 return self._response(resp, uri)
         else:
             console.error("you're not authenticated yet...")
@@ -0,0 +1,234 @@
+import json
+import re
+import uuid
+
+
+def decode_error(content):
+    """Decode the body of an error response without raising: the body may be JSON, text
+    (e.g. from a proxy), or empty
+    Params: body bytes
+    Return: decoded JSON, or text"""
+    if not content:
+        return ""
+    try:
+        return json.loads(content)
+    except ValueError:
+        return content.decode("utf-8", "replace")
+
+
+class RawJSON:
+    """JSON document kept as the bytes received from the API. Written as is by
+    dump_json()"""
+
+    def __init__(self, bodies):
+        """Params: list of bodies (bytes): a single JSON document, or the JSON lists of
+            the pages of a paginated result, merged into a single list"""
+        self.bodies = bodies
+
+    def chunks(self):
+        """Return: generator of the bytes of the document, without copying the bodies
+        of the pages into a single document"""
+        if len(self.bodies) == 1:
+            yield self.bodies[0]
+            return
+        yield b"["
+        first = True
+        for body in self.bodies:
+            # remove the brackets of the list of each page
+            body = body.strip()[1:-1].strip()
+            if body:
+                if not first:
+                    yield b","
+                yield body
+                first = False
+        yield b"]"
+
+    @property
+    def content(self):
+        return b"".join(self.chunks())
+
+    def decode(self):
+        return json.loads(self.content)
+
+
+class MistResponse(dict):
+    """Response of the Mist_Session requests: a dict with the "result", "status_code",
+    "error" and "uri" keys.
+
+    The JSON body is only decoded when the "result" is used (then kept), so the
+    headers, the pagination and the raw body can be used without decoding it, e.g. to
+    save a backup without decoding and re-encoding the objects (see raw_result() and
+    dump_json()). Paginated results are kept as the bodies of the pages, and are
+    decoded into a single list.
+    """
+
+    def __init__(self, status_code, uri="", bodies=None, headers=None):
+        """Params: HTTP status code, uri, list of the bodies (bytes) of the pages,
+            headers of the first page"""
+        super().__init__(status_code=status_code, error="", uri=uri)
+        self.status_code = status_code
+        self.uri = uri
+        self.headers = headers if headers != None else {}
+        self.bodies = bodies or []
+        self.decoded = False
+        if status_code != 200:
+            # the result of the other status codes is not decoded
+            dict.__setitem__(self, "result", "")
+            dict.__setitem__(self, "error", decode_error(self.content))
+            self.decoded = True
+
+    ######## PAGINATION ########
+
+    def _header_int(self, name):
+        value = self.headers.get(name)
+        if value == None:
+            return None
+        return int(value)
+
+    @property
+    def paginated(self):
+        return "X-Page-Limit" in self.headers
+
+    @property
+    def limit(self):
+        return self._header_int("X-Page-Limit")
+
+    @property
+    def page(self):
+        return self._header_int("X-Page-Page")
+
+    @property
+    def total(self):
+        return self._header_int("X-Page-Total")
+
+    ######## BODY ########
+
+    @property
+    def content(self):
+        """Return: raw JSON body. The pages of a paginated result are merged into a
+        single JSON list (without decoding them)"""
+        return RawJSON(self.bodies).content
+
+    def json(self):
+        """Return: decoded result"""
+        return self["result"]
+
+    def raw_result(self):
+        """Return: the result as a RawJSON if it is not decoded yet, or the decoded
+        result (which may have been changed by the caller)"""
+        if self.decoded:
+            return self["result"]
+        return RawJSON(self.bodies)
+
+    def _decode(self):
+        if self.decoded:
+            return
+        # the bodies are released as soon as they are decoded
+        bodies = self.bodies
+        self.bodies = []
+        if len(bodies) == 1:
+            result = json.loads(bodies.pop()) if bodies[0] else ""
+        else:
+            result = []
+            bodies.reverse()
+            while bodies:
+                result.extend(json.loads(bodies.pop()))
+        dict.__setitem__(self, "result", result)
+        self.decoded = True
+
+    ######## DICT ########
+
+    def __getitem__(self, key):
+        if key == "result":
+            self._decode()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "result":
+            self._decode()
+        return dict.get(self, key, default)
+
+    def __setitem__(self, key, value):
+        if key == "result":
+            self.decoded = True
+            self.bodies = []
+        dict.__setitem__(self, key, value)
+
+    def __contains__(self, key):
+        return key == "result" or dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._decode()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        # the "result" key is only set when decoded
+        return dict.__len__(self) + (0 if self.decoded else 1)
+
+    def __eq__(self, other):
+        if not isinstance(other, dict):
+            # e.g. "response == None", without decoding the result
+            return NotImplemented
+        self._decode()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        self._decode()
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._decode()
+        return dict.__repr__(self)
+
+    def keys(self):
+        self._decode()
+        return dict.keys(self)
+
+    def values(self):
+        self._decode()
+        return dict.values(self)
+
+    def items(self):
+        self._decode()
+        return dict.items(self)
+
+    def copy(self):
+        self._decode()
+        return dict(dict.items(self))
+
+    def pop(self, key, *default):
+        if key == "result":
+            self._decode()
+        return dict.pop(self, key, *default)
+
+
+def dump_json(data, f, one_line=False):
+    """Write data as JSON to a text file, like json.dump(). The RawJSON values (e.g.
+    from MistResponse.raw_result()) are written as received from the API, without being
+    decoded and encoded again.
+    Params: data, text file, remove the line breaks of the RawJSON values (only
+        allowed as whitespace in JSON), e.g. to write JSON lines"""
+    token = uuid.uuid4().hex
+    raws = []
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            raws.append(value)
+            return "\x00%s:%s\x00" % (token, len(raws) - 1)
+        raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+    text = json.dumps(data, default=default)
+    # the placeholders are encoded as JSON strings
+    parts = re.split(r'"\\u0000%s:(\d+)\\u0000"' % token, text)
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            f.write(part)
+        else:
+            for chunk in raws[int(part)].chunks():
+                if one_line:
+                    chunk = chunk.replace(b"\r", b" ").replace(b"\n", b" ")
+                f.write(chunk.decode("utf-8"))
@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicate identical concurrent calls: while a call for a key is in flight, the
+    other callers asking for the same key wait for it and receive its result, instead of
+    doing the same work again.
+    If memo_ttl > 0, the results are also kept for memo_ttl seconds.
+    """
+
+    def __init__(self, memo_ttl=0):
+        self.memo_ttl = memo_ttl
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.memo = {}
+
+    def do(self, key, func, *args):
+        """Call func(*args), or wait for the result of the in-flight call with the same key.
+        None results are not kept in the memo.
+        Params: key, function and its parameters
+        Return: function result"""
+        with self.lock:
+            if key in self.memo:
+                stored_at, value = self.memo[key]
+                if time.monotonic() - stored_at < self.memo_ttl:
+                    return value
+                del self.memo[key]
+            call = self.in_flight.get(key)
+            leader = call == None
+            if leader:
+                call = _Call()
+                self.in_flight[key] = call
+        if not leader:
+            call.event.wait()
+            if call.error != None:
+                raise call.error
+            return call.value
+        try:
+            call.value = func(*args)
+            return call.value
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if self.memo_ttl > 0 and call.error == None and call.value != None:
+                    self.memo[key] = (time.monotonic(), call.value)
+            call.event.set()
+
+    def forget(self):
+        """Clear the memo (e.g. after a POST/PUT/DELETE request)"""
+        with self.lock:
+            self.memo = {}
@@ -0,0 +1,71 @@
+import mimetypes
+import os
+import uuid
+
+
+class MultipartFile:
+    """multipart/form-data body streaming one file from disk.
+
+    The body is read by chunks by the HTTP client, so the file is never fully loaded in
+    memory. The body length is known in advance, so the request is not sent with
+    chunked transfer encoding. seek(0) allows to send the same body again (retries).
+    """
+
+    def __init__(self, file_object, field_name="file", file_name=None, chunk_size=65536):
+        """Params:
+            file_object: file opened in binary mode
+            field_name: form field name
+            file_name: file name sent in the form. Default to the file_object name
+            chunk_size: size of the chunks returned when iterating on the body"""
+        if file_name == None:
+            file_name = os.path.basename(getattr(file_object, "name", field_name))
+        content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        self.boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=%s" % self.boundary
+        self.file_object = file_object
+        self.chunk_size = chunk_size
+        self.head = (
+            "--%s\r\n"
+            "Content-Disposition: form-data; name=\"%s\"; filename=\"%s\"\r\n"
+            "Content-Type: %s\r\n\r\n" % (self.boundary, field_name, file_name, content_type)
+        ).encode()
+        self.tail = ("\r\n--%s--\r\n" % self.boundary).encode()
+        self.file_start = file_object.tell()
+        file_object.seek(0, os.SEEK_END)
+        self.file_size = file_object.tell() - self.file_start
+        self.seek(0)
+
+    def __len__(self):
+        return len(self.head) + self.file_size + len(self.tail)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # only rewinding is supported
+        self.position = 0
+        self.file_object.seek(self.file_start)
+        return 0
+
+    def read(self, size=-1):
+        if size == None or size < 0:
+            size = len(self)
+        data = b""
+        head_size = len(self.head)
+        if self.position < head_size:
+            data = self.head[self.position:self.position + size]
+            self.position += len(data)
+        if len(data) < size and self.position < head_size + self.file_size:
+            chunk = self.file_object.read(min(size - len(data), head_size + self.file_size - self.position))
+            data += chunk
+            self.position += len(chunk)
+        if len(data) < size and self.position >= head_size + self.file_size:
+            tail_position = self.position - head_size - self.file_size
+            chunk = self.tail[tail_position:tail_position + size - len(data)]
+            data += chunk
+            self.position += len(chunk)
+        return data
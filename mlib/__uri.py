@@ -0,0 +1,11 @@
+import re
+
+_id_regex = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)")
+
+
+def route_template(path):
+    """Replace the objects ids in an API path by "{id}", e.g.
+    /api/v1/sites/<site_id>/maps/<map_id> -> /api/v1/sites/{id}/maps/{id}
+    Params: path (without host nor query string)
+    Return: templated path"""
+    return _id_regex.sub("/{id}", path)
@@ -0,0 +1,269 @@
+"""
+Asynchronous sessions (AsyncMist_Session). aiohttp is an optional dependency: if it is
+not installed, the blocking requests are run in a thread pool instead.
+
+    pip install aiohttp
+"""
+import asyncio
+import functools
+import math
+import os
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .mist import Mist_Session
+from .metrics import RequestEvent
+from .__response import MistResponse, decode_error
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+
+class AsyncMist_Session:
+    """Class managing asynchronous REST requests.
+
+    The authentication is done by a regular (blocking) Mist_Session, and its
+    cookies/headers are reused by the asynchronous transport. The mist_get, mist_post,
+    mist_put, mist_delete and mist_post_file methods are coroutines returning the same
+    response dict as the Mist_Session ones. So the functions from mlib.requests.orgs
+    and mlib.requests.sites can be used unchanged, and only have to be awaited:
+        resp = await mlib.requests.orgs.sites.get(async_session, org_id)
+
+    If aiohttp is installed, it is used as transport. Otherwise, the blocking
+    Mist_Session requests are executed in a thread pool.
+    """
+
+    def __init__(self, mist_session=None, max_concurrency=100, **kwargs):
+        """Params:
+            mist_session: authenticated Mist_Session to reuse. If None, a new Mist_Session
+                is created with the remaining keyword arguments
+            max_concurrency: maximum number of concurrent HTTP requests"""
+        if mist_session == None:
+            mist_session = Mist_Session(**kwargs)
+        self.mist_session = mist_session
+        self.host = mist_session.host
+        self.privileges = mist_session.privileges
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Close the asynchronous transport. The Mist_Session is not logged out."""
+        if self._client != None:
+            await self._client.close()
+            self._client = None
+
+    def _url(self, uri):
+        return self.mist_session._url(uri)
+
+    def _get_semaphore(self):
+        # the semaphore must be created from the running event loop
+        if self._semaphore == None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _get_client(self):
+        if self._client == None:
+            session = self.mist_session.session
+            cookies = {}
+            for cookie in session.cookies:
+                cookies[cookie.name] = cookie.value
+            timeout = self.mist_session.timeout
+            if type(timeout) == tuple:
+                client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout[0], sock_read=timeout[1])
+            else:
+                client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+            self._client = aiohttp.ClientSession(
+                headers=dict(session.headers),
+                cookies=cookies,
+                timeout=client_timeout,
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, force_close=not self.mist_session.keep_alive)
+            )
+        return self._client
+
+    async def run_sync(self, func, *args, **kwargs):
+        """Run a blocking function from mlib.requests (e.g. orgs.wlans.report, which
+        processes the responses itself) with the Mist_Session, in a thread pool.
+        Params: function, function parameters (without the session)
+        Return: function return value"""
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            return await loop.run_in_executor(None, functools.partial(func, self.mist_session, *args, **kwargs))
+
+    async def _request(self, method, url, **kwargs):
+        """Send a HTTP request with aiohttp. The request is paced by the rate limiter of
+        the Mist_Session, and retried like the blocking requests (see Req._send).
+        Return: (status code, headers, body bytes), or None if the request failed"""
+        rate_limiter = self.mist_session.rate_limiter
+        retry = 0
+        async with self._get_semaphore():
+            start = None
+            try:
+                while True:
+                    if rate_limiter != None:
+                        await asyncio.sleep(rate_limiter.reserve())
+                    if start == None:
+                        start = time.monotonic()
+                    console.debug("Request > %s %s", method, url)
+                    sent_at = time.monotonic()
+                    async with self._get_client().request(method, url, **kwargs) as resp:
+                        ttfb = time.monotonic() - sent_at
+                        body = await resp.read()
+                    if resp.status == 429:
+                        retryable = True
+                    elif resp.status >= 500:
+                        retryable = method in ["GET", "PUT", "DELETE"]
+                    else:
+                        retryable = False
+                    if not retryable or retry >= self.mist_session.max_retries:
+                        break
+                    delay = self.mist_session._retry_delay(resp, retry)
+                    if resp.status == 429 and rate_limiter != None:
+                        rate_limiter.pause(delay)
+                    retry += 1
+                    console.warning("HTTP %s received for %s %s. Retrying in %.1fs (%s/%s)...", resp.status, method, url, delay, retry, self.mist_session.max_retries)
+                    await asyncio.sleep(delay)
+                if self.mist_session.hooks:
+                    self.mist_session._emit(RequestEvent(
+                        method, url, resp.status,
+                        size=len(body),
+                        ttfb=ttfb,
+                        latency=time.monotonic() - start,
+                        retries=retry,
+                        page=resp.headers.get("X-Page-Page")
+                    ))
+                if resp.status >= 400:
+                    console.error(f'HTTP error occurred: {resp.status} {resp.reason} for url: {url}')
+                    console.error("HTTP error description: %s", decode_error(body))
+                    return None
+                return (resp.status, resp.headers, body)
+            except Exception as err:
+                console.error(f'Other error occurred: {err}')
+                if self.mist_session.hooks:
+                    self.mist_session._emit(RequestEvent(method, url, latency=time.monotonic() - start, retries=retry, error=str(err)))
+
+    def _response(self, status_code, headers, bodies, uri):
+        console.debug("Response Status Code: %s", status_code)
+        return MistResponse(status_code, uri, bodies, headers)
+
+    async def mist_get(self, uri, org_id="", site_id="", query={}, page=1, limit=100):
+        """GET HTTP Request. Once the first page of a paginated request is received,
+        the remaining pages are retrieved concurrently. The response cache of the
+        Mist_Session is not used by the asynchronous transport.
+        Params: uri, HTTP query
+        Return: HTTP response"""
+        if aiohttp == None:
+            return await self.run_sync(Mist_Session.mist_get, uri, org_id, site_id, query, page, limit)
+        if not self.mist_session._check_authorization("GET", org_id=org_id, site_id=site_id):
+            console.error("you're not authenticated yet...")
+            return None
+        first = await self._request("GET", self.mist_session._get_url(uri, query, page, limit))
+        if first == None:
+            return None
+        status_code, headers, body = first
+        if not "X-Page-Limit" in headers:
+            return self._response(status_code, headers, [body], uri)
+        x_page_limit = int(headers["X-Page-Limit"])
+        x_page_page = int(headers["X-Page-Page"])
+        x_page_total = int(headers["X-Page-Total"])
+        last_page = math.ceil(x_page_total / x_page_limit)
+        pages = await asyncio.gather(*[
+            self._request("GET", self.mist_session._get_url(uri, query, next_page, x_page_limit))
+            for next_page in range(x_page_page + 1, last_page + 1)
+        ])
+        bodies = [body]
+        for next_page in pages:
+            if next_page == None:
+                return None
+            bodies.append(next_page[2])
+        return self._response(status_code, headers, bodies, uri)
+
+    async def mist_post(self, uri, org_id="", site_id="", body={}):
+        """POST HTTP Request
+        Params: uri, HTTP body
+        Return: HTTP response"""
+        if aiohttp == None:
+            return await self.run_sync(Mist_Session.mist_post, uri, org_id, site_id, body)
+        if not self.mist_session._check_authorization("POST", org_id=org_id, site_id=site_id):
+            console.error("you're not authenticated yet...")
+            return None
+        console.debug("Request body: \r\n%s", body)
+        headers = {'Content-Type': "application/json"}
+        if type(body) == str:
+            resp = await self._request("POST", self._url(uri), data=body, headers=headers)
+        else:
+            resp = await self._request("POST", self._url(uri), json=body, headers=headers)
+        if resp != None:
+            self.mist_session._invalidate(uri)
+            return self._response(resp[0], resp[1], [resp[2]], uri)
+
+    async def mist_put(self, uri, org_id="", site_id="", body={}):
+        """PUT HTTP Request
+        Params: uri, HTTP body
+        Return: HTTP response"""
+        if aiohttp == None:
+            return await self.run_sync(Mist_Session.mist_put, uri, org_id, site_id, body)
+        if not self.mist_session._check_authorization("PUT", org_id=org_id, site_id=site_id):
+            console.error("you're not authenticated yet...")
+            return None
+        console.debug("Request body: \r\n%s", body)
+        if type(body) == str:
+            resp = await self._request("PUT", self._url(uri), data=body)
+        else:
+            resp = await self._request("PUT", self._url(uri), json=body)
+        if resp != None:
+            self.mist_session._invalidate(uri)
+            return self._response(resp[0], resp[1], [resp[2]], uri)
+
+    async def mist_delete(self, uri, org_id="", site_id=""):
+        """DELETE HTTP Request
+        Params: uri
+        Return: HTTP response"""
+        if aiohttp == None:
+            return await self.run_sync(Mist_Session.mist_delete, uri, org_id, site_id)
+        if not self.mist_session._check_authorization("DELETE", org_id=org_id, site_id=site_id):
+            console.error("you're not authenticated yet...")
+            return None
+        resp = await self._request("DELETE", self._url(uri))
+        if resp != None:
+            self.mist_session._invalidate(uri)
+            return self._response(resp[0], resp[1], [resp[2]], uri)
+
+    async def mist_post_file(self, uri, org_id="", site_id="", files=None, file_path=None, field_name="file"):
+        """POST HTTP Request (multipart/form-data)
+        Params: uri, files dict ({field_name: content}) or file_path to stream the file
+            from the disk without loading it in memory, form field name
+        Return: HTTP response"""
+        if aiohttp == None:
+            return await self.run_sync(Mist_Session.mist_post_file, uri, org_id, site_id, files, file_path, field_name)
+        if not self.mist_session._check_authorization("POST", org_id=org_id, site_id=site_id):
+            console.error("you're not authenticated yet...")
+            return None
+        if file_path != None:
+            with open(file_path, "rb") as f:
+                data = aiohttp.FormData()
+                data.add_field(field_name, f, filename=os.path.basename(file_path))
+                resp = await self._request("POST", self._url(uri), data=data)
+        else:
+            data = aiohttp.FormData()
+            for name, content in files.items():
+                data.add_field(name, content, filename=name)
+            resp = await self._request("POST", self._url(uri), data=data)
+        if resp != None:
+            self.mist_session._invalidate(uri)
+            return self._response(resp[0], resp[1], [resp[2]], uri)
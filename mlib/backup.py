@@ -0,0 +1,496 @@
+"""
+Streaming backup files (JSON Lines), written and read one record at a time, so the
+memory used by a backup or a restore does not depend on the number of sites:
+
+    {"type": "org", "time": 1700000000, "org": {"id": ..., "data": ..., "wlans": ...}}
+    {"type": "site", "site": {"data": ..., "maps": ..., "wlans": ...}}
+    ...
+    {"type": "end", "sites": 3000}
+
+Each record is flushed as soon as it is written, to a temporary file (<file>.tmp)
+which only replaces the backup file when the backup is complete: an interrupted backup
+leaves the previous backup untouched. The records already written to the temporary file
+can still be restored (after renaming it): the "end" record is missing, and a truncated
+last line is ignored.
+
+The streaming files use the ".jsonl" extension. The former format (a single JSON
+document {"org": {..., "sites": [...]}}) can still be read with load().
+
+Incremental backups (see open_writer()) only save the objects created, changed or
+deleted since the previous backup, as a delta file applied on top of the full backup
+(and of the previous deltas). The objects are compared by id and "modified_time" (or by
+content, for the objects without them):
+
+    {"type": "delta", "time": 1700086400, "base": 1700000000}
+    {"type": "org", "changes": {"wlans": {"changed": [...], "deleted": ["<id>"]}}}
+    {"type": "site", "id": "<site id>", "changes": {"settings": {"value": {...}}}}
+    {"type": "site", "id": "<new site id>", "site": {"data": ..., "maps": ...}}
+    {"type": "deleted_sites", "ids": ["<site id>"]}
+    {"type": "end", "sites": 2}
+
+With the full backup "org_conf_file.jsonl", the files of the backup folder are:
+    org_conf_file.jsonl                         latest full backup
+    org_conf_file.<date>.delta.jsonl            deltas (on the full backup with the
+                                                "time" of their "base")
+    org_conf_file.<date>.jsonl                  previous full backups, with their deltas
+
+load() returns the backup as it was at any date (the latest one by default), by
+applying the deltas to the latest full backup before this date.
+
+pack() saves a backup (at any date) with its images in a single compressed file (see
+mlib.container), which can also be read by load(): the sites are decoded one at a time.
+"""
+import datetime
+import glob
+import hashlib
+import json
+import os
+import time
+
+from .__response import RawJSON, dump_json
+from .container import Container, ContainerWriter
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+DELTA_SUFFIX = ".delta.jsonl"
+CONTAINER_SUFFIX = ".mbk"
+
+
+class BackupWriter:
+    """Write a full backup file record by record. The file is only created (renamed from
+    a temporary file) when the writer is closed with a complete backup"""
+
+    def __init__(self, file_path, backup_time=None):
+        """Params: file path, time of the backup (epoch seconds, default to now)"""
+        self.file_path = file_path
+        self.time = int(time.time()) if backup_time == None else backup_time
+        self.tmp_path = "%s.tmp" % file_path
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        self.sites = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # the end record is only written if the backup is complete
+        self.close(complete=exc_type == None)
+
+    def _write(self, record):
+        # the raw JSON received from the API may be indented on several lines
+        dump_json(record, self.file, one_line=True)
+        self.file.write("\n")
+        self.file.flush()
+
+    def write_org(self, org):
+        """Params: org objects (without the sites)
+        Return: objects saved"""
+        self._write({"type": "org", "time": self.time, "org": org})
+        return org
+
+    def write_site(self, site):
+        """Params: site objects
+        Return: objects saved"""
+        self._write({"type": "site", "site": site})
+        self.sites += 1
+        return site
+
+    def _end(self):
+        self._write({"type": "end", "sites": self.sites})
+
+    def close(self, complete=True):
+        if self.file == None:
+            return
+        if complete:
+            self._end()
+        self.file.close()
+        self.file = None
+        if complete:
+            os.replace(self.tmp_path, self.file_path)
+        else:
+            console.warning("Backup %s is incomplete: the previous backup is kept, the records already written are in %s" % (self.file_path, self.tmp_path))
+
+
+class DeltaWriter(BackupWriter):
+    """Write the objects created, changed or deleted since the previous backup. Same
+    methods as BackupWriter, but write_org() and write_site() only return the objects
+    saved (e.g. to only download the images of the new and changed maps)"""
+
+    def __init__(self, file_path, previous, backup_time=None):
+        """Params: file path, previous backup (Backup), time of the backup"""
+        super().__init__(file_path, backup_time)
+        console.info("Backup %s > Indexing the previous backup" % file_path)
+        self.base = previous.base_time
+        self.index = _index(previous)
+        self.seen_sites = set()
+        self._write({"type": "delta", "time": self.time, "base": self.base})
+
+    def write_org(self, org):
+        changes = _changes(self.index["org"], org)
+        self._write({"type": "org", "changes": changes})
+        return _changed_objects(changes)
+
+    def write_site(self, site):
+        site_id = site["data"]["id"]
+        self.seen_sites.add(site_id)
+        if not site_id in self.index["sites"]:
+            self._write({"type": "site", "id": site_id, "site": site})
+            self.sites += 1
+            return site
+        changes = _changes(self.index["sites"][site_id], site)
+        if changes:
+            self._write({"type": "site", "id": site_id, "changes": changes})
+            self.sites += 1
+        return _changed_objects(changes)
+
+    def _end(self):
+        # the deleted sites are only known when all the sites are written
+        deleted = [site_id for site_id in self.index["sites"] if not site_id in self.seen_sites]
+        if deleted:
+            self._write({"type": "deleted_sites", "ids": deleted})
+        super()._end()
+
+
+class Backup:
+    """Backup loaded by load(). The sites are read from the file when iterated."""
+
+    def __init__(self, file_path, deltas=None):
+        """Params: full backup file path, delta files paths (applied in this order)"""
+        self.file_path = file_path
+        self.deltas = deltas or []
+        self.legacy = not file_path.endswith(".jsonl")
+        self.org = {}
+        self.complete = True
+        self.site_count = None
+        self.time = None
+        if self.legacy:
+            with open(file_path, encoding="utf-8") as f:
+                self.org = json.load(f)["org"]
+            self.legacy_sites = self.org.get("sites", [])
+            self.site_count = len(self.legacy_sites)
+        else:
+            with open(file_path, encoding="utf-8") as f:
+                record = _read_record(f.readline())
+            if record == None or record["type"] != "org":
+                raise ValueError("%s is not a backup file" % file_path)
+            self.org = record["org"]
+            self.time = record.get("time")
+            end = _last_record(file_path)
+            if end == None or end["type"] != "end":
+                self.complete = False
+            else:
+                self.site_count = end["sites"]
+        # the backups saved before the "time" field was added
+        if self.time == None:
+            self.time = int(os.path.getmtime(file_path))
+        self.base_time = self.time
+        self.site_changes = {}
+        self.new_sites = {}
+        self.deleted_sites = set()
+        for delta in self.deltas:
+            self._load_delta(delta)
+        self.org["sites"] = self.sites()
+
+    def _load_delta(self, file_path):
+        # the deltas are small: their changes are kept in memory, and applied to the
+        # sites of the full backup when they are read
+        complete = False
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                record = _read_record(line)
+                if record == None:
+                    continue
+                if record["type"] == "delta":
+                    self.time = record["time"]
+                elif record["type"] == "org":
+                    _apply_changes(self.org, record["changes"])
+                elif record["type"] == "site" and "site" in record:
+                    self.new_sites[record["id"]] = record["site"]
+                    self.deleted_sites.discard(record["id"])
+                elif record["type"] == "site" and record["id"] in self.new_sites:
+                    _apply_changes(self.new_sites[record["id"]], record["changes"])
+                elif record["type"] == "site":
+                    self.site_changes.setdefault(record["id"], []).append(record["changes"])
+                elif record["type"] == "deleted_sites":
+                    for site_id in record["ids"]:
+                        if self.new_sites.pop(site_id, None) == None:
+                            self.deleted_sites.add(site_id)
+                            self.site_changes.pop(site_id, None)
+                elif record["type"] == "end":
+                    complete = True
+        if not complete:
+            console.warning("Backup %s is incomplete: the sites not saved before the interruption are restored as in the previous backup" % file_path)
+        self.site_count = None
+
+    def _base_sites(self):
+        if self.legacy:
+            yield from self.legacy_sites
+            return
+        with open(self.file_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = _read_record(line)
+                if record == None:
+                    console.warning("Backup %s > Ignoring a truncated record", self.file_path)
+                elif record["type"] == "site":
+                    yield record["site"]
+
+    def sites(self):
+        """Return: generator of the sites objects"""
+        for site in self._base_sites():
+            site_id = site["data"]["id"]
+            if site_id in self.deleted_sites:
+                continue
+            for changes in self.site_changes.get(site_id, []):
+                _apply_changes(site, changes)
+            yield site
+        for site in self.new_sites.values():
+            yield site
+
+
+class ContainerBackup:
+    """Backup loaded from a container by load(). Same attributes as Backup, the sites
+    are decoded from the container one at a time"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.deltas = []
+        self.legacy = False
+        self.container = Container(file_path)
+        self.complete = self.container.meta.get("complete", True)
+        self.time = self.container.meta.get("time")
+        self.base_time = self.time
+        self.site_count = len(self.container.meta["sites"])
+        self.org = self.container.org()
+        self.org["sites"] = self.sites()
+
+    def sites(self):
+        """Return: generator of the sites objects"""
+        for site_id in self.container.meta["sites"]:
+            yield self.container.site(site_id)
+
+    def site(self, site_id):
+        """Return: objects of the site"""
+        return self.container.site(site_id)
+
+    def extract(self, file_name):
+        """Return: path of the extracted file (image or portal template), or None"""
+        return self.container.extract(file_name)
+
+
+def load(file_path, as_of=None):
+    """Load a backup file (streaming, container or former format), with its deltas
+    Params: file path of the full backup, date of the backup to load (datetime, epoch
+        seconds or ISO format string, default to the latest backup)
+    Return: Backup or ContainerBackup, whose org attribute is the org dict used by
+        org_conf_restore (with the "sites" read from the file when iterated)"""
+    if file_path.endswith(CONTAINER_SUFFIX):
+        backup = ContainerBackup(file_path)
+    elif file_path.endswith(".jsonl"):
+        full, deltas = _chain(file_path, _timestamp(as_of))
+        backup = Backup(full, deltas)
+    else:
+        backup = Backup(file_path)
+    if not backup.complete:
+        console.warning("Backup %s is incomplete: only the sites written before the interruption will be restored", backup.file_path)
+    return backup
+
+
+def open_writer(file_path, incremental=False, full_interval=7):
+    """Open the writer of a new backup. The previous full backup is kept (renamed with
+    its date) if the new backup is a full backup and the previous one has deltas, or
+    in incremental mode
+    Params: file path of the full backup, save a delta instead of a full backup if
+        possible, number of deltas after which a full backup is done again
+    Return: BackupWriter or DeltaWriter"""
+    previous = None
+    if os.path.isfile(file_path):
+        try:
+            previous = load(file_path)
+        except ValueError:
+            console.warning("Backup %s > Unable to load the previous backup" % file_path)
+    if incremental and previous != None and previous.complete and len(previous.deltas) < full_interval:
+        return DeltaWriter(_dated_path(file_path, DELTA_SUFFIX), previous)
+    if previous != None and (incremental or previous.deltas):
+        os.replace(file_path, _dated_path(file_path, ".jsonl", previous.base_time))
+    return BackupWriter(file_path)
+
+
+def pack(file_path, container_path, as_of=None, files=None):
+    """Save a backup and its files in a container
+    Params: file path of the full backup, container file path, date of the backup (see
+        load()), paths of the files (images and portal templates) to add"""
+    backup = load(file_path, as_of)
+    with ContainerWriter(container_path) as writer:
+        writer.meta["time"] = backup.time
+        writer.meta["complete"] = backup.complete
+        for name, value in backup.org.items():
+            if name != "sites":
+                writer.add_section(name, value)
+        for site in backup.org["sites"]:
+            writer.add_site(site["data"]["id"], site)
+        for path in files or []:
+            writer.add_file("files/%s" % os.path.basename(path), path)
+
+
+######## DELTAS ########
+
+def _fingerprint(value):
+    if isinstance(value, dict) and "modified_time" in value:
+        return "%s" % value["modified_time"]
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _is_id_list(value):
+    return isinstance(value, list) and all(isinstance(item, dict) and "id" in item for item in value)
+
+
+def _decoded(value):
+    if isinstance(value, RawJSON):
+        return value.decode()
+    return value
+
+
+def _index_entry(value):
+    # lists of objects: {id: fingerprint}, other values: fingerprint
+    value = _decoded(value)
+    if _is_id_list(value):
+        return {item["id"]: _fingerprint(item) for item in value}
+    return _fingerprint(value)
+
+
+def _index(backup):
+    """Return: fingerprints of the objects of the backup"""
+    index = {
+        "org": {name: _index_entry(value) for name, value in backup.org.items() if not name in ["id", "sites"]},
+        "sites": {}
+    }
+    for site in backup.org["sites"]:
+        index["sites"][site["data"]["id"]] = {name: _index_entry(value) for name, value in site.items()}
+    return index
+
+
+def _changes(index, objects):
+    """Params: index of the previous objects, current objects
+    Return: changes of the objects ({name: {"changed": [...], "deleted": [...]}} for the
+        lists of objects, {name: {"value": ...}} for the other values)"""
+    changes = {}
+    for name, value in objects.items():
+        if name == "id":
+            continue
+        value = _decoded(value)
+        entry = index.get(name)
+        if isinstance(entry, dict) and _is_id_list(value):
+            changed = [item for item in value if entry.get(item["id"]) != _fingerprint(item)]
+            ids = set(item["id"] for item in value)
+            deleted = [object_id for object_id in entry if not object_id in ids]
+            if changed or deleted:
+                changes[name] = {"changed": changed, "deleted": deleted}
+        elif entry == None or isinstance(entry, dict) or entry != _fingerprint(value):
+            changes[name] = {"value": value}
+    return changes
+
+
+def _changed_objects(changes):
+    return {name: change["value"] if "value" in change else change["changed"] for name, change in changes.items()}
+
+
+def _apply_changes(objects, changes):
+    for name, change in changes.items():
+        if "value" in change:
+            objects[name] = change["value"]
+            continue
+        items = _decoded(objects.get(name))
+        if not isinstance(items, list):
+            items = []
+        positions = {item["id"]: position for position, item in enumerate(items)}
+        for item in change["changed"]:
+            if item["id"] in positions:
+                items[positions[item["id"]]] = item
+            else:
+                items.append(item)
+        deleted = set(change["deleted"])
+        objects[name] = [item for item in items if not item["id"] in deleted]
+
+
+######## FILES ########
+
+def _timestamp(as_of):
+    if as_of == None:
+        return None
+    if isinstance(as_of, str):
+        as_of = datetime.datetime.fromisoformat(as_of)
+    if isinstance(as_of, datetime.datetime):
+        return as_of.timestamp()
+    return as_of
+
+
+def _dated_path(file_path, suffix, backup_time=None):
+    prefix = file_path[:-len(".jsonl")]
+    date = datetime.datetime.fromtimestamp(time.time() if backup_time == None else backup_time)
+    path = "%s.%s%s" % (prefix, date.strftime("%Y%m%d_%H%M%S"), suffix)
+    index = 1
+    while os.path.exists(path):
+        path = "%s.%s_%s%s" % (prefix, date.strftime("%Y%m%d_%H%M%S"), index, suffix)
+        index += 1
+    return path
+
+
+def _header(file_path):
+    with open(file_path, encoding="utf-8") as f:
+        record = _read_record(f.readline())
+    if record == None:
+        return None
+    if record.get("time") == None:
+        record["time"] = int(os.path.getmtime(file_path))
+    return record
+
+
+def _chain(file_path, as_of=None):
+    """Return: full backup file and its delta files (in time order) of the backup at
+    the date as_of"""
+    prefix = file_path[:-len(".jsonl")]
+    fulls = []
+    deltas = []
+    paths = glob.glob(glob.escape(prefix) + ".*.jsonl")
+    if os.path.isfile(file_path):
+        paths.append(file_path)
+    for path in paths:
+        header = _header(path)
+        if header == None:
+            continue
+        if path.endswith(DELTA_SUFFIX) and header["type"] == "delta":
+            deltas.append((header["time"], header["base"], path))
+        elif not path.endswith(DELTA_SUFFIX) and header["type"] == "org":
+            fulls.append((header["time"], path))
+    fulls = [full for full in fulls if as_of == None or full[0] <= as_of]
+    if not fulls:
+        raise ValueError("No backup %s before %s" % (file_path, as_of) if as_of != None else "No backup %s" % file_path)
+    base_time, full = max(fulls)
+    deltas = [delta for delta in sorted(deltas) if delta[1] == base_time and (as_of == None or delta[0] <= as_of)]
+    return full, [delta[2] for delta in deltas]
+
+
+def _read_record(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _last_record(file_path, block_size=4096):
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - block_size))
+        lines = f.read().strip().split(b"\n")
+    return _read_record(lines[-1].decode("utf-8", "replace"))
@@ -0,0 +1,214 @@
+"""
+Content-addressed store of the downloaded files (maps, devices and portal images, portal
+templates), shared by the backups: each file is stored once, keyed by its SHA-256, and
+hard linked to the backup folders (or copied, if the file system does not support hard
+links). The identical images of several sites, orgs or backup runs use a single blob.
+
+    backup/.blobs/objects/<2 first hex>/<sha256>
+    backup/.blobs/index.json      known (url, ETag): sha256, to link a file without
+                                  downloading it again
+
+The blobs are referenced by the downloads manifests of the backup folders (see
+mlib.download.Downloader). gc() removes the blobs which are not referenced anymore:
+
+    python3 -m mlib.blobstore backup
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+STORE_DIRECTORY = ".blobs"
+MANIFEST_FILE = ".downloads.json"
+
+
+class BlobStore:
+
+    def __init__(self, root):
+        """Params: directory of the store (created if needed)"""
+        self.root = os.path.abspath(root)
+        self.objects = os.path.join(self.root, "objects")
+        self.tmp = os.path.join(self.root, "tmp")
+        self.index_file = os.path.join(self.root, "index.json")
+        self.lock = threading.Lock()
+        # mkstemp creates the files with mode 0600: the blobs get the mode of the files
+        # created with open() (the umask can only be read by changing it)
+        umask = os.umask(0)
+        os.umask(umask)
+        self.mode = 0o666 & ~umask
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.tmp, exist_ok=True)
+        self.index = {}
+        if os.path.isfile(self.index_file):
+            try:
+                with open(self.index_file) as f:
+                    self.index = json.load(f)
+            except ValueError:
+                console.warning("Unable to read the blob store index %s", self.index_file)
+
+    def path(self, digest):
+        """Return: path of the blob"""
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def temp_file(self):
+        """Return: path of a new temporary file, on the file system of the store (to be
+        added with add())"""
+        fd, path = tempfile.mkstemp(dir=self.tmp, suffix=".part")
+        os.close(fd)
+        return path
+
+    def add(self, tmp_path, digest=None):
+        """Move a file to the store. The file is removed if the blob already exists
+        Params: file path, sha256 of the file (computed if None)
+        Return: sha256"""
+        if digest == None:
+            digest = file_digest(tmp_path)
+        blob_path = self.path(digest)
+        if os.path.isfile(blob_path):
+            os.remove(tmp_path)
+        else:
+            os.chmod(tmp_path, self.mode)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return digest
+
+    def link(self, digest, file_path):
+        """Hard link (or copy) a blob to file_path, replacing the existing file
+        Params: sha256, destination file path"""
+        part_file = file_path + ".part"
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        try:
+            os.link(self.path(digest), part_file)
+        except OSError:
+            shutil.copyfile(self.path(digest), part_file)
+        os.replace(part_file, file_path)
+
+    ######## INDEX ########
+
+    def _key(self, url, etag):
+        # the query of the files urls (signature, expiration) changes for each request
+        parts = urlsplit(url)
+        return "%s://%s%s %s" % (parts.scheme, parts.netloc, parts.path, etag)
+
+    def find(self, url, etag, size=None):
+        """Return: sha256 of the blob already downloaded from url with this ETag (and
+        size), or None"""
+        if not etag:
+            return None
+        with self.lock:
+            entry = self.index.get(self._key(url, etag))
+        if entry == None or (size != None and entry["size"] != size) or not self.has(entry["sha256"]):
+            return None
+        return entry["sha256"]
+
+    def remember(self, url, etag, digest, size):
+        if etag:
+            with self.lock:
+                self.index[self._key(url, etag)] = {"sha256": digest, "size": size}
+
+    def save(self):
+        """Save the index"""
+        with self.lock:
+            with open(self.index_file, "w") as f:
+                json.dump(self.index, f)
+
+    ######## GARBAGE COLLECTION ########
+
+    def blobs(self):
+        """Return: generator of the sha256 of the blobs"""
+        for directory in os.listdir(self.objects):
+            for digest in os.listdir(os.path.join(self.objects, directory)):
+                yield digest
+
+    def gc(self, manifest_files, dry_run=False):
+        """Remove the blobs not referenced by the manifests (or hard linked outside of
+        the store)
+        Params: downloads manifests files, only count the blobs to remove
+        Return: dict with the number and the size of the removed blobs"""
+        referenced = set()
+        for manifest_file in manifest_files:
+            referenced.update(_manifest_digests(manifest_file))
+        removed = 0
+        size = 0
+        for digest in list(self.blobs()):
+            blob_path = self.path(digest)
+            stat = os.stat(blob_path)
+            if digest in referenced or stat.st_nlink > 1:
+                continue
+            removed += 1
+            size += stat.st_size
+            if not dry_run:
+                os.remove(blob_path)
+        if not dry_run:
+            with self.lock:
+                self.index = {key: entry for key, entry in self.index.items() if self.has(entry["sha256"])}
+            self.save()
+            # the temporary files of the interrupted downloads (not of the running ones)
+            for tmp_file in os.listdir(self.tmp):
+                tmp_path = os.path.join(self.tmp, tmp_file)
+                if time.time() - os.path.getmtime(tmp_path) > 3600:
+                    os.remove(tmp_path)
+        console.info("Blob store %s > %s unreferenced blobs (%s bytes) %s", self.root, removed, size, "found" if dry_run else "removed")
+        return {"removed": removed, "size": size}
+
+
+def file_digest(file_path):
+    """Return: sha256 of the file"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _manifest_digests(manifest_file):
+    # the files of the manifest which still exist (relative to the manifest folder)
+    folder = os.path.dirname(os.path.abspath(manifest_file))
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        console.warning("Unable to read the downloads manifest %s", manifest_file)
+        return set()
+    return set(entry["sha256"] for file_path, entry in manifest.items() if entry.get("sha256") and os.path.isfile(os.path.join(folder, file_path)))
+
+
+def gc(backup_directory, dry_run=False):
+    """Remove the unreferenced blobs of the store of a backup directory, referenced by
+    the manifests of the backup folders of the orgs
+    Params: backup directory, only count the blobs to remove
+    Return: dict with the number and the size of the removed blobs"""
+    store = BlobStore(os.path.join(backup_directory, STORE_DIRECTORY))
+    manifests = glob.glob(os.path.join(glob.escape(backup_directory), "*", MANIFEST_FILE))
+    return store.gc(manifests, dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove the unreferenced blobs of a backup directory")
+    parser.add_argument("backup_directory", nargs="?", default="backup")
+    parser.add_argument("--dry-run", action="store_true", help="only display the number of blobs to remove")
+    args = parser.parse_args()
+    result = gc(args.backup_directory, args.dry_run)
+    print("%s blobs, %s bytes %s" % (result["removed"], result["size"], "to remove" if args.dry_run else "removed"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+
+from .requests import route
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+
+class BulkResult:
+    """Result of one operation executed by bulk.execute()"""
+
+    def __init__(self, index, module, op, args, response=None, error=""):
+        self.index = index
+        self.module = module
+        self.op = op
+        self.args = args
+        self.response = response
+        self.error = error
+        self.status_code = None
+        if isinstance(response, dict) and "status_code" in response:
+            self.status_code = response["status_code"]
+            if response["error"]:
+                self.error = response["error"]
+        elif response == None and error == "":
+            self.error = "request failed"
+        self.success = self.status_code == 200
+
+    @property
+    def result(self):
+        """Return: result of the response (decoded when used), or None"""
+        if self.status_code == None:
+            return None
+        return self.response["result"]
+
+    def __str__(self):
+        return "%s) %s.%s: %s" % (self.index, _module_name(self.module), self.op, self.status_code or self.error)
+
+
+class BulkReport:
+    """Aggregated results of bulk.execute(). The results are in the operations order."""
+
+    def __init__(self, results):
+        self.results = results
+        self.succeeded = [result for result in results if result.success]
+        self.failed = [result for result in results if not result.success]
+
+    def __str__(self):
+        summary = {}
+        for result in self.results:
+            key = "%s.%s" % (_module_name(result.module), result.op)
+            if not key in summary:
+                summary[key] = [0, 0]
+            if result.success:
+                summary[key][0] += 1
+            else:
+                summary[key][1] += 1
+        table = []
+        for key, counts in summary.items():
+            table.append([key, counts[0], counts[1]])
+        return tabulate(table, ["operation", "success", "failure"])
+
+    def display(self):
+        return str(self)
+
+
+def _module_name(module):
+    if type(module) == str:
+        return module
+    return module.__name__.replace("mlib.requests.", "")
+
+
+def _resolve(module, op):
+    """Find the function to call. The module can be a module from mlib.requests, or its
+    name (e.g. "sites.psks")"""
+    if type(module) == str:
+        level, object_name = module.split(".")
+        module = route(level, object_name)
+    return getattr(module, op)
+
+
+def _run(mist_session, index, operation):
+    module, op, args = operation
+    try:
+        func = _resolve(module, op)
+        if type(args) == dict:
+            response = func(mist_session, **args)
+        else:
+            response = func(mist_session, *args)
+        return BulkResult(index, module, op, args, response)
+    except Exception as err:
+        console.error("Bulk operation %s.%s failed: %s", _module_name(module), op, err)
+        return BulkResult(index, module, op, args, error=str(err))
+
+
+def execute(mist_session, operations, workers=10):
+    """Execute a list of operations concurrently. The requests are still paced by the
+    rate limiter of the session, so the workers only remove the network latency.
+    Params:
+        mist_session: Mist_Session
+        operations: list of (module, op, args) tuples, where module is a module from
+            mlib.requests (or its name, e.g. "sites.psks"), op is the name of the
+            function to call and args a tuple (or dict) of its parameters, without
+            the session. E.g.
+            (mlib.requests.sites.psks, "create", (site_id, psk))
+        workers: number of concurrent operations
+    Return: BulkReport"""
+    operations = list(operations)
+    console.info("Bulk > %s operations to process with %s workers", len(operations), workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run, mist_session, index, operation) for index, operation in enumerate(operations)]
+        results = [future.result() for future in futures]
+    report = BulkReport(results)
+    console.info("Bulk > %s operations succeeded, %s failed", len(report.succeeded), len(report.failed))
+    return report
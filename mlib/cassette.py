@@ -0,0 +1,141 @@
+"""
+Record the HTTP requests of a run to a cassette (JSON lines file), and replay them later
+without any network access, e.g. to replay a backup of a large org as a performance
+test, or to profile the processing of the responses without the network latency.
+
+    # record
+    mist_session = mlib.Mist_Session(cassette=Cassette.record("backup.jsonl"))
+    # replay, without waiting for the recorded latency nor for the rate limiter (the
+    # API token is not checked)
+    mist_session = mlib.Mist_Session(host="api.mist.com", apitoken="replay", requests_per_hour=None, cassette=Cassette.replay("backup.jsonl"))
+
+The responses are matched by method and path (with the query string), and are
+returned in the recorded order when the same request is sent several times.
+
+Only the requests sent by Req._send and the Downloader are recorded (not the login
+requests, nor the requests of AsyncMist_Session). The request headers and bodies, and
+the Set-Cookie response headers, are not stored.
+"""
+import base64
+import datetime
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+
+# response headers not stored in the cassette
+_SKIPPED_HEADERS = ["set-cookie", "content-encoding", "transfer-encoding", "connection"]
+
+
+class Cassette:
+    """Record or replay the HTTP responses"""
+
+    def __init__(self, file_path, mode="record", time_scale=0):
+        """Params:
+            file_path: JSON lines file
+            mode: "record" or "replay"
+            time_scale: in replay mode, ratio of the recorded latency (and of the
+                retry delays) to wait for. 0 to replay as fast as possible, 1 to replay
+                at the recorded speed"""
+        if not mode in ["record", "replay"]:
+            raise ValueError("unknown cassette mode %s" % mode)
+        self.file_path = file_path
+        self.mode = mode
+        self.time_scale = time_scale
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.interactions = {}
+        self.file = None
+        if mode == "record":
+            self.file = open(file_path, "w")
+        else:
+            with open(file_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        key = _key(interaction["method"], interaction["url"])
+                        self.interactions.setdefault(key, deque()).append(interaction)
+
+    @classmethod
+    def record(cls, file_path):
+        return cls(file_path, "record")
+
+    @classmethod
+    def replay(cls, file_path, time_scale=0):
+        return cls(file_path, "replay", time_scale)
+
+    def close(self):
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+    def request(self, session, method, url, **kwargs):
+        """Send the request with the session and record the response, or return the
+        recorded response
+        Params: requests session, HTTP method, url, requests parameters
+        Return: requests response
+        Raise: requests.exceptions.ConnectionError if the request is not in the cassette"""
+        if self.mode == "replay":
+            return self._replay(method, url)
+        resp = session.request(method, url, **kwargs)
+        self._record(method, url, resp)
+        return resp
+
+    def sleep(self, delay):
+        """Wait before a retry (scaled by time_scale in replay mode)"""
+        if self.mode == "replay":
+            delay = delay * self.time_scale
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record(self, method, url, resp):
+        interaction = {
+            "method": method,
+            "url": url,
+            "status_code": resp.status_code,
+            "headers": {key: value for key, value in resp.headers.items() if not key.lower() in _SKIPPED_HEADERS},
+            "elapsed": resp.elapsed.total_seconds(),
+            "time": time.monotonic() - self.start,
+        }
+        content = resp.content
+        try:
+            interaction["body"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            interaction["body_base64"] = base64.b64encode(content).decode()
+        line = json.dumps(interaction, separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def _replay(self, method, url):
+        with self.lock:
+            recorded = self.interactions.get(_key(method, url))
+            if not recorded:
+                raise requests.exceptions.ConnectionError("%s %s is not in the cassette %s" % (method, url, self.file_path))
+            interaction = recorded.popleft()
+        if self.time_scale > 0:
+            time.sleep(interaction["elapsed"] * self.time_scale)
+        resp = requests.models.Response()
+        resp.status_code = interaction["status_code"]
+        resp.headers.update(interaction["headers"])
+        if "body_base64" in interaction:
+            resp._content = base64.b64decode(interaction["body_base64"])
+        else:
+            resp._content = interaction["body"].encode("utf-8")
+        resp._content_consumed = True
+        resp.url = url
+        resp.encoding = "utf-8"
+        resp.reason = requests.status_codes._codes.get(resp.status_code, [""])[0].upper()
+        resp.elapsed = datetime.timedelta(seconds=interaction["elapsed"])
+        return resp
+
+
+
+def _key(method, url):
+    """Return: key of a request in the cassette: the host is ignored, so the requests
+    can be replayed with another host"""
+    url = urlsplit(url)
+    return (method, url.path + "?" + url.query)
@@ -3,14 +3,6 @@ import json
 from tabulate import tabulate
 
 
-def _search_org(orgs, org_id):
-    i = 0
-    for org in orgs:
-        if org['org_id'] == org_id:
-            return i
-        i+=1
-    return None
-
 def _test_choice(val, val_max):
     try:
         val_int = int(val)
@@ -26,29 +18,17 @@ def select_org(mist_session, allow_many=False):
     org_ids = []
     resp_ids=[]
     print("\r\nAvailable organizations:")
-    for privilege in mist_session.privileges:
-        if privilege["scope"] == "org" and not privilege["org_id"] in org_ids:
+    for privilege in mist_session.privileges.orgs():
+        i+=1
+        org_ids.append(privilege["org_id"])
+        print("%s) %s (id: %s)" % (i, privilege["name"], privilege["org_id"]))
+
+    # orgs where the admin only has access to some sites
+    for org_id in mist_session.privileges.site_orgs():
+        if not org_id in org_ids:
             i+=1
-            org_ids.append(privilege["org_id"])
-            print("%s) %s (id: %s)" % (i, privilege["name"], privilege["org_id"]))
-
-    orgs_with_sites = []
-    for privilege in mist_session.privileges:
-        if privilege["scope"] == "site" and not privilege["org_id"] in org_ids:
-            index = _search_org(orgs_with_sites, privilege["org_id"])
-            if index == None:
-                i+=1
-                org_ids.append(privilege["org_id"])
-                print("%s) %s (id: %s)" % (i, privilege["org_name"], privilege["org_id"]))
-                orgs_with_sites.append({
-                    "org_id": privilege["org_id"], 
-                    "name": privilege["name"], 
-                    "sites": [
-                        {"site_id": privilege["site_id"], "name": privilege["name"]}
-                        ]
-                    })
-            else:
-                orgs_with_sites[index]["sites"].append({"site_id": privilege["site_id"], "name": privilege["name"]})
+            org_ids.append(org_id)
+            print("%s) %s (id: %s)" % (i, mist_session.privileges.sites(org_id)[0]["org_name"], org_id))
 
     if allow_many: resp = input("\r\nSelect a Org (0 to %s, \"0,1\" for sites 0 and 1, \"a\" for all, or q to exit): " %i)
     else: resp = input("\r\nSelect a Org (0 to %s, or q to exit): " %i)
@@ -84,11 +64,10 @@ def select_site(mist_session, org_id=None, allow_many=False):
     if org_id == None:
         org_id = select_org(mist_session)[0]
 
-    for privilege in mist_session.privileges:
-        if privilege["scope"] == "org" and privilege["org_id"] == org_id:
-            org_access = True
-        if privilege["scope"] == "site" and privilege["org_id"] == org_id:
-            site_choices.append({"id": privilege["site_id"], "name": privilege["name"]})
+    if mist_session.privileges.org(org_id) != None:
+        org_access = True
+    for privilege in mist_session.privileges.sites(org_id):
+        site_choices.append({"id": privilege["site_id"], "name": privilege["name"]})
 
     if site_choices == [] or org_access == True:
         site_choices = mist_lib.requests.orgs.sites.get(mist_session, org_id)['result']
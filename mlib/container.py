@@ -0,0 +1,283 @@
+"""
+Single file backup container: compressed members (JSON documents and files) with a table
+of contents, so a reader can decode one site of a backup without reading the others.
+
+    MLIBPACK1\\n
+    member, member, ...          each member compressed on its own (zstd if the
+                                 zstandard package is installed, else gzip)
+    table of contents            gzip compressed JSON: meta data and, for each member,
+                                 its name, offset, compressed length, size and codec
+    trailer                      offset and length of the table of contents, MLIBTOC1
+
+The backups use the member names:
+    org/<section>                e.g. org/wlans, org/inventory
+    sites/<site>/<object type>   e.g. sites/<site id>/maps (the site keys are listed in
+                                 the "sites" meta data, in the backup order)
+    files/<file name>            images and portal templates
+
+The file is memory mapped by Container, the members are only decompressed when read.
+"""
+import collections.abc
+import gzip
+import io
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .__response import dump_json
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+MAGIC = b"MLIBPACK1\n"
+TRAILER_MAGIC = b"MLIBTOC1"
+TRAILER = struct.Struct("<QQ8s")
+VERSION = 1
+
+
+def _compress(data, codec, level):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level or 3).compress(data)
+    if codec == "gzip":
+        # mtime=0: the same data is always compressed to the same bytes
+        return gzip.compress(data, compresslevel=level or 6, mtime=0)
+    return data
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        if zstandard == None:
+            raise RuntimeError("The zstandard package is required to read this backup")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "store":
+        return bytes(data)
+    raise ValueError("Unknown codec %s" % codec)
+
+
+class ContainerWriter:
+    """Write a container. The file is only created (renamed from a temporary file) when
+    the writer is closed without error"""
+
+    def __init__(self, file_path, codec=None, level=None):
+        """Params: file path, codec ("zstd", "gzip" or "store", default to zstd if the
+            zstandard package is installed, else gzip), compression level"""
+        if codec == None:
+            codec = "zstd" if zstandard != None else "gzip"
+        if codec == "zstd" and zstandard == None:
+            raise RuntimeError("The zstandard package is required to use the zstd codec")
+        self.file_path = file_path
+        self.codec = codec
+        self.level = level
+        self.meta = {"sites": []}
+        self.members = []
+        self.names = set()
+        self.tmp_path = "%s.tmp" % file_path
+        self.file = open(self.tmp_path, "wb")
+        self.file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type == None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, name, data, codec=None, site=None):
+        """Add a member
+        Params: member name, bytes, codec (default to the codec of the writer), key of
+            the site of the member"""
+        if name in self.names:
+            raise ValueError("Duplicate member %s" % name)
+        codec = codec or self.codec
+        compressed = _compress(data, codec, self.level)
+        # e.g. the PNG images, already compressed
+        if len(compressed) >= len(data):
+            codec = "store"
+            compressed = data
+        offset = self.file.tell()
+        self.file.write(compressed)
+        member = {"name": name, "offset": offset, "length": len(compressed), "size": len(data), "codec": codec}
+        if site != None:
+            member["site"] = site
+        self.members.append(member)
+        self.names.add(name)
+
+    def add_json(self, name, value, site=None):
+        """Add a JSON member. The RawJSON values are written as received from the API
+        Params: member name, value, key of the site of the member"""
+        text = io.StringIO()
+        dump_json(value, text)
+        self.add(name, text.getvalue().encode("utf-8"), site=site)
+
+    def add_file(self, name, file_path):
+        """Params: member name, path of the file to add"""
+        with open(file_path, "rb") as f:
+            self.add(name, f.read())
+
+    def add_section(self, name, value):
+        """Params: org section name, value"""
+        self.add_json("org/%s" % name, value)
+
+    def add_site(self, key, objects):
+        """Add the objects of a site, one member per object type
+        Params: site key (site id or name), dict of the site objects"""
+        for name, value in objects.items():
+            self.add_json("sites/%s/%s" % (key, name), value, site=key)
+        self.meta["sites"].append(key)
+
+    def close(self):
+        if self.file == None:
+            return
+        toc = gzip.compress(json.dumps({"version": VERSION, "meta": self.meta, "members": self.members}).encode("utf-8"), mtime=0)
+        offset = self.file.tell()
+        self.file.write(toc)
+        self.file.write(TRAILER.pack(offset, len(toc), TRAILER_MAGIC))
+        self.file.close()
+        self.file = None
+        os.replace(self.tmp_path, self.file_path)
+
+    def abort(self):
+        """Close the writer without creating the container"""
+        if self.file == None:
+            return
+        self.file.close()
+        self.file = None
+        os.remove(self.tmp_path)
+
+
+class Container:
+    """Read a container (memory mapped)"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = open(file_path, "rb")
+        self.tmp_dir = None
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError("%s is empty" % file_path)
+        if len(self.map) < len(MAGIC) + TRAILER.size or self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("%s is not a backup container" % file_path)
+        offset, length, magic = TRAILER.unpack(self.map[-TRAILER.size:])
+        if magic != TRAILER_MAGIC:
+            self.close()
+            raise ValueError("%s is incomplete" % file_path)
+        toc = json.loads(gzip.decompress(self.map[offset:offset + length]))
+        if toc["version"] > VERSION:
+            self.close()
+            raise ValueError("%s was written by a newer version (%s)" % (file_path, toc["version"]))
+        self.meta = toc["meta"]
+        self.members = {}
+        # member names of each site, in the backup order
+        self.site_members = {}
+        for member in toc["members"]:
+            self.members[member["name"]] = member
+            if "site" in member:
+                self.site_members.setdefault(member["site"], []).append(member["name"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def names(self, prefix=""):
+        """Return: member names starting with prefix"""
+        return [name for name in self.members if name.startswith(prefix)]
+
+    def read(self, name):
+        """Return: bytes of the member"""
+        member = self.members[name]
+        return _decompress(self.map[member["offset"]:member["offset"] + member["length"]], member["codec"])
+
+    def json(self, name):
+        """Return: decoded JSON member"""
+        return json.loads(self.read(name))
+
+    def section(self, name):
+        """Return: decoded org section"""
+        return self.json("org/%s" % name)
+
+    def site(self, key):
+        """Params: site key (site id or name)
+        Return: dict of the decoded objects of the site"""
+        prefix = "sites/%s/" % key
+        return {name[len(prefix):]: self.json(name) for name in self.site_members.get(key, [])}
+
+    def org(self):
+        """Return: org dict with the decoded org sections, and the "sites" decoded when
+        used (mapping site key: site objects)"""
+        org = {name[len("org/"):]: self.json(name) for name in self.names("org/")}
+        org["sites"] = Sites(self)
+        return org
+
+    def extract(self, file_name):
+        """Extract a file member (added as files/<file name>) to a temporary directory,
+        removed when the container is closed
+        Params: file name
+        Return: path of the extracted file, or None if the file is not in the backup"""
+        name = "files/%s" % os.path.basename(file_name)
+        if not name in self.members:
+            return None
+        if self.tmp_dir == None:
+            self.tmp_dir = tempfile.TemporaryDirectory(prefix="mlib_backup_")
+        file_path = os.path.join(self.tmp_dir.name, os.path.basename(file_name))
+        if not os.path.isfile(file_path):
+            with open(file_path, "wb") as f:
+                f.write(self.read(name))
+        return file_path
+
+    def close(self):
+        if getattr(self, "map", None) != None:
+            self.map.close()
+            self.map = None
+        if self.file != None:
+            self.file.close()
+            self.file = None
+        if self.tmp_dir != None:
+            self.tmp_dir.cleanup()
+            self.tmp_dir = None
+
+
+class Sites(collections.abc.Mapping):
+    """Sites of a container: site key -> site objects, decoded when accessed"""
+
+    def __init__(self, container):
+        self.container = container
+        self.keys_list = container.meta.get("sites", [])
+        self.keys_set = set(self.keys_list)
+
+    def __getitem__(self, key):
+        if not key in self.keys_set:
+            raise KeyError(key)
+        return self.container.site(key)
+
+    def __contains__(self, key):
+        return key in self.keys_set
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __len__(self):
+        return len(self.keys_list)
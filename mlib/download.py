@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .blobstore import BlobStore
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+
+class Downloader:
+    """Download files (maps, devices and portal images, portal templates...) concurrently,
+    with the connection pool of a Mist_Session.
+
+    The files are streamed to disk by chunks, and written to a temporary ".part" file
+    renamed once complete. Every downloaded file is recorded in a manifest file (size,
+    sha256, ETag and Last-Modified), so a new run skips the files which are still valid:
+    a conditional request is sent with the previous ETag (or Last-Modified date, if the
+    server does not send any ETag), and the download is skipped if the server answers
+    304, or if it returns the same validator and size. Without any validator, the files
+    are downloaded again.
+
+    With a blob store (see mlib.blobstore), the files are stored once by content and hard
+    linked to their file path, and a file already downloaded from the same url with the
+    same ETag (e.g. by the backup of another org) is linked without downloading it again.
+
+    Usage:
+        with Downloader(mist_session) as downloader:
+            downloader.add(url, file_path)
+    """
+
+    def __init__(self, mist_session, workers=8, manifest_file=".downloads.json", chunk_size=65536, blob_store=None):
+        """Params:
+            mist_session: Mist_Session whose connection pool is used
+            workers: number of concurrent downloads
+            manifest_file: file used to store the downloaded files information. None to
+                disable it
+            chunk_size: size of the chunks written to disk
+            blob_store: BlobStore, or its directory. None to write the files directly"""
+        if isinstance(blob_store, str):
+            blob_store = BlobStore(blob_store)
+        self.blob_store = blob_store
+        self.mist_session = mist_session
+        self.workers = workers
+        self.manifest_file = manifest_file
+        self.chunk_size = chunk_size
+        self.manifest = {}
+        self.lock = threading.Lock()
+        self.futures = []
+        self.downloaded = 0
+        self.skipped = 0
+        self.linked = 0
+        self.failed = 0
+        if manifest_file and os.path.isfile(manifest_file):
+            try:
+                with open(manifest_file, "r") as f:
+                    self.manifest = json.load(f)
+            except ValueError:
+                console.warning("Unable to read the downloads manifest %s", manifest_file)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wait()
+        self.executor.shutdown()
+
+    def add(self, url, file_path):
+        """Queue a download
+        Params: url, destination file path"""
+        self.futures.append(self.executor.submit(self._download, url, file_path))
+
+    def wait(self):
+        """Wait for the queued downloads, and save the manifest
+        Return: dict with the number of downloaded, skipped and failed files"""
+        for future in self.futures:
+            future.result()
+        self.futures = []
+        self._save_manifest()
+        if self.blob_store != None:
+            self.blob_store.save()
+        console.info("Downloads > %s downloaded, %s skipped, %s linked, %s failed", self.downloaded, self.skipped, self.linked, self.failed)
+        return {"downloaded": self.downloaded, "skipped": self.skipped, "linked": self.linked, "failed": self.failed}
+
+    def _save_manifest(self):
+        if self.manifest_file:
+            with self.lock:
+                with open(self.manifest_file, "w") as f:
+                    json.dump(self.manifest, f)
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _unchanged(self, entry, resp):
+        # the body of the response is not read
+        if resp.headers.get("Content-Length") != str(entry["size"]):
+            return False
+        if resp.headers.get("ETag") or entry.get("etag"):
+            return resp.headers.get("ETag") == entry.get("etag")
+        return entry.get("last_modified") != None and resp.headers.get("Last-Modified") == entry["last_modified"]
+
+    def _download(self, url, file_path):
+        entry = None
+        with self.lock:
+            if file_path in self.manifest:
+                entry = self.manifest[file_path]
+        # the Mist credentials must not be sent to the files storage
+        headers = {"Authorization": None, "X-CSRFToken": None}
+        if entry != None and os.path.isfile(file_path) and os.path.getsize(file_path) == entry["size"]:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            elif entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        else:
+            entry = None
+        part_file = None
+        try:
+            console.debug("Download > GET %s", url)
+            if self.mist_session.cassette != None:
+                resp = self.mist_session.cassette.request(self.mist_session.session, "GET", url, headers=headers, stream=True, timeout=self.mist_session.timeout)
+            else:
+                resp = self.mist_session.session.get(url, headers=headers, stream=True, timeout=self.mist_session.timeout)
+            with resp:
+                if resp.status_code == 304 or (entry != None and self._unchanged(entry, resp)):
+                    console.debug("Download > %s is up to date", file_path)
+                    self._count("skipped")
+                    return
+                resp.raise_for_status()
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+                if self.blob_store != None:
+                    length = resp.headers.get("Content-Length")
+                    digest = self.blob_store.find(url, etag, int(length) if length else None)
+                    if digest != None:
+                        # the body is not read
+                        console.debug("Download > %s is already in the blob store", file_path)
+                        self.blob_store.link(digest, file_path)
+                        with self.lock:
+                            self.manifest[file_path] = {"size": os.path.getsize(file_path), "sha256": digest, "etag": etag, "last_modified": last_modified}
+                        self._count("linked")
+                        return
+                    part_file = self.blob_store.temp_file()
+                else:
+                    part_file = file_path + ".part"
+                sha256 = hashlib.sha256()
+                size = 0
+                with open(part_file, "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        sha256.update(chunk)
+                        size += len(chunk)
+                digest = sha256.hexdigest()
+                if self.blob_store != None:
+                    self.blob_store.add(part_file, digest)
+                    self.blob_store.link(digest, file_path)
+                    self.blob_store.remember(url, etag, digest, size)
+                else:
+                    os.replace(part_file, file_path)
+                with self.lock:
+                    self.manifest[file_path] = {"size": size, "sha256": digest, "etag": etag, "last_modified": last_modified}
+                self._count("downloaded")
+        except Exception as err:
+            console.error("Unable to download %s to %s: %s", url, file_path, err)
+            # the partially written file (already moved if the error is raised after)
+            if part_file != None and os.path.isfile(part_file):
+                os.remove(part_file)
+            self._count("failed")
@@ -0,0 +1,173 @@
+import json
+import threading
+from urllib.parse import urlsplit
+
+from .__uri import route_template
+
+# upper bounds (in seconds) of the latency histograms buckets
+DEFAULT_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+class RequestEvent:
+    """Information about one HTTP request, passed to the request hooks of a session
+    (see Req.add_hook)"""
+
+    def __init__(self, method, url, status_code=None, size=0, ttfb=0, latency=0, retries=0, page=None, error=""):
+        """Params:
+            method: HTTP method
+            url: requested url
+            status_code: HTTP status code of the last attempt, None if no response was received
+            size: response body size in bytes
+            ttfb: time to first byte (response headers received) of the last attempt, in seconds
+            latency: total time in seconds, including the retries and their delays
+            retries: number of retries (429 and 5xx responses)
+            page: page number for the paginated responses (X-Page-Page header), else None
+            error: error message if no response was received"""
+        self.method = method
+        self.url = url
+        self.route = route_template(urlsplit(url).path)
+        self.status_code = status_code
+        self.size = size
+        self.ttfb = ttfb
+        self.latency = latency
+        self.retries = retries
+        if page != None:
+            page = int(page)
+        self.page = page
+        self.error = error
+
+    def __str__(self):
+        return "%s %s: %s, %s bytes, ttfb %.3fs, latency %.3fs, %s retries" % (
+            self.method, self.route, self.status_code or self.error, self.size, self.ttfb, self.latency, self.retries)
+
+
+class _RouteStats:
+
+    def __init__(self, buckets):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.pages = 0
+        self.bytes = 0
+        self.status_codes = {}
+        self.ttfb_sum = 0
+        self.latency_sum = 0
+        self.latency_max = 0
+        self.buckets = [0] * len(buckets)
+
+    def add(self, event, buckets):
+        self.requests += 1
+        if event.status_code == None or event.status_code >= 400:
+            self.errors += 1
+        self.retries += event.retries
+        if event.page != None:
+            self.pages += 1
+        self.bytes += event.size
+        status = str(event.status_code or "error")
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        self.ttfb_sum += event.ttfb
+        self.latency_sum += event.latency
+        self.latency_max = max(self.latency_max, event.latency)
+        for index, bound in enumerate(buckets):
+            if event.latency <= bound:
+                self.buckets[index] += 1
+
+
+def _labels(method, route):
+    return 'method="%s",route="%s"' % (method, route)
+
+
+class RequestMetrics:
+    """Request hook aggregating the requests by method and templated route (e.g.
+    GET /api/v1/sites/{id}/maps): number of requests, errors, retries, pages, bytes,
+    and latency histogram. The result can be dumped as JSON or Prometheus text.
+
+    Usage:
+        metrics = RequestMetrics()
+        mist_session.add_hook(metrics)
+        ...
+        metrics.dump("metrics.prom")
+    """
+
+    def __init__(self, buckets=None):
+        """Params:
+            buckets: upper bounds (in seconds) of the latency histogram buckets, see DEFAULT_BUCKETS"""
+        if buckets == None:
+            buckets = DEFAULT_BUCKETS
+        self.bucket_bounds = sorted(buckets)
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def __call__(self, event):
+        key = (event.method, event.route)
+        with self.lock:
+            if not key in self.routes:
+                self.routes[key] = _RouteStats(self.bucket_bounds)
+            self.routes[key].add(event, self.bucket_bounds)
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def to_dict(self):
+        """Return: list of the routes statistics, slowest routes (total latency) first"""
+        result = []
+        with self.lock:
+            for (method, route), stats in self.routes.items():
+                result.append({
+                    "method": method,
+                    "route": route,
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "retries": stats.retries,
+                    "pages": stats.pages,
+                    "bytes": stats.bytes,
+                    "status_codes": dict(stats.status_codes),
+                    "ttfb_avg": stats.ttfb_sum / stats.requests,
+                    "latency_avg": stats.latency_sum / stats.requests,
+                    "latency_max": stats.latency_max,
+                    "latency_total": stats.latency_sum,
+                    "latency_buckets": dict(zip([str(bound) for bound in self.bucket_bounds], stats.buckets)),
+                })
+        result.sort(key=lambda route: route["latency_total"], reverse=True)
+        return result
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """Return: statistics in the Prometheus text exposition format"""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = ["# TYPE mist_requests_total counter"]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.status_codes.items()):
+                    lines.append('mist_requests_total{%s,status="%s"} %s' % (_labels(method, route), status, count))
+            for name, attribute in [
+                ("mist_request_retries_total", "retries"),
+                ("mist_request_pages_total", "pages"),
+                ("mist_response_bytes_total", "bytes"),
+                ("mist_request_ttfb_seconds_total", "ttfb_sum"),
+            ]:
+                lines.append("# TYPE %s counter" % name)
+                for (method, route), stats in routes:
+                    lines.append("%s{%s} %s" % (name, _labels(method, route), getattr(stats, attribute)))
+            lines.append("# TYPE mist_request_duration_seconds histogram")
+            for (method, route), stats in routes:
+                labels = _labels(method, route)
+                for bound, count in zip(self.bucket_bounds, stats.buckets):
+                    lines.append('mist_request_duration_seconds_bucket{%s,le="%s"} %s' % (labels, bound, count))
+                lines.append('mist_request_duration_seconds_bucket{%s,le="+Inf"} %s' % (labels, stats.requests))
+                lines.append("mist_request_duration_seconds_sum{%s} %s" % (labels, stats.latency_sum))
+                lines.append("mist_request_duration_seconds_count{%s} %s" % (labels, stats.requests))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, file_path):
+        """Write the statistics to a file, as Prometheus text if the file name ends
+        with ".prom", else as JSON
+        Params: file path"""
+        with open(file_path, "w") as f:
+            if file_path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                f.write(self.to_json())
@@ -4,6 +4,11 @@ import weakref
 from getpass import getpass
 
 from .__req import Req
+from .__ratelimit import RateLimiter
+from .__cache import ResponseCache
+from .__singleflight import SingleFlight
+from .__identity import IdentityCache
+from . import profiling
 from .models.privilege import Privileges
 
 
@@ -32,11 +37,58 @@ clouds = [
 class Mist_Session(Req):
     """Class managing REST login and requests"""
 
-    def __init__(self, session_file=None, load_settings=True, email="", password="", apitoken=None, host=None):    
+    def __init__(self, session_file=None, load_settings=True, email="", password="", apitoken=None, host=None, page_workers=1, requests_per_hour=5000, burst=100, max_retries=5, rate_limiter=None, pool_connections=10, pool_maxsize=50, connect_retries=3, timeout=(10, 60), keep_alive=True, adapter=None, cache_file=None, cache_ttls=None, memo_ttl=0, request_hooks=None, identity_cache_file=None, identity_ttl=300, scheme="https", cassette=None, profile=None):    
+        """Params:
+            session_file: file from where to restore the session cookies
+            load_settings: load the credentials from config.py
+            email, password, apitoken, host: credentials and Mist Cloud to use
+            page_workers: number of threads used to retrieve the pages of a paginated
+                GET request once the first page is received (1 to disable)
+            requests_per_hour, burst: token bucket used to pace the requests (the Mist
+                API limit is 5000 requests per hour per token). None to disable it
+            max_retries: number of retries on 429 responses (and 5xx responses for
+                GET/PUT/DELETE requests)
+            rate_limiter: RateLimiter to share with other sessions using the same
+                token. If set, requests_per_hour and burst are ignored
+            pool_connections, pool_maxsize: number of pooled hosts, and number of
+                connections kept open per host. pool_maxsize should be at least the
+                number of threads using the session
+            connect_retries: number of retries on connection errors
+            timeout: requests timeout in seconds, as a number or a (connect, read) tuple.
+                None to wait forever
+            keep_alive: keep the connections open between requests
+            adapter: connection pool (requests HTTPAdapter) to share with another session,
+                e.g. source_session.adapter. If set, pool_connections, pool_maxsize and
+                connect_retries are ignored
+            cache_file: SQLite file used to cache the responses of the slow-changing GET
+                endpoints (None to disable the cache)
+            cache_ttls: dict of {templated path pattern: TTL in seconds} of the endpoints
+                to cache, e.g. {"/api/v1/orgs/{id}/sites": 300}. Default to the const
+                endpoints, orgs info, sites and templates
+            memo_ttl: identical concurrent GET requests always share one HTTP request.
+                If memo_ttl > 0, their responses are also reused for memo_ttl seconds
+            request_hooks: list of functions called after each HTTP request, e.g. a
+                mlib.metrics.RequestMetrics (see Req.add_hook)
+            identity_cache_file: JSON file used to cache the user information and
+                privileges (/api/v1/self) by API token or session cookies, so the next
+                sessions with the same credentials start without requesting them
+                (None to disable the cache)
+            identity_ttl: time (in seconds) during which the cached user information
+                is used
+            scheme: "https", or "http" to use a local server (e.g. mlib.simulator)
+            cassette: mlib.cassette.Cassette used to record the requests, or to replay
+                them without network access
+            profile: profile the run (see mlib.profiling): True, or the report file.
+                If None, the active profiler is used, if any (e.g. started by
+                profiling.from_environment() in the entry point of the script)"""
+        if profile:
+            profiling.start(None if profile == True else profile)
+        profiler = profiling.get()
 
         # user and https session parameters
         self.host = host
         if not self.host: self.host = self._select_cloud()
+        self.scheme = scheme
         self.email = email
         self.password = password
         self.first_name = ""
@@ -47,18 +99,50 @@ class Mist_Session(Req):
         self.session_expiry = ""
         self.tags = []
         self.authenticated = False
-        self.session = requests.session()
+        if adapter == None:
+            adapter = self.new_adapter(pool_connections, pool_maxsize, connect_retries)
+        self.adapter = adapter
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = self._new_session()
+        if cache_file:
+            self.cache = ResponseCache(cache_file, cache_ttls)
+        else:
+            self.cache = None
+        self.singleflight = SingleFlight(memo_ttl)
         self.csrftoken = ""
         self.apitoken = apitoken
+        self.page_workers = page_workers
+        self.max_retries = max_retries
+        if rate_limiter != None:
+            self.rate_limiter = rate_limiter
+        elif requests_per_hour:
+            self.rate_limiter = RateLimiter(requests_per_hour, burst)
+        else:
+            self.rate_limiter = None
+        self.hooks = list(request_hooks or [])
+        if profiler != None:
+            self.hooks.append(profiler)
+        self.cassette = cassette
+        if identity_cache_file:
+            self.identity_cache = IdentityCache(identity_cache_file, identity_ttl)
+        else:
+            self.identity_cache = None
+        self.self_loaded = False
         #Try to log in
-        if session_file != None:
-            self._restore_session(session_file)
-        if self.authenticated == False:
-            self._credentials(load_settings)
-        # if successfuly authenticated
-        if (self.get_authenticated()): self.getself()
+        with profiling.phase("auth"):
+            if apitoken:
+                self._set_apitoken(apitoken)
+            elif session_file != None:
+                self._restore_session(session_file)
+            if self.authenticated == False and not self.apitoken:
+                self._credentials(load_settings)
+            # if successfuly authenticated
+            if (self.get_authenticated()):
+                # the user information may already be retrieved when restoring the session
+                if not self.self_loaded: self.getself()
         # if authentication failed, exit with error code 255
-        else:
+        if not self.get_authenticated():
             console.alert("Authentication failed... Exiting...") 
             exit(255)
 
@@ -70,7 +154,7 @@ class Mist_Session(Req):
             if hasattr(self, field) and getattr(self, field) != "":
                 string += "%s:\r\n" % field
                 if field == "privileges":
-                    string += Privileges(self.privileges).display()
+                    string += self.privileges.display()
                     string += "\r\n"
                 elif field == "tags":
                     for tag in self.tags:
@@ -95,8 +179,8 @@ class Mist_Session(Req):
                     elif "host" in line:
                         self.host = line["host"]
             console.info("Session restored.")
-            console.debug("Cookies > %s" % self.session.cookies)
-            console.debug("Host > %s" % self.host) 
+            console.debug("Cookies > %s", self.session.cookies)
+            console.debug("Host > %s", self.host) 
             self._set_authenticated(True)
             valid = self.getself()
             if valid == False:
@@ -130,7 +214,7 @@ class Mist_Session(Req):
                     print("Please enter a number.")
 
     def _credentials(self, load_settings=True):
-        self.session = requests.session()
+        self.session = self._new_session()
         try:
             if not load_settings:
                 if not self.host: self._select_cloud()
@@ -177,7 +261,7 @@ class Mist_Session(Req):
             "email": self.email,
             "password": self.password
         }
-        resp = self.session.post(self._url(uri), json=body)
+        resp = self.session.post(self._url(uri), json=body, timeout=self.timeout)
         if resp.status_code == 200:
             console.notice("authenticated")
             self._set_authenticated(True)
@@ -191,6 +275,8 @@ class Mist_Session(Req):
 
     def logout(self):
         uri = "/api/v1/logout"
+        if self.identity_cache != None:
+            self.identity_cache.forget(self.identity_cache.key(self.host, self._identity_secret()))
         resp = self.mist_post(uri)
         if resp['status_code'] == 200:
             console.warning("Logged out")
@@ -216,18 +302,18 @@ class Mist_Session(Req):
         return self.authenticated or self.apitoken != None
 
     def list_api_token(self):
-        uri = "https://%s/api/v1/self/apitokens" % self.host
-        resp = self.session.get(uri)
+        uri = self._url("/api/v1/self/apitokens")
+        resp = self.session.get(uri, timeout=self.timeout)
         return resp
 
     def create_api_token(self):
-        uri = "https://%s/api/v1/self/apitokens" % self.host
-        resp = self.session.post(uri)
+        uri = self._url("/api/v1/self/apitokens")
+        resp = self.session.post(uri, timeout=self.timeout)
         return resp
 
     def delete_api_token(self, token_id):
-        uri = "https://%s/api/v1/self/apitokens/%s" % (self.host, token_id)
-        resp = self.session.delete(uri)
+        uri = self._url("/api/v1/self/apitokens/%s" % token_id)
+        resp = self.session.delete(uri, timeout=self.timeout)
         return resp
 
     def two_factor_authentication(self, two_factor):
@@ -237,28 +323,28 @@ class Mist_Session(Req):
             "password": self.password,
             "two_factor": two_factor
         }
-        resp = self.session.post(self._url(uri), json=body)
+        resp = self.session.post(self._url(uri), json=body, timeout=self.timeout)
         if resp.status_code == 200:
             console.notice("2FA authentication successed")
             self._set_authenticated(True)
             return True
         else:
             console.error("2FA authentication failed")
-            console.error("Error code: %s" % resp.status_code)
+            console.error("Error code: %s", resp.status_code)
             exit(255)
             return False
 
     def two_factor_authentication_token(self, two_factor):        
         uri = "/api/v1/login/two_factor"
         body = { "two_factor": two_factor }
-        resp = self.session.post(self._url(uri), json=body)
+        resp = self.session.post(self._url(uri), json=body, timeout=self.timeout)
         if resp.status_code == 200:
             console.notice("2FA authentication successed")
             self._set_authenticated(True)
             return True
         else:
             console.error("2FA authentication failed")
-            console.error("Error code: %s" % resp.status_code)
+            console.error("Error code: %s", resp.status_code)
             exit(255)
             return False        
     
@@ -267,6 +353,14 @@ class Mist_Session(Req):
         Params: password (optional. Only needed for 2FA processing)
         Return: none"""
         uri = "/api/v1/self"
+        identity_key = None
+        if self.identity_cache != None:
+            identity_key = self.identity_cache.key(self.host, self._identity_secret())
+            identity = self.identity_cache.get(identity_key)
+            if identity != None:
+                console.debug("User information loaded from the identity cache")
+                self._set_self(identity)
+                return True
         resp = self.mist_get(uri)
         if resp != None and 'result' in resp:
             # Deal with 2FA if needed
@@ -284,19 +378,31 @@ class Mist_Session(Req):
                     self.getself()
             # Get details of the account 
             else:
-                for key, val in resp['result'].items():
-                    if key == "privileges":
-                        self.privileges = Privileges(resp['result']["privileges"])
-                    if key == "tags":
-                        for tag in resp['result']["tags"]:
-                            self.tags.append(tag)
-                    else:
-                        setattr(self, key, val)
+                self._set_self(resp['result'])
+                if self.identity_cache != None:
+                    self.identity_cache.store(identity_key, resp['result'])
                 return True
         else:
             console.error("Authentication not valid...")
             return False
 
+    def _set_self(self, result):
+        """Store the user information (/api/v1/self result) in the current object"""
+        for key, val in result.items():
+            if key == "privileges":
+                self.privileges = Privileges(result["privileges"])
+            elif key == "tags":
+                self.tags = list(result["tags"])
+            else:
+                setattr(self, key, val)
+        self.self_loaded = True
+
+    def _identity_secret(self):
+        """Return: API token, or session cookies, identifying the user in the identity cache"""
+        if self.apitoken:
+            return self.apitoken
+        return ";".join(sorted("%s=%s" % (cookie.name, cookie.value) for cookie in self.session.cookies))
+
     def save(self, file_path="./session.py"):
         if self.apitoken != None:
             console.error("API Token used. There is no cookies to save...")
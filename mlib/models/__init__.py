@@ -1,4 +1,20 @@
-from . import sites
-from . import orgs
-from . import privilege
-from . import wlan
\ No newline at end of file
+import importlib
+
+# the modules are only imported when they are used (PEP 562)
+_modules = [
+    "sites",
+    "orgs",
+    "privilege",
+    "wlan",
+]
+__all__ = _modules
+
+
+def __getattr__(name):
+    if name in _modules:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + _modules)
@@ -1,13 +1,43 @@
+class Privileges:
+    """Privileges of the current user (from /api/v1/self).
 
-from tabulate import tabulate
+    The privileges can be used as the list of privileges returned by the API (each entry
+    behaves like a dict), and are indexed by org_id, site_id, sitegroup_id and msp_id
+    when created, so the lookups do not depend on the number of privileges.
+    """
 
-class Privileges:
     def __init__(self, privileges):
         self.privileges = []
+        self._orgs = {}
+        self._sites = {}
+        self._sitegroups = {}
+        self._msps = {}
+        self._org_sites = {}
         for privilege in privileges:
-            self.privileges.append(_Privilege(privilege))           
+            entry = _Privilege(privilege)
+            self.privileges.append(entry)
+            if entry.scope == "org":
+                self._orgs.setdefault(entry.org_id, entry)
+            elif entry.scope == "site":
+                self._sites.setdefault(entry.site_id, entry)
+                self._org_sites.setdefault(entry.org_id, []).append(entry)
+            elif entry.scope == "sitegroup":
+                self._sitegroups.setdefault(entry.get("sitegroup_id", ""), entry)
+            elif entry.scope == "msp":
+                self._msps.setdefault(entry.msp_id, entry)
+
+    def __iter__(self):
+        return iter(self.privileges)
+
+    def __len__(self):
+        return len(self.privileges)
+
+    def __getitem__(self, index):
+        return self.privileges[index]
 
     def __str__(self):
+        # imported here, as it is only needed to display the privileges
+        from tabulate import tabulate
         columns_headers = ["scope", "name", "site_id", "org_name", "org_id", 'msp_name', "msp_id" ]
         table = []
         for entry in self.privileges:
@@ -22,7 +52,67 @@ class Privileges:
 
     def display(self):
         return str(self)
-        
+
+    def org(self, org_id):
+        """Return: org privilege of the org, or None"""
+        return self._orgs.get(org_id)
+
+    def site(self, site_id):
+        """Return: site privilege of the site, or None"""
+        return self._sites.get(site_id)
+
+    def sitegroup(self, sitegroup_id):
+        """Return: sitegroup privilege of the sitegroup, or None"""
+        return self._sitegroups.get(sitegroup_id)
+
+    def msp(self, msp_id):
+        """Return: msp privilege of the msp, or None"""
+        return self._msps.get(msp_id)
+
+    def orgs(self):
+        """Return: list of the org privileges"""
+        return list(self._orgs.values())
+
+    def sites(self, org_id=None):
+        """Return: list of the site privileges (of an org)"""
+        if org_id == None:
+            return list(self._sites.values())
+        return list(self._org_sites.get(org_id, []))
+
+    def site_orgs(self):
+        """Return: list of the org ids where the user has site privileges"""
+        return list(self._org_sites)
+
+    def org_role(self, org_id):
+        """Return: role of the user on the org, or None if unknown"""
+        privilege = self._orgs.get(org_id)
+        if privilege == None:
+            return None
+        return privilege.role
+
+    def site_role(self, site_id):
+        """Return: role of the user on the site (site privilege, or org privilege of the
+        site's org), or None if unknown"""
+        privilege = self._sites.get(site_id)
+        if privilege == None:
+            return None
+        org_role = self.org_role(privilege.org_id)
+        if org_role in ["write", "admin"]:
+            return org_role
+        return privilege.role
+
+    def is_read_only(self, org_id="", site_id=""):
+        """Check if the privileges known for an org or a site only allow to read it.
+        Unknown orgs and sites (e.g. accessed through an MSP privilege) are not
+        considered as read-only.
+        Params: org_id, site_id
+        Return: True if the user can't change the org/site"""
+        if org_id != "":
+            return self.org_role(org_id) == "read"
+        elif site_id != "":
+            return self.site_role(site_id) == "read"
+        return False
+
 
 class _Privilege:
     def __init__(self, privilege):
@@ -36,10 +126,25 @@ class _Privilege:
         self.role = ""
         self.site_id = ""
         self.sitegroup_ids = ""
+        self._data = dict(privilege)
         for key, val in privilege.items():
             setattr(self, key, val)
 
+    # the privilege can also be used as the dict returned by the API
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def keys(self):
+        return self._data.keys()
 
+    def items(self):
+        return self._data.items()
 
     def __str__(self):
         fields = ["scope", "org_id", "org_name", "msp_id", "msp_name",
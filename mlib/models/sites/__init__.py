@@ -1,3 +1,29 @@
-from .settings import Settings
-from .webhooks import Webhook
-from .psks import Psk
\ No newline at end of file
+import importlib
+
+# the modules and classes are only imported when they are used (PEP 562)
+_modules = [
+    "psks",
+    "rogue",
+    "settings",
+    "webhooks",
+]
+_classes = {
+    "Settings": ".settings",
+    "Webhook": ".webhooks",
+    "Psk": ".psks",
+}
+__all__ = list(_classes) + _modules
+
+
+def __getattr__(name):
+    if name in _modules:
+        return importlib.import_module("." + name, __name__)
+    if name in _classes:
+        value = getattr(importlib.import_module(_classes[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,282 @@
+"""
+Profiling of the scripts: CPU profile, wall-clock time, peak memory and number of HTTP
+requests of each phase of a run (auth, listing, per-site work, file I/O...), saved to a
+single JSON report file so the runs can be compared.
+
+The profiling is enabled for the scripts calling profiling.from_environment() in their
+entry point (e.g. org_conf_backup.py, org_conf_restore.py) by adding "--profile" (or
+"--profile=<report file>") to their command line, or by setting the MLIB_PROFILE
+environment variable ("1", or the report file). Mist_Session only attaches the active
+profiler, it does not read the command line:
+
+    python3 org_conf_restore.py --profile
+    MLIB_PROFILE=restore.json python3 org_conf_restore.py
+
+The report is saved when the script exits. The phases are marked in the code with:
+
+    with profiling.phase("sites"):
+        ...
+
+Phases can be nested (e.g. "restore/site"), and a phase entered several times (e.g.
+once per site) is reported once, with the number of calls. The phases are tracked in
+the main thread: the HTTP requests are counted in the innermost phase active when they
+complete, including the requests sent by worker threads. The CPU profile only covers
+the main thread, and tracemalloc slows down the run, so the timings of a profiled run
+should only be compared with other profiled runs. Before Python 3.9, the peak memory
+of a phase is the peak since the beginning of the run (tracemalloc.reset_peak() is not
+available).
+"""
+import atexit
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+ENV_VAR = "MLIB_PROFILE"
+ARG = "--profile"
+
+_profiler = None
+
+
+class _Phase:
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0
+        self.requests = 0
+        self.request_time = 0
+        self.errors = 0
+        self.peak_memory = 0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall": round(self.wall, 6),
+            "requests": self.requests,
+            "request_time": round(self.request_time, 6),
+            "errors": self.errors,
+            "peak_memory": self.peak_memory,
+        }
+
+
+class Profiler:
+    """Collect the profile of a run. The Profiler is also a request hook (see
+    Req.add_hook), counting the HTTP requests of the current phase."""
+
+    def __init__(self, report_file=None, cpu=True, memory=True, top=40):
+        """Params:
+            report_file: JSON file where the report is written. Default to
+                mlib_profile_<date>.json in the current directory
+            cpu: collect the CPU profile (cProfile) of the main thread
+            memory: collect the peak memory (tracemalloc)
+            top: number of functions saved in the report, by cumulative time"""
+        if report_file == None:
+            report_file = "mlib_profile_%s.json" % datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        # the scripts may change the current directory
+        self.report_file = os.path.abspath(report_file)
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.lock = threading.Lock()
+        self.phases = {}
+        # stack of [phase path, start time, peak memory of the nested phases]
+        self.stack = []
+        self.total = _Phase("")
+        self.cpu_profile = None
+        self.start_time = None
+        self.started = None
+
+    def __call__(self, event):
+        with self.lock:
+            phases = [self.total]
+            if self.stack:
+                phases.append(self.phases[self.stack[-1][0]])
+            for phase in phases:
+                phase.requests += 1
+                phase.request_time += event.latency
+                if event.error or event.status_code == None or event.status_code >= 400:
+                    phase.errors += 1
+
+    def start(self):
+        self.started = datetime.datetime.now()
+        self.start_time = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cpu:
+            self.cpu_profile = cProfile.Profile()
+            self.cpu_profile.enable()
+        return self
+
+    def stop(self):
+        if self.start_time == None:
+            return
+        if self.cpu_profile != None:
+            self.cpu_profile.disable()
+        while self.stack:
+            self._exit()
+        self.total.calls = 1
+        self.total.wall = time.perf_counter() - self.start_time
+        self.total.peak_memory = max(self.total.peak_memory, self._peak())
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.start_time = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measure a phase of the run
+        Params: phase name"""
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def _peak(self):
+        if self.memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[1]
+        return 0
+
+    def _enter(self, name):
+        with self.lock:
+            if self.stack:
+                name = self.stack[-1][0] + "/" + name
+                self.stack[-1][2] = max(self.stack[-1][2], self._peak())
+            else:
+                self.total.peak_memory = max(self.total.peak_memory, self._peak())
+            if not name in self.phases:
+                self.phases[name] = _Phase(name)
+            if self.memory and tracemalloc.is_tracing():
+                _reset_peak()
+            self.stack.append([name, time.perf_counter(), 0])
+
+    def _exit(self):
+        with self.lock:
+            name, start, nested_peak = self.stack.pop()
+            phase = self.phases[name]
+            phase.calls += 1
+            phase.wall += time.perf_counter() - start
+            peak = max(nested_peak, self._peak())
+            phase.peak_memory = max(phase.peak_memory, peak)
+            # the peak of the phase is also a peak of the enclosing phase
+            if self.stack:
+                self.stack[-1][2] = max(self.stack[-1][2], peak)
+            else:
+                self.total.peak_memory = max(self.total.peak_memory, peak)
+            if self.memory and tracemalloc.is_tracing():
+                _reset_peak()
+
+    def _cpu_functions(self):
+        if self.cpu_profile == None:
+            return []
+        stats = pstats.Stats(self.cpu_profile)
+        functions = []
+        for (file_name, line, function), (primitive_calls, calls, tottime, cumtime, callers) in stats.stats.items():
+            functions.append({
+                "function": "%s:%s(%s)" % (file_name, line, function),
+                "calls": calls,
+                "tottime": round(tottime, 6),
+                "cumtime": round(cumtime, 6),
+            })
+        functions.sort(key=lambda entry: entry["cumtime"], reverse=True)
+        return functions[:self.top]
+
+    def report(self):
+        """Return: profile of the run, as a dict"""
+        total = self.total.to_dict()
+        del total["name"]
+        # time spent outside of the top level phases
+        total["unattributed_wall"] = round(self.total.wall - sum(phase.wall for phase in self.phases.values() if not "/" in phase.name), 6)
+        return {
+            "started": self.started.isoformat(timespec="seconds") if self.started else None,
+            "command": sys.argv,
+            "python": platform.python_version(),
+            "total": total,
+            "phases": [phase.to_dict() for phase in self.phases.values()],
+            "cpu": self._cpu_functions(),
+        }
+
+    def save(self):
+        """Write the report to the report file"""
+        with open(self.report_file, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        console.notice("Profile report saved to %s", self.report_file)
+
+
+def _reset_peak():
+    # Python 3.9+
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+
+
+def start(report_file=None, **kwargs):
+    """Start the profiling of the run (if not already started). The report is saved
+    when the process exits.
+    Params: report file, Profiler parameters
+    Return: the Profiler"""
+    global _profiler
+    if _profiler == None:
+        _profiler = Profiler(report_file, **kwargs).start()
+        atexit.register(_save)
+    return _profiler
+
+
+def _save():
+    if _profiler != None and _profiler.start_time != None:
+        _profiler.stop()
+        _profiler.save()
+
+
+def get():
+    """Return: the active Profiler, or None"""
+    return _profiler
+
+
+def from_environment():
+    """Start the profiling if requested by the command line (--profile or
+    --profile=<report file>, removed from sys.argv) or by the MLIB_PROFILE environment
+    variable. To be called once, in the entry point of the scripts
+    Return: the active Profiler, or None"""
+    report_file = None
+    requested = False
+    for arg in list(sys.argv[1:]):
+        if arg == ARG or arg.startswith(ARG + "="):
+            sys.argv.remove(arg)
+            requested = True
+            if "=" in arg:
+                report_file = arg.split("=", 1)[1]
+    value = os.environ.get(ENV_VAR, "")
+    if not requested and value and not value.lower() in ["0", "false", "no"]:
+        requested = True
+        if not value.lower() in ["1", "true", "yes"]:
+            report_file = value
+    if requested:
+        return start(report_file)
+    return _profiler
+
+
+def phase(name):
+    """Context manager measuring a phase of the run. Does nothing if the profiling is
+    not enabled
+    Params: phase name"""
+    # the phases are only tracked in the main thread, the requests of the worker
+    # threads are counted in the phase of the main thread
+    if _profiler == None or threading.current_thread() is not threading.main_thread():
+        return contextlib.nullcontext()
+    return _profiler.phase(name)
@@ -1,3 +1,4 @@
 from . import orgs
 from . import sites
+from . import registry
 from .route import route
\ No newline at end of file
@@ -1,27 +1,43 @@
-from . import admins
-from . import alarmtemplates
-from . import assetfilters
-from . import channels
-from . import deviceprofiles
-from . import info
-from . import inventory
-from . import licenses
-from . import mxclusters
-from . import mxedges
-from . import mxtunnels
-from . import psks
-from . import rftemplates
-from . import secpolicies
-from . import settings
-from . import sitegroups
-from . import sites
-from . import ssoroles
-from . import ssos
-from . import stats
-from . import subscriptions
-from . import templates
-from . import webhooks
-from . import wlans
-from . import wxrules
-from . import wxtags
-from . import wxtunnels
\ No newline at end of file
+import importlib
+
+# the modules are only imported when they are used (PEP 562)
+_modules = [
+    "admins",
+    "alarmtemplates",
+    "assetfilters",
+    "channels",
+    "deviceprofiles",
+    "info",
+    "inventory",
+    "licenses",
+    "mxclusters",
+    "mxedges",
+    "mxtunnels",
+    "psks",
+    "rftemplates",
+    "secpolicies",
+    "settings",
+    "sitegroups",
+    "sites",
+    "ssoroles",
+    "ssos",
+    "stats",
+    "subscriptions",
+    "templates",
+    "webhooks",
+    "wlans",
+    "wxrules",
+    "wxtags",
+    "wxtunnels",
+]
+__all__ = _modules
+
+
+def __getattr__(name):
+    if name in _modules:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + _modules)
@@ -5,6 +5,11 @@ def get(mist_session, org_id, page=1, limit=100):
     resp = mist_session.mist_get(uri, org_id=org_id, page=page, limit=limit)
     return resp
 
+def get_iter(mist_session, org_id, limit=100):
+    uri = "/api/v1/orgs/%s/inventory" % org_id
+    resp = mist_session.mist_iter(uri, org_id=org_id, limit=limit)
+    return resp
+
 def add(mist_session, org_id, serials):
     uri = "/api/v1/orgs/%s/inventory" % org_id
     body = serials
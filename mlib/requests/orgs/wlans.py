@@ -18,8 +18,7 @@ def delete(mist_session, org_id, wlan_id):
 
 def add_portal_image(mist_session, org_id, wlan_id, image_path):
     uri = "/api/v1/orgs/%s/wlans/%s/portal_image" %(org_id, wlan_id)
-    files = {'file': open(image_path, 'rb').read()}
-    resp = mist_session.mist_post_file(uri, org_id=org_id, files=files)
+    resp = mist_session.mist_post_file(uri, org_id=org_id, file_path=image_path)
     return resp
 
 def delete_portal_image(mist_session, org_id, wlan_id):
@@ -38,8 +37,12 @@ def report(mist_session, org_id, fields):
     wlans = get(mist_session, org_id)
     
     result = []
+    # many WLANs share the same template
+    templates_details = {}
     for wlan in wlans['result']:
-        template = templates.get_details(mist_session, org_id, wlan["template_id"])['result']
+        if not wlan["template_id"] in templates_details:
+            templates_details[wlan["template_id"]] = templates.get_details(mist_session, org_id, wlan["template_id"])['result']
+        template = templates_details[wlan["template_id"]]
         if "applies" in template and "site_ids" in template["applies"]:
             temp = []
             for field in fields:
@@ -0,0 +1,97 @@
+"""
+Registry of the API resources, by scope ("orgs" or "sites") and resource name.
+Each resource gives the module with its request functions (get, create, update,
+delete...) used by the generic tools (restore, zeroise...), and the fields to remove
+before creating an object. Other packages can register their own resources, or replace
+the existing ones:
+
+    from mlib.requests import registry
+    registry.register("sites", "myobjects", my_module)
+"""
+import importlib
+
+# fields set by the Mist Cloud, which must be removed before creating an object
+READ_ONLY_FIELDS = ["id", "org_id", "modified_time", "created_time"]
+
+
+class Resource:
+    """API resource registered in the registry"""
+
+    def __init__(self, scope, name, module, read_only_fields=None):
+        """Params:
+            scope: "orgs" or "sites"
+            name: resource name, e.g. "wlans"
+            module: module with the request functions, or its name (imported on first use)
+            read_only_fields: fields removed before creating an object. Default to READ_ONLY_FIELDS"""
+        self.scope = scope
+        self.name = name
+        self._module = module
+        if read_only_fields == None:
+            read_only_fields = READ_ONLY_FIELDS
+        self.read_only_fields = read_only_fields
+
+    def __repr__(self):
+        return "<Resource %s.%s>" % (self.scope, self.name)
+
+    @property
+    def module(self):
+        if type(self._module) == str:
+            self._module = importlib.import_module(self._module)
+        return self._module
+
+    def clean(self, data):
+        """Remove the read-only fields of an object
+        Params: object
+        Return: object"""
+        for field in self.read_only_fields:
+            if field in data:
+                del data[field]
+        return data
+
+
+_resources = {}
+
+
+def register(scope, name, module, **metadata):
+    """Register a resource. An existing resource with the same scope and name is replaced.
+    Params: scope, name, module (or module name) and read_only_fields (see Resource)
+    Return: Resource"""
+    resource = Resource(scope, name, module, **metadata)
+    _resources[(scope, name)] = resource
+    return resource
+
+
+def unregister(scope, name):
+    _resources.pop((scope, name), None)
+
+
+def get(scope, name):
+    """Return: Resource, or None if not registered"""
+    return _resources.get((scope, name))
+
+
+def resources(scope=None):
+    """Return: list of the registered resources (of a scope), in the registration order"""
+    return [resource for resource in _resources.values() if scope == None or resource.scope == scope]
+
+
+def _register_builtins():
+    orgs = [
+        "admins", "alarmtemplates", "assetfilters", "channels", "deviceprofiles",
+        "info", "inventory", "licenses", "mxclusters", "mxedges", "mxtunnels", "psks",
+        "rftemplates", "secpolicies", "settings", "sitegroups", "sites", "ssoroles",
+        "ssos", "stats", "subscriptions", "templates", "webhooks", "wlans", "wxrules",
+        "wxtags", "wxtunnels",
+    ]
+    sites = [
+        "assetfilters", "assets", "beacons", "client_events", "const", "devices",
+        "info", "insights", "iot", "location", "maps", "psks", "rogues", "rrm",
+        "rssizones", "settings", "stats", "system_events", "vbeacons", "webhooks",
+        "wlans", "wxrules", "wxtags", "wxtunnels", "zones",
+    ]
+    for scope, names in [("orgs", orgs), ("sites", sites)]:
+        for name in names:
+            register(scope, name, "mlib.requests.%s.%s" % (scope, name))
+
+
+_register_builtins()
@@ -4,28 +4,44 @@ as small as a coffee shop or a five-star 600-room hotel. A
 site contains a set of Maps, Wlans, Policies, Zones.
 """
 
-from . import assetfilters
-from . import assets
-from . import beacons
-from . import client_events
-from . import const
-from . import devices
-from . import info
-from . import insights
-from . import iot
-from . import location
-from . import maps
-from . import psks
-from . import rogues
-from . import rrm
-from . import rssizones
-from . import settings
-from . import stats
-from . import system_events
-from . import vbeacons
-from . import webhooks
-from . import wlans
-from . import wxrules
-from . import wxtags
-from . import wxtunnels
-from . import zones
\ No newline at end of file
+import importlib
+
+# the modules are only imported when they are used (PEP 562)
+_modules = [
+    "assetfilters",
+    "assets",
+    "beacons",
+    "client_events",
+    "const",
+    "devices",
+    "info",
+    "insights",
+    "iot",
+    "location",
+    "maps",
+    "psks",
+    "rogues",
+    "rrm",
+    "rssizones",
+    "settings",
+    "stats",
+    "system_events",
+    "vbeacons",
+    "webhooks",
+    "wlans",
+    "wxrules",
+    "wxtags",
+    "wxtunnels",
+    "zones",
+]
+__all__ = _modules
+
+
+def __getattr__(name):
+    if name in _modules:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + _modules)
@@ -38,8 +38,7 @@ def delete(mist_session, site_id, device_id):
 
 def add_image(mist_session, site_id, device_id, image_num, image_path):
     uri = "/api/v1/sites/%s/devices/%s/image%s" %(site_id, device_id, image_num)
-    files = {'file': open(image_path, 'rb').read()}
-    resp = mist_session.mist_post_file(uri, site_id=site_id, files=files)
+    resp = mist_session.mist_post_file(uri, site_id=site_id, file_path=image_path)
     return resp
 
 def set_device_conf(mist_session, site_id, device_id, conf):
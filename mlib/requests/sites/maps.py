@@ -17,8 +17,7 @@ def create(mist_session, site_id, map_settings):
 
 def add_image(mist_session, site_id, map_id, image_path):
     uri = "/api/v1/sites/%s/maps/%s/image" %(site_id, map_id)
-    files = {'file': open(image_path, 'rb').read()}
-    resp = mist_session.mist_post_file(uri, site_id=site_id, files=files)
+    resp = mist_session.mist_post_file(uri, site_id=site_id, file_path=image_path)
     return resp
 
 def delete_image(mist_session, site_id, map_id):
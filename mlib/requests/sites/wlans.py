@@ -18,8 +18,7 @@ def delete(mist_session, site_id, wlan_id):
 
 def add_portal_image(mist_session, site_id, wlan_id, image_path):
     uri = "/api/v1/sites/%s/wlans/%s/portal_image" %(site_id, wlan_id)
-    files = {'file': open(image_path, 'rb').read()}
-    resp = mist_session.mist_post_file(uri, site_id=site_id, files=files)
+    resp = mist_session.mist_post_file(uri, site_id=site_id, file_path=image_path)
     return resp
 
 def delete_portal_image(mist_session, site_id, wlan_id):
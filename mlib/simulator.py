@@ -0,0 +1,423 @@
+"""
+Local stand-in for the Mist API, to test and benchmark the library and the scripts
+without a Mist Cloud account.
+
+The simulator is a generic in-memory REST server: every collection of the API (e.g.
+/api/v1/sites/<site_id>/maps) can be listed (with the X-Page-* pagination headers),
+created, updated and deleted. It can be seeded with synthetic orgs, and can simulate
+the network latency, the API rate limiting (429 responses) and server errors.
+
+Usage from Python:
+
+    with MistSimulator(latency=0.05) as simulator:
+        simulator.seed(orgs=1, sites=100, devices=20)
+        mist_session = mlib.Mist_Session(host=simulator.host, scheme="http", apitoken=simulator.apitoken)
+
+Or from the command line (the host and the API token to use are displayed):
+
+    python3 -m mlib.simulator --port 8080 --sites 100 --devices 20
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .__uri import route_template
+
+try:
+    from config import log_level
+except:
+    log_level = 6
+finally:
+    from .__debug import Console
+    console = Console(log_level)
+
+# last path segments of the endpoints returning a single object instead of a list
+_SINGLETONS = ["setting", "stats", "licenses", "portal_template", "current", "self"]
+# last path segments of the file upload endpoints
+_UPLOADS = ["image", "image1", "image2", "image3", "portal_image"]
+# small valid PNG file, served as maps image
+_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+class _Store:
+    """In-memory objects, by collection path"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # collection path: {id: object}
+        self.collections = {}
+        # id: collection path
+        self.ids = {}
+        # path: object, for the singletons (settings...)
+        self.singletons = {}
+
+    def add(self, collection, data):
+        now = int(time.time())
+        data = dict(data)
+        data.setdefault("id", str(uuid.uuid4()))
+        data.setdefault("created_time", now)
+        data["modified_time"] = now
+        self.collections.setdefault(collection, {})[data["id"]] = data
+        self.ids[data["id"]] = collection
+        return data
+
+    def find(self, object_id):
+        collection = self.ids.get(object_id)
+        if collection == None:
+            return None
+        return self.collections[collection].get(object_id)
+
+    def delete(self, object_id):
+        collection = self.ids.pop(object_id, None)
+        if collection != None:
+            return self.collections[collection].pop(object_id, None)
+
+
+class MistSimulator:
+    """Local HTTP server simulating the Mist API"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, requests_per_hour=None, burst=100, error_rate=0, seed=None):
+        """Params:
+            host, port: address to listen on (port 0 to use a free port)
+            latency: delay (in seconds) added to each response
+            jitter: random delay (in seconds, from 0 to jitter) added to the latency
+            requests_per_hour, burst: token bucket limiting the requests, like the Mist
+                API limit (5000 requests per hour). 429 responses with a Retry-After
+                header are returned when exceeded. None to disable it
+            error_rate: ratio (0 to 1) of the requests answered with a 503 error
+            seed: random seed of the generated values (names, MACs, positions...) and errors"""
+        self.latency = latency
+        self.jitter = jitter
+        self.requests_per_hour = requests_per_hour
+        self.burst = burst
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.store = _Store()
+        self.apitoken = uuid.uuid4().hex
+        self.orgs = []
+        self.requests = 0
+        self.tokens = burst
+        self.tokens_time = time.monotonic()
+        self.rate_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+        self.host = "%s:%s" % self.server.server_address[:2]
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        """Start the server in a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        console.info("Mist simulator listening on http://%s", self.host)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve_forever(self):
+        console.info("Mist simulator listening on http://%s", self.host)
+        self.server.serve_forever()
+
+    ######## DATA ########
+
+    def seed(self, orgs=1, sites=10, devices=10, maps=1, wlans=2, org_wlans=2, templates=1):
+        """Create synthetic orgs
+        Params: number of orgs, and number of sites per org, and of devices, maps and
+            wlans per site, and of wlans and templates per org
+        Return: list of the created orgs"""
+        created = []
+        with self.store.lock:
+            for org_index in range(orgs):
+                org = self.store.add("/api/v1/orgs", {"name": "Org %s" % (len(self.orgs) + 1)})
+                org_id = org["id"]
+                self.orgs.append(org)
+                created.append(org)
+                self.store.singletons["/api/v1/orgs/%s/setting" % org_id] = {"org_id": org_id, "password_policy": {"enabled": False}}
+                template_ids = []
+                for index in range(templates):
+                    template = self.store.add("/api/v1/orgs/%s/templates" % org_id, {"name": "Template %s" % index, "org_id": org_id})
+                    template_ids.append(template["id"])
+                for index in range(org_wlans):
+                    self.store.add("/api/v1/orgs/%s/wlans" % org_id, {
+                        "ssid": "Org WLAN %s" % index,
+                        "org_id": org_id,
+                        "template_id": template_ids[index % len(template_ids)] if template_ids else None,
+                        "enabled": True,
+                        "auth": {"type": "psk", "psk": "secret%s" % index},
+                        "vlan_enabled": False,
+                    })
+                for site_index in range(sites):
+                    self._seed_site(org_id, site_index, devices, maps, wlans)
+        return created
+
+    def _seed_site(self, org_id, site_index, devices, maps, wlans):
+        site = self.store.add("/api/v1/orgs/%s/sites" % org_id, {
+            "name": "Site %s" % site_index,
+            "org_id": org_id,
+            "timezone": "Europe/Paris",
+            "country_code": "FR",
+            "address": "%s Simulator Street" % site_index,
+            "latlng": {"lat": 48.85 + self.random.random(), "lng": 2.35 + self.random.random()},
+        })
+        site_id = site["id"]
+        self.store.singletons["/api/v1/sites/%s/setting" % site_id] = {"site_id": site_id, "rogue": {"enabled": False}}
+        map_ids = []
+        for index in range(maps):
+            map_id = str(uuid.uuid4())
+            self.store.add("/api/v1/sites/%s/maps" % site_id, {
+                "id": map_id,
+                "name": "Floor %s" % index,
+                "site_id": site_id,
+                "org_id": org_id,
+                "type": "image",
+                "width": 1000,
+                "height": 800,
+                "ppm": 10,
+                "url": "http://%s/simulator/files/%s.png" % (self.host, map_id),
+            })
+            map_ids.append(map_id)
+        for index in range(wlans):
+            self.store.add("/api/v1/sites/%s/wlans" % site_id, {
+                "ssid": "Site WLAN %s" % index,
+                "site_id": site_id,
+                "org_id": org_id,
+                "enabled": True,
+                "auth": {"type": "open"},
+            })
+        for index in range(devices):
+            mac = "5c5b35%06x" % self.random.getrandbits(24)
+            device = {
+                "mac": mac,
+                "serial": "A%011d" % self.random.getrandbits(32),
+                "model": self.random.choice(["AP41", "AP43", "AP32", "AP12"]),
+                "type": "ap",
+                "name": "AP %s-%s" % (site_index, index),
+                "site_id": site_id,
+                "org_id": org_id,
+                "map_id": map_ids[index % len(map_ids)] if map_ids else None,
+                "x": self.random.randint(0, 1000),
+                "y": self.random.randint(0, 800),
+            }
+            device = self.store.add("/api/v1/sites/%s/devices" % site_id, device)
+            self.store.add("/api/v1/orgs/%s/inventory" % org_id, {
+                "id": device["id"],
+                "mac": mac,
+                "serial": device["serial"],
+                "model": device["model"],
+                "type": "ap",
+                "site_id": site_id,
+                "org_id": org_id,
+                "connected": True,
+            })
+            # the inventory entry shares the device id
+            self.store.ids[device["id"]] = "/api/v1/sites/%s/devices" % site_id
+
+    def _self(self):
+        privileges = []
+        for org in self.orgs:
+            privileges.append({"scope": "org", "org_id": org["id"], "name": org["name"], "role": "admin"})
+        return {
+            "email": "simulator@example.com",
+            "first_name": "Mist",
+            "last_name": "Simulator",
+            "phone": "",
+            "via_sso": False,
+            "privileges": privileges,
+            "tags": [],
+        }
+
+    ######## REQUESTS ########
+
+    def _rate_limited(self):
+        """Return: delay before the next allowed request, or 0 if the request is allowed"""
+        if self.requests_per_hour == None:
+            return 0
+        rate = self.requests_per_hour / 3600
+        with self.rate_lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.tokens_time) * rate)
+            self.tokens_time = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / rate
+
+    def handle(self, method, path, query, body):
+        """Process a request
+        Params: HTTP method, path, query dict, decoded JSON body (or None)
+        Return: (status code, response content, extra headers)"""
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if not path.startswith("/simulator/"):
+            retry_after = self._rate_limited()
+            if retry_after > 0:
+                return (429, {"detail": "Too Many Requests"}, {"Retry-After": str(max(1, round(retry_after)))})
+            if self.error_rate > 0 and self.random.random() < self.error_rate:
+                return (503, {"detail": "Service Unavailable (simulated)"}, {})
+        path = path.rstrip("/")
+        segments = path.split("/")
+        last = segments[-1]
+        if path.startswith("/simulator/files/"):
+            return (200, _PNG, {"Content-Type": "image/png", "ETag": '"%s"' % last})
+        if path == "/api/v1/login":
+            return (200, {}, {"Set-Cookie": "csrftoken=%s; Path=/" % uuid.uuid4().hex})
+        if path in ["/api/v1/logout", "/api/v1/self"] and method != "GET":
+            return (200, {}, {})
+        if path == "/api/v1/self":
+            return (200, self._self(), {})
+        with self.store.lock:
+            if method == "POST" and last in _UPLOADS:
+                return (200, {}, {})
+            if last in _SINGLETONS:
+                return self._singleton(method, path, body)
+            if route_template(path).endswith("/{id}"):
+                return self._item(method, segments[-1], body)
+            return self._collection(method, path, query, body)
+
+    def _singleton(self, method, path, body):
+        if method in ["PUT", "POST"]:
+            data = self.store.singletons.setdefault(path, {})
+            if type(body) == dict:
+                data.update(body)
+            return (200, data, {})
+        elif method == "DELETE":
+            self.store.singletons.pop(path, None)
+            return (200, {}, {})
+        return (200, self.store.singletons.get(path, {}), {})
+
+    def _item(self, method, object_id, body):
+        data = self.store.find(object_id)
+        if data == None:
+            return (404, {"detail": "Object Not Found"}, {})
+        if method == "GET":
+            return (200, data, {})
+        elif method == "PUT":
+            if type(body) == dict:
+                data.update(body)
+                data["id"] = object_id
+                data["modified_time"] = int(time.time())
+            return (200, data, {})
+        elif method == "DELETE":
+            self.store.delete(object_id)
+            return (200, {}, {})
+        return (405, {"detail": "Method Not Allowed"}, {})
+
+    def _collection(self, method, path, query, body):
+        if method == "POST":
+            if type(body) != dict:
+                return (400, {"detail": "Invalid Body"}, {})
+            body = dict(body)
+            body.pop("id", None)
+            scope = path.split("/")
+            if len(scope) > 4 and scope[3] == "orgs":
+                body["org_id"] = scope[4]
+            elif len(scope) > 4 and scope[3] == "sites":
+                body["site_id"] = scope[4]
+            return (200, self.store.add(path, body), {})
+        elif method != "GET":
+            return (405, {"detail": "Method Not Allowed"}, {})
+        items = list(self.store.collections.get(path, {}).values())
+        limit = int(query.get("limit", 100))
+        page = int(query.get("page", 1))
+        headers = {"X-Page-Limit": str(limit), "X-Page-Page": str(page), "X-Page-Total": str(len(items))}
+        return (200, items[(page - 1) * limit:page * limit], headers)
+
+
+def _handler(simulator):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # the headers and the body are written separately: without TCP_NODELAY, each
+        # response on a kept-alive connection waits for the client delayed ACK (~40ms)
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            console.debug("Simulator > " + format, *args)
+
+        def _read_body(self):
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                body = b""
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return body
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+            length = int(self.headers.get("Content-Length", 0))
+            return self.rfile.read(length)
+
+        def _process(self):
+            url = urlsplit(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            raw_body = self._read_body()
+            body = None
+            if raw_body and self.headers.get("Content-Type", "").startswith("application/json"):
+                try:
+                    body = json.loads(raw_body)
+                except ValueError:
+                    body = None
+            try:
+                status_code, content, headers = simulator.handle(self.command, url.path, query, body)
+            except Exception as err:
+                status_code, content, headers = (500, {"detail": str(err)}, {})
+            if type(content) != bytes:
+                content = json.dumps(content).encode()
+                headers.setdefault("Content-Type", "application/json")
+            self.send_response(status_code)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = _process
+        do_POST = _process
+        do_PUT = _process
+        do_DELETE = _process
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Mist API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--orgs", type=int, default=1, help="number of orgs")
+    parser.add_argument("--sites", type=int, default=10, help="number of sites per org")
+    parser.add_argument("--devices", type=int, default=10, help="number of devices per site")
+    parser.add_argument("--latency", type=float, default=0, help="latency added to each response, in seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="random latency added to each response, in seconds")
+    parser.add_argument("--requests-per-hour", type=int, default=None, help="rate limit (429 responses)")
+    parser.add_argument("--error-rate", type=float, default=0, help="ratio of requests answered with a 503 error")
+    args = parser.parse_args()
+    simulator = MistSimulator(args.host, args.port, args.latency, args.jitter, args.requests_per_hour, error_rate=args.error_rate)
+    simulator.seed(orgs=args.orgs, sites=args.sites, devices=args.devices)
+    print("host: %s" % simulator.host)
+    print("apitoken: %s" % simulator.apitoken)
+    print("e.g. Mist_Session(host=\"%s\", scheme=\"http\", apitoken=\"%s\")" % (simulator.host, simulator.apitoken))
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
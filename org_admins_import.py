@@ -11,12 +11,14 @@ The script has 3 different steps:
 '''
 #### PARAMETERS #####
 csv_separator = ","
+bulk_workers = 10
 privileges = []
 
 #### IMPORTS ####
 import mlib as mist_lib
 from tabulate import tabulate
 import mlib.cli as cli
+from mlib import bulk
 import sys
 import csv
 
@@ -55,6 +57,7 @@ def import_admins(file_path, org_id):
     create all the administrators from the "file_path" file.
     '''
     print("Opening CSV file %s" % file_path)
+    operations = []
     try:
         with open(file_path, 'r') as my_file:
             invite_file = csv.reader(my_file, delimiter=csv_separator)
@@ -63,9 +66,14 @@ def import_admins(file_path, org_id):
                 first_name= column[1]
                 last_name = column[2]        
                 print(', '.join(column))
-                mist_lib.requests.orgs.admins.create_invite(mist, org_id, email, privileges, first_name, last_name)            
+                operations.append((mist_lib.requests.orgs.admins, "create_invite", (org_id, email, privileges, first_name, last_name)))
     except:
         print("Error while opening the CSV file... Aborting")
+        return
+    report = bulk.execute(mist, operations, workers=bulk_workers)
+    print(report)
+    for result in report.failed:
+        print("Unable to invite %s: %s" %(result.args[1], result.error))
 
 #### SCRIPT ENTRYPOINT ####
 file_path = sys.argv[1]
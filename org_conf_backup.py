@@ -16,22 +16,82 @@ The script has 2 different steps:
 3) nackup all the objects to the json file. 
 '''
 #### PARAMETERS #####
-backup_file = "./org_conf_file.json"
+# the backup is written site by site (JSON lines, see mlib.backup)
+backup_file = "./org_conf_file.jsonl"
 file_prefix = ".".join(backup_file.split(".")[:-1])
 session_file = "./session.py"
+download_workers = 8
+# content-addressed store of the downloaded files, shared by the backups of all the orgs
+# (see mlib.blobstore), relative to the backup folder of the org. None to disable it
+blob_store = "../.blobs"
+# number of concurrent requests used to retrieve the objects (the requests are still
+# paced by the rate limiter of the session)
+backup_workers = 8
+# number of sites retrieved together before being written to the backup file. The memory
+# used by the backup only depends on this number of sites
+site_batch_size = 4
+# incremental backups: only the objects created, changed or deleted since the previous
+# backup are saved, in a delta file (see mlib.backup). A full backup is done again after
+# full_backup_interval deltas
+incremental_backup = False
+full_backup_interval = 7
+# also save the backup and its images in a single compressed file (see mlib.container),
+# e.g. "./org_conf_file.mbk". None to disable it
+container_file = None
+# file where the requests statistics (by API endpoint) are saved at the end of the backup.
+# Prometheus text if the file name ends with ".prom", else JSON. None to disable it
+metrics_file = None
+# file where the HTTP requests are recorded (cassette_mode = "record"), or from where they
+# are replayed without network access (cassette_mode = "replay"). None to disable it
+cassette_file = None
+cassette_mode = "record"
 
 #### IMPORTS ####
 import mlib as mist_lib
+import glob
 import os
-import urllib.request
 from mlib import cli
+from mlib import bulk
+from mlib.download import Downloader
+from mlib.metrics import RequestMetrics
+from mlib.cassette import Cassette
+from mlib import profiling
+from mlib import backup as mist_backup
 from tabulate import tabulate
-import json
 from mlib.__debug import Console
 console = Console(6)
 
+#### CONSTANTS ####
+# key in the backup file: module of mlib.requests.orgs, in the backup file order
+org_objects = {
+    "data": "info",
+    "settings": "settings",
+    "webhooks": "webhooks",
+    "assetfilters": "assetfilters",
+    "alarmtemplates": "alarmtemplates",
+    "deviceprofiles": "deviceprofiles",
+    "mxclusters": "mxclusters",
+    "mxtunnels": "mxtunnels",
+    "psks": "psks",
+    "rftemplates": "rftemplates",
+    "secpolicies": "secpolicies",
+    "sitegroups": "sitegroups",
+    "ssos": "ssos",
+    "ssoroles": "ssoroles",
+    "templates": "templates",
+    "wlans": "wlans",
+    "wxrules": "wxrules",
+    "wxtags": "wxtags",
+    "wxtunnels": "wxtunnels"
+}
+# modules of mlib.requests.sites, in the backup file order
+site_objects = ["assetfilters", "assets", "beacons", "maps", "psks", "rssizones", "settings",
+                "vbeacons", "webhooks", "wlans", "wxrules", "wxtags", "wxtunnels", "zones"]
+# objects used by the backup itself (portals and map images)
+decoded_objects = ["wlans", "maps"]
+
 #### FUNCTIONS ####
-def _backup_wlan_portal(org_id, site_id, wlans):  
+def _backup_wlan_portal(downloader, org_id, site_id, wlans):  
     for wlan in wlans:     
         if site_id == None:
             portal_file_name = "%s_org_%s_wlan_%s.json" %(file_prefix, org_id, wlan["id"])
@@ -39,123 +99,80 @@ def _backup_wlan_portal(org_id, site_id, wlans):
         else:
             portal_file_name = "%s_org_%s_site_%s_wlan_%s.json" %(file_prefix, org_id, site_id, wlan["id"]) 
             portal_image = "%s_org_%s_site_%s_wlan_%s.png" %(file_prefix, org_id, site_id, wlan["id"])
-        if "portal_template_url" in wlan: urllib.request.urlretrieve(wlan["portal_template_url"], portal_file_name)
-        if "portal_image" in wlan: urllib.request.urlretrieve(wlan["portal_image"], portal_image)
+        if "portal_template_url" in wlan: downloader.add(wlan["portal_template_url"], portal_file_name)
+        if "portal_image" in wlan: downloader.add(wlan["portal_image"], portal_image)
     
 
 
-def _backup_full_org(mist_session, org_id, org_name):
+def _bulk_get(mist_session, org_name, operations):
+    """GET the objects concurrently with the backup_workers, paced by the rate limiter
+    of the session
+    Params: mist_session, org name, list of (module name, id) tuples
+    Return: list of the responses, in the operations order"""
+    report = bulk.execute(mist_session, [(module, "get", (object_id,)) for module, object_id in operations], backup_workers)
+    if report.failed:
+        for result in report.failed:
+            console.error("ORG %s > Unable to backup %s %s: %s" %(org_name, result.module, result.args[0], result.error))
+        raise RuntimeError("ORG %s > %s requests failed, the backup is incomplete" %(org_name, len(report.failed)))
+    return [result.response for result in report.results]
+
+
+def _backup_result(object_name, response):
+    # the objects not used by the backup are saved as received from the API
+    if object_name in decoded_objects:
+        return response["result"]
+    return response.raw_result()
+
+
+def _backup_site(site, responses):
+    site_backup = {"data": site}
+    for object_name in site_objects:
+        site_backup[object_name] = _backup_result(object_name, next(responses))
+    return site_backup
+
+
+def _backup_site_images(downloader, org_id, org_name, site, saved):
+    # only the images of the objects saved by the writer (all of them, or the new and
+    # changed ones of an incremental backup)
+    console.info("ORG %s > SITE %s > Backuping captive web prortals" %(org_name, site["name"]))
+    _backup_wlan_portal(downloader, org_id, site["id"], saved.get("wlans", []))
+    console.info("ORG %s > SITE %s > Backuping map images" %(org_name, site["name"]))
+    for xmap in saved.get("maps", []):
+        if 'url' in xmap:
+            url = xmap["url"]
+            image_name = "%s_org_%s_site_%s_map_%s.png" %(file_prefix, org_id, site["id"], xmap["id"])
+            downloader.add(url, image_name)
+    console.notice("ORG %s > SITE %s > Backup done" %(org_name, site["name"]))
+
+
+def _backup_full_org(mist_session, downloader, writer, org_id, org_name):
     console.notice("ORG %s > Backup processing..." %(org_name))
-    backup = {}
-    backup["org"] = { "id": org_id}
-    console.info("ORG %s > Backuping info" %(org_name))
-    backup["org"]["data"] = mist_lib.requests.orgs.info.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping settings" %(org_name))
-    backup["org"]["settings"] = mist_lib.requests.orgs.settings.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping webhooks" %(org_name))
-    backup["org"]["webhooks"] = mist_lib.requests.orgs.webhooks.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping assetfilters" %(org_name))
-    backup["org"]["assetfilters"] = mist_lib.requests.orgs.assetfilters.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping alarmtemplates" %(org_name))
-    backup["org"]["alarmtemplates"] = mist_lib.requests.orgs.alarmtemplates.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping deviceprofiles" %(org_name))
-    backup["org"]["deviceprofiles"] = mist_lib.requests.orgs.deviceprofiles.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping mxclusters" %(org_name))
-    backup["org"]["mxclusters"] = mist_lib.requests.orgs.mxclusters.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping mxtunnels" %(org_name))
-    backup["org"]["mxtunnels"] = mist_lib.requests.orgs.mxtunnels.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping psks" %(org_name))
-    backup["org"]["psks"] = mist_lib.requests.orgs.psks.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping rftemplates" %(org_name))
-    backup["org"]["rftemplates"] = mist_lib.requests.orgs.rftemplates.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping secpolicies" %(org_name))
-    backup["org"]["secpolicies"] = mist_lib.requests.orgs.secpolicies.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping sitegroups" %(org_name))
-    backup["org"]["sitegroups"] = mist_lib.requests.orgs.sitegroups.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping ssos" %(org_name))
-    backup["org"]["ssos"] = mist_lib.requests.orgs.ssos.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping ssoroles" %(org_name))
-    backup["org"]["ssoroles"] = mist_lib.requests.orgs.ssoroles.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping templates" %(org_name))
-    backup["org"]["templates"] = mist_lib.requests.orgs.templates.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping wlans" %(org_name))
-    backup["org"]["wlans"] = mist_lib.requests.orgs.wlans.get(mist_session, org_id)["result"]
+    with profiling.phase("org"):
+        org = { "id": org_id}
+        console.info("ORG %s > Backuping %s" %(org_name, ", ".join(org_objects)))
+        responses = _bulk_get(mist_session, org_name, [("orgs.%s" % module, org_id) for module in org_objects.values()])
+        for object_name, response in zip(org_objects, responses):
+            org[object_name] = _backup_result(object_name, response)
+    with profiling.phase("file I/O"):
+        saved = writer.write_org(org)
     console.info("ORG %s > Backuping captive web prortals" %(org_name))
-    _backup_wlan_portal(org_id, None, backup["org"]["wlans"])
-    console.info("ORG %s > Backuping wxrules" %(org_name))
-    backup["org"]["wxrules"] = mist_lib.requests.orgs.wxrules.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping wxtags" %(org_name))
-    backup["org"]["wxtags"] = mist_lib.requests.orgs.wxtags.get(mist_session, org_id)["result"]
-    console.info("ORG %s > Backuping wxtunnels" %(org_name))
-    backup["org"]["wxtunnels"] = mist_lib.requests.orgs.wxtunnels.get(mist_session, org_id)["result"]
-
-    backup["org"]["sites"] = []
-
-    sites = mist_lib.requests.orgs.sites.get(mist_session, org_id)['result']
-    for site in sites:
-        console.info("ORG %s > SITE %s > Backup processing..." %(org_name, site["name"]))
-        console.info("ORG %s > SITE %s > Backuping assets" %(org_name, site["name"]))
-        assets = mist_lib.requests.sites.assets.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping assetfilters" %(org_name, site["name"]))
-        assetfilters = mist_lib.requests.sites.assetfilters.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping beacons" %(org_name, site["name"]))
-        beacons = mist_lib.requests.sites.beacons.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping maps" %(org_name, site["name"]))
-        maps = mist_lib.requests.sites.maps.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping psks" %(org_name, site["name"]))
-        psks = mist_lib.requests.sites.psks.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping rssizones" %(org_name, site["name"]))
-        rssizones = mist_lib.requests.sites.rssizones.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping settings" %(org_name, site["name"]))
-        settings = mist_lib.requests.sites.settings.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping vbeacons" %(org_name, site["name"]))
-        vbeacons = mist_lib.requests.sites.vbeacons.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping webhooks" %(org_name, site["name"]))
-        webhooks = mist_lib.requests.sites.webhooks.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping wlans" %(org_name, site["name"]))
-        wlans = mist_lib.requests.sites.wlans.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping captive web prortals" %(org_name, site["name"]))
-        _backup_wlan_portal(org_id, site["id"], wlans)
-        console.info("ORG %s > SITE %s > Backuping wxrules" %(org_name, site["name"]))
-        wxrules = mist_lib.requests.sites.wxrules.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping wxtags" %(org_name, site["name"]))
-        wxtags = mist_lib.requests.sites.wxtags.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping wxtunnels" %(org_name, site["name"]))
-        wxtunnels = mist_lib.requests.sites.wxtunnels.get(mist_session, site["id"])["result"]
-        console.info("ORG %s > SITE %s > Backuping zones" %(org_name, site["name"]))
-        zones = mist_lib.requests.sites.zones.get(mist_session, site["id"])["result"]
-        backup["org"]["sites"].append({
-            "data": site, 
-            "assetfilters": assetfilters,
-            "assets": assets,
-            "beacons": beacons, 
-            "maps": maps, 
-            "psks": psks, 
-            "rssizones":rssizones,
-            "settings": settings,
-            "vbeacons": vbeacons, 
-            "webhooks": webhooks,
-            "wlans": wlans, 
-            "wxrules": wxrules, 
-            "wxtags": wxtags, 
-            "wxtunnels": wxtunnels,
-            "zones": zones
-            })
-        console.info("ORG %s > SITE %s > Backuping map images" %(org_name, site["name"]))
-        for xmap in maps:
-            if 'url' in xmap:
-                url = xmap["url"]
-                image_name = "%s_org_%s_site_%s_map_%s.png" %(file_prefix, org_id, site["id"], xmap["id"])
-                urllib.request.urlretrieve(url, image_name)
-        console.notice("ORG %s > SITE %s > Backup done" %(org_name, site["name"]))
+    _backup_wlan_portal(downloader, org_id, None, saved.get("wlans", []))
+
+    with profiling.phase("listing"):
+        sites = mist_lib.requests.orgs.sites.get(mist_session, org_id)['result']
+    console.info("ORG %s > Backuping %s sites" %(org_name, len(sites)))
+    for index in range(0, len(sites), site_batch_size):
+        batch = sites[index:index + site_batch_size]
+        with profiling.phase("sites"):
+            # one request per site and object, executed concurrently
+            responses = iter(_bulk_get(mist_session, org_name, [("sites.%s" % object_name, site["id"]) for site in batch for object_name in site_objects]))
+            site_backups = [_backup_site(site, responses) for site in batch]
+        for site, site_backup in zip(batch, site_backups):
+            with profiling.phase("file I/O"):
+                saved = writer.write_site(site_backup)
+            _backup_site_images(downloader, org_id, org_name, site, saved)
 
     console.notice("ORG %s > Backup done" %(org_name))
-    return backup
-
-def _save_to_file(backup_file, backup):
-    print("saving to file...")
-    with open(backup_file, "w") as f:
-        json.dump(backup, f)
 
 def start_org_backup(mist_session, org_id, org_name):
     #try:
@@ -166,8 +183,17 @@ def start_org_backup(mist_session, org_id, org_name):
         os.mkdir(org_name)
     os.chdir(org_name)
 
-    backup = _backup_full_org(mist_session, org_id, org_name)
-    _save_to_file(backup_file, backup)
+    with Downloader(mist_session, download_workers, blob_store=blob_store) as downloader:
+        with profiling.phase("file I/O"):
+            writer = mist_backup.open_writer(backup_file, incremental_backup, full_backup_interval)
+        with writer:
+            _backup_full_org(mist_session, downloader, writer, org_id, org_name)
+        with profiling.phase("downloads"):
+            downloader.wait()
+    if container_file:
+        console.info("ORG %s > Saving the backup to %s" %(org_name, container_file))
+        with profiling.phase("file I/O"):
+            mist_backup.pack(backup_file, container_file, files=sorted(glob.glob("%s_*" % file_prefix)))
     
     #except:
      #   return 255
@@ -182,5 +208,15 @@ def start(mist_session):
 ##### ENTRY POINT ####
 
 if __name__ == "__main__":
-    mist_session = mist_lib.Mist_Session(session_file)
-    start(mist_session)
\ No newline at end of file
+    profiling.from_environment()
+    metrics = RequestMetrics()
+    metrics_path = metrics_file and os.path.abspath(metrics_file)
+    cassette = None
+    if cassette_file:
+        cassette = Cassette(os.path.abspath(cassette_file), cassette_mode)
+    mist_session = mist_lib.Mist_Session(session_file, request_hooks=[metrics], cassette=cassette)
+    start(mist_session)
+    if cassette:
+        cassette.close()
+    if metrics_path:
+        metrics.dump(metrics_path)
\ No newline at end of file
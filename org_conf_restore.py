@@ -22,6 +22,10 @@ The script has 2 different steps:
 
 session_file = ""
 backup_directory = "./backup/"
+bulk_workers = 10
+# date of the backup to restore, when incremental backups are used (e.g.
+# "2024-01-31 23:59:59"). None to restore the latest backup
+backup_as_of = None
 
 org_id = ""
 #### IMPORTS ####
@@ -29,18 +33,28 @@ org_id = ""
 import mlib as mist_lib
 from mlib.__debug import Console
 from mlib import cli
+from mlib import bulk
+from mlib.requests import registry
+from mlib import profiling
+from mlib import backup as mist_backup
 from tabulate import tabulate
 import json
 import os.path
 
 #### CONSTANTS ####
 console = Console(6)
-backup_file = "./org_conf_file.json"
+backup_file = "./org_conf_file.jsonl"
+# backup file of the former versions of org_conf_backup.py
+legacy_backup_file = "./org_conf_file.json"
+# single file backup (see mlib.container), used if there is no backup_file
+container_file = "./org_conf_file.mbk"
 file_prefix = ".".join(backup_file.split(".")[:-1])
 
 
 #### GLOBAL VARS ####
 
+# ContainerBackup being restored, from where the images and portal templates are extracted
+backup_container = None
 
 rftemplate_id_dict = {}
 site_id_dict = {}
@@ -59,6 +73,13 @@ alarmtemplate_id_dict = {}
 
 #### FUNCTIONS ####
 
+def _backup_file(file_name):
+    # the files of a container backup are extracted when used
+    if backup_container != None and not os.path.isfile(file_name):
+        return backup_container.extract(file_name) or file_name
+    return file_name
+
+
 def _get_new_id(old_id, new_ids_dict):
     if old_id in new_ids_dict:
         new_id = new_ids_dict[old_id]
@@ -113,14 +134,40 @@ def _common_restore(mist_session, org_name, site_name, level, level_id, object_n
         old_id = data["id"]
     else: 
         old_id = None
-    data = _clean_ids(data)
-    module = mist_lib.requests.route(level, object_name)
-    result = module.create(mist_session, level_id, data)["result"]
+    resource = registry.get(level, object_name)
+    data = resource.clean(data)
+    result = resource.module.create(mist_session, level_id, data)["result"]
     if "id" in result:
         new_id = result["id"]
     return {old_id: new_id}
 
 
+def _common_restore_many(mist_session, org_name, site_name, level, level_id, object_name, data_list):
+    """Restore a list of objects of the same type concurrently, with mlib.bulk.
+    The objects must not depend on each other.
+    Return: dict of {old_id: new_id}"""
+    if site_name: site_text = " SITE %s >" %(site_name)
+    else: site_text = ""
+    if len(data_list) == 0:
+        return {}
+    console.info("ORG %s >%s Restoring %s %s..." %(org_name, site_text, len(data_list), object_name))
+    old_ids = []
+    operations = []
+    resource = registry.get(level, object_name)
+    for data in data_list:
+        if "id" in data: old_ids.append(data["id"])
+        else: old_ids.append(None)
+        operations.append((resource.module, "create", (level_id, resource.clean(data))))
+    report = bulk.execute(mist_session, operations, workers=bulk_workers)
+    ids = {}
+    for old_id, result in zip(old_ids, report.results):
+        if result.success and "id" in result.result:
+            ids[old_id] = result.result["id"]
+        else:
+            console.error("ORG %s >%s Unable to restore %s %s: %s" %(org_name, site_text, object_name, old_id, result.error))
+    return ids
+
+
 def _wlan_restore(mist_session, org_name, site_name, level, level_id, data, old_org_id, old_site_id):
     if "template_id" in data:
         data["template_id"] = _replace_id(data["template_id"], template_id_dict)
@@ -140,12 +187,14 @@ def _wlan_restore_portal(mist_session, org_name, site_name,level_id, old_org_id,
         if old_site_id == None:
             portal_file_name = "%s_org_%s_wlan_%s.json" %(file_prefix, old_org_id, old_wlan_id)
             portal_image = "%s_org_%s_wlan_%s.png" %(file_prefix, old_org_id, old_wlan_id)
-            module = mist_lib.requests.route("orgs", "wlans")
+            module = registry.get("orgs", "wlans").module
         else:
             portal_file_name = "%s_org_%s_site_%s_wlan_%s.json" %(file_prefix, old_org_id, old_site_id, old_wlan_id) 
             portal_image = "%s_org_%s_site_%s_wlan_%s.png" %(file_prefix, old_org_id, old_site_id, old_wlan_id)
-            module = mist_lib.requests.route("sites", "wlans")
+            module = registry.get("sites", "wlans").module
 
+        portal_file_name = _backup_file(portal_file_name)
+        portal_image = _backup_file(portal_image)
         if site_name: site_text = " SITE %s >" %(site_name)
         else: site_text = "" 
         if os.path.isfile(portal_file_name):
@@ -162,212 +211,201 @@ def _wlan_restore_portal(mist_session, org_name, site_name,level_id, old_org_id,
 
 def _restore_org(mist_session, org_id, org_name, org):
     ####  ORG MAIN  ####
-    data = org["data"]
-    old_org_id = data["id"]
-    # console.debug(json.dumps(data))
-    del data["id"]
-    if "orggroup_ids" in data:
-        del data["orggroup_ids"]
-    if "msp_id" in data:
-        del data["msp_id"]
-    if "msp_name" in data:
-        del data["msp_name"]
-    mist_lib.requests.orgs.info.update(mist_session, org_id, data)
-
-    ####  ORG SETTINGS  ####
-    data = _clean_ids(org["settings"])
-    mist_lib.requests.orgs.settings.update(mist_session, org_id, data)
+    with profiling.phase("org"):
+        data = org["data"]
+        old_org_id = data["id"]
+        # console.debug(json.dumps(data))
+        del data["id"]
+        if "orggroup_ids" in data:
+            del data["orggroup_ids"]
+        if "msp_id" in data:
+            del data["msp_id"]
+        if "msp_name" in data:
+            del data["msp_name"]
+        mist_lib.requests.orgs.info.update(mist_session, org_id, data)
+
+        ####  ORG SETTINGS  ####
+        data = _clean_ids(org["settings"])
+        mist_lib.requests.orgs.settings.update(mist_session, org_id, data)
     
-    ####  ORG OBJECTS  ####
-    for data in org["webhooks"]:
-        _common_restore(mist_session, org_name, None, 'orgs', org_id, 'webhooks', data)
+        ####  ORG OBJECTS  ####
+        _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'webhooks', org["webhooks"])
 
-    for data in org["assetfilters"]:
-        _common_restore(mist_session, org_name, None, 'orgs',  org_id, 'assetfilters', data)
+        _common_restore_many(mist_session, org_name, None, 'orgs',  org_id, 'assetfilters', org["assetfilters"])
 
-    for data in org["deviceprofiles"]:
-        ids = _common_restore(mist_session, org_name, None, 'orgs',  org_id, 'deviceprofiles', data)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs',  org_id, 'deviceprofiles', org["deviceprofiles"])
         deviceprofile_id_dict.update(ids)
 
-    for data in org["alarmtemplates"]:
-        ids = _common_restore(mist_session, org_name, None, 'orgs',  org_id, 'alarmtemplates', data)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs',  org_id, 'alarmtemplates', org["alarmtemplates"])
         deviceprofile_id_dict.update(ids)
 
-    for data in org["mxclusters"]:
-        ids = _common_restore(mist_session, org_name, None, 'orgs',  org_id, 'mxclusters', data)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs',  org_id, 'mxclusters', org["mxclusters"])
         mxcluster_id_dict.update(ids)
 
-    for data in org["mxtunnels"]:
-        data["mxcluster_ids"] = _replace_id(
-            data["mxcluster_ids"], mxcluster_id_dict)
-        ids = _common_restore(mist_session, org_name, None, 'orgs',  org_id, 'mxtunnels', data)
+        for data in org["mxtunnels"]:
+            data["mxcluster_ids"] = _replace_id(
+                data["mxcluster_ids"], mxcluster_id_dict)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs',  org_id, 'mxtunnels', org["mxtunnels"])
         mxtunnel_id_dict.update(ids)
 
-    for data in org["psks"]:
-        _common_restore(mist_session, org_name, None, 'orgs', org_id, 'psks', data)
+        _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'psks', org["psks"])
 
-    for data in org["secpolicies"]:
-        ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'secpolicies', data)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'secpolicies', org["secpolicies"])
         secpolicy_id_dict.update(ids)
 
-    for data in org["rftemplates"]:
-        ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'rftemplates', data)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'rftemplates', org["rftemplates"])
         rftemplate_id_dict.update(ids)
 
-    for data in org["sitegroups"]:
-        if "site_ids" in data: del data["site_ids"]
-        ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'sitegroups', data)
+        for data in org["sitegroups"]:
+            if "site_ids" in data: del data["site_ids"]
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'sitegroups', org["sitegroups"])
         sitegroup_id_dict.update(ids)    
 
-    for data in org["wxtags"]:
-        if data["match"] == "wlan_id":
-            _replace_id(data["values"], wlan_id_dict)
-        ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'wxtags', data)
+        for data in org["wxtags"]:
+            if data["match"] == "wlan_id":
+                _replace_id(data["values"], wlan_id_dict)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'wxtags', org["wxtags"])
         wxtags_id_dict.update(ids)
 
-    for data in org["wxrules"]:
-        data["src_wxtags"] = _replace_id(data["src_wxtags"], wxtags_id_dict)
-        data["dst_allow_wxtags"] = _replace_id(data["dst_allow_wxtags"], wxtags_id_dict)
-        data["dst_deny_wxtags"] = _replace_id(data["dst_deny_wxtags"], wxtags_id_dict)
-        _common_restore(mist_session, org_name, None, 'orgs',  org_id, 'wxrules', data)
+        for data in org["wxrules"]:
+            data["src_wxtags"] = _replace_id(data["src_wxtags"], wxtags_id_dict)
+            data["dst_allow_wxtags"] = _replace_id(data["dst_allow_wxtags"], wxtags_id_dict)
+            data["dst_deny_wxtags"] = _replace_id(data["dst_deny_wxtags"], wxtags_id_dict)
+        _common_restore_many(mist_session, org_name, None, 'orgs',  org_id, 'wxrules', org["wxrules"])
 
-    for data in org["wxtunnels"]:
-        ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'wxtunnels', data)
+        ids = _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'wxtunnels', org["wxtunnels"])
         wxtunnel_id_dict.update(ids)
 
 
     ####  SITES LOOP  ####
     for data in org["sites"]:
-        ####  SITES MAIN  ####
-        site = data["data"]
-        old_site_id = site["id"]
-        if "rftemplate_id" in site:
-            site["rftemplate_id"] = _replace_id(site["rftemplate_id"], rftemplate_id_dict)
-        if "secpolicy_id" in site:
-            site["secpolicy_id"] = _replace_id(site["secpolicy_id"], secpolicy_id_dict)
-        if "alarmtemplate_id" in site:
-            site["alarmtemplate_id"] = _replace_id(site["alarmtemplate_id"], alarmtemplate_id_dict)
-        if "sitegroup_ids" in site:
-            site["sitegroup_ids"] = _replace_id(site["sitegroup_ids"], sitegroup_id_dict)
-        ids = _common_restore(mist_session, org_name, site["name"], 'orgs',  org_id, 'sites', site)
-        site_id_dict.update(ids)
-        new_site_id = ids[next(iter(ids))]
-
-        settings = _clean_ids(data["settings"])
-        if "site_id" in settings: del settings["site_id"]
-        mist_lib.requests.sites.settings.update(
-            mist_session, new_site_id, settings)
-
-        if "maps" in data:
-            for sub_data in data["maps"]:
-                sub_data["site_id"] = new_site_id
-                ids = _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'maps', sub_data)
-                map_id_dict.update(ids)
-
-                old_map_id = next(iter(ids))
-                new_map_id = ids[old_map_id]
-                image_name = "%s_org_%s_site_%s_map_%s.png" %(file_prefix, old_org_id, old_site_id, old_map_id)
-                if os.path.isfile(image_name):
-                    console.info("Image %s will be restored to map %s" %(image_name, new_map_id))
-                    mist_lib.requests.sites.maps.add_image(mist_session, new_site_id, new_map_id, image_name)
-                else:
-                    console.info("No image found for old map id %s" % old_map_id)
-
-
-        if "assetfilters" in data:
-            for sub_data in data["assetfilters"]:
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'assetfilters', sub_data)
-
-        if "assets" in data:
-            for sub_data in data["assets"]:
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'assets', sub_data)
-
-        if "beacons" in data:
-            for sub_data in data["beacons"]:
-                sub_data["map_id"] = _replace_id(sub_data["map_id"], map_id_dict)
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'beacons', sub_data)
-
-        if "psks" in data:
-            for sub_data in data["psks"]:
-                sub_data["site_id"] = new_site_id
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'psks', sub_data)
-
-        if "rssizones" in data:
-            for sub_data in data["rssizones"]:
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'rssizones', sub_data)
-
-        if "vbeacons" in data:
-            for sub_data in data["vbeacons"]:
-                sub_data["map_id"] = _replace_id(sub_data["map_id"], map_id_dict)
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'vbeacons', sub_data)
-
-        if "webhooks" in data:
-            for sub_data in data["webhooks"]:
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'webhooks', sub_data)
-
-        if "wxtunnels" in data:
-            for sub_data in data["wxtunnels"]:
-                ids = _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id,'wxtunnels', sub_data)
+        with profiling.phase("site"):
+            ####  SITES MAIN  ####
+            site = data["data"]
+            old_site_id = site["id"]
+            if "rftemplate_id" in site:
+                site["rftemplate_id"] = _replace_id(site["rftemplate_id"], rftemplate_id_dict)
+            if "secpolicy_id" in site:
+                site["secpolicy_id"] = _replace_id(site["secpolicy_id"], secpolicy_id_dict)
+            if "alarmtemplate_id" in site:
+                site["alarmtemplate_id"] = _replace_id(site["alarmtemplate_id"], alarmtemplate_id_dict)
+            if "sitegroup_ids" in site:
+                site["sitegroup_ids"] = _replace_id(site["sitegroup_ids"], sitegroup_id_dict)
+            ids = _common_restore(mist_session, org_name, site["name"], 'orgs',  org_id, 'sites', site)
+            site_id_dict.update(ids)
+            new_site_id = ids[next(iter(ids))]
+
+            settings = _clean_ids(data["settings"])
+            if "site_id" in settings: del settings["site_id"]
+            mist_lib.requests.sites.settings.update(
+                mist_session, new_site_id, settings)
+
+            if "maps" in data:
+                for sub_data in data["maps"]:
+                    sub_data["site_id"] = new_site_id
+                    ids = _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'maps', sub_data)
+                    map_id_dict.update(ids)
+
+                    old_map_id = next(iter(ids))
+                    new_map_id = ids[old_map_id]
+                    image_name = _backup_file("%s_org_%s_site_%s_map_%s.png" %(file_prefix, old_org_id, old_site_id, old_map_id))
+                    if os.path.isfile(image_name):
+                        console.info("Image %s will be restored to map %s" %(image_name, new_map_id))
+                        mist_lib.requests.sites.maps.add_image(mist_session, new_site_id, new_map_id, image_name)
+                    else:
+                        console.info("No image found for old map id %s" % old_map_id)
+
+
+            if "assetfilters" in data:
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'assetfilters', data["assetfilters"])
+
+            if "assets" in data:
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'assets', data["assets"])
+
+            if "beacons" in data:
+                for sub_data in data["beacons"]:
+                    sub_data["map_id"] = _replace_id(sub_data["map_id"], map_id_dict)
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'beacons', data["beacons"])
+
+            if "psks" in data:
+                for sub_data in data["psks"]:
+                    sub_data["site_id"] = new_site_id
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'psks', data["psks"])
+
+            if "rssizones" in data:
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'rssizones', data["rssizones"])
+
+            if "vbeacons" in data:
+                for sub_data in data["vbeacons"]:
+                    sub_data["map_id"] = _replace_id(sub_data["map_id"], map_id_dict)
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'vbeacons', data["vbeacons"])
+
+            if "webhooks" in data:
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'webhooks', data["webhooks"])
+
+            if "wxtunnels" in data:
+                ids = _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id,'wxtunnels', data["wxtunnels"])
                 wxtunnel_id_dict.update(ids)
 
-        if "zones" in data:
-            for sub_data in data["zones"]:
-                sub_data["map_id"] = _replace_id(sub_data["map_id"], map_id_dict)
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'zones', sub_data)
+            if "zones" in data:
+                for sub_data in data["zones"]:
+                    sub_data["map_id"] = _replace_id(sub_data["map_id"], map_id_dict)
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'zones', data["zones"])
         
-        if "wlans" in data:
-            for sub_data in data["wlans"]:
-                _wlan_restore(mist_session, org_name, site["name"], 'sites', new_site_id, sub_data, old_org_id, old_site_id)
-
-        if "wxtags" in data:
-            for sub_data in data["wxtags"]:
-                if sub_data["match"] == "wlan_id":
-                    _replace_id(sub_data["values"], wlan_id_dict)
-                ids = _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'wxtags', sub_data)
+            if "wlans" in data:
+                for sub_data in data["wlans"]:
+                    _wlan_restore(mist_session, org_name, site["name"], 'sites', new_site_id, sub_data, old_org_id, old_site_id)
+
+            if "wxtags" in data:
+                for sub_data in data["wxtags"]:
+                    if sub_data["match"] == "wlan_id":
+                        _replace_id(sub_data["values"], wlan_id_dict)
+                ids = _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'wxtags', data["wxtags"])
                 wxtags_id_dict.update(ids)
 
-        if "wxrules" in data:
-            for sub_data in data["wxrules"]:
-                if "src_wxtags" in sub_data:
-                    sub_data["src_wxtags"] = _replace_id(sub_data["src_wxtags"], wxtags_id_dict)
-                if "dst_allow_wxtags" in sub_data:
-                    sub_data["dst_allow_wxtags"] = _replace_id(sub_data["dst_allow_wxtags"], wxtags_id_dict)
-                if "dst_deny_wxtags" in sub_data:
-                    sub_data["dst_deny_wxtags"] = _replace_id(sub_data["dst_deny_wxtags"], wxtags_id_dict)
-                _common_restore(mist_session, org_name, site["name"], 'sites', new_site_id, 'wxrules', sub_data)
-
-    for data in org["templates"]:
-        if "applies" in data:
-            if "org_id" in data["applies"]:
-                data["applies"]["org_id"] = org_id
-            if "site_ids" in data["applies"]:
-                data["applies"]["site_ids"] = _replace_id(data["applies"]["site_ids"], site_id_dict)
-            if "sitegroup_ids" in data["applies"]:
-                data["applies"]["sitegroup_ids"] = _replace_id(data["applies"]["sitegroup_ids"], sitegroup_id_dict)
-        if "exceptions" in data:
-            if "site_ids" in data["exceptions"]:
-                data["exceptions"]["site_ids"] = _replace_id(data["exceptions"]["site_ids"], site_id_dict)
-            if "sitegroup_ids" in data["exceptions"]:
-                data["exceptions"]["sitegroup_ids"] = _replace_id(data["exceptions"]["sitegroup_ids"], sitegroup_id_dict)
-        if "deviceprofile_ids" in data:
-            data["deviceprofile_ids"] = _replace_id(data["deviceprofile_ids"], deviceprofile_id_dict)
-        ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'templates', data)
-        template_id_dict.update(ids)
-
-    for data in org["wlans"]:
-        _wlan_restore(mist_session, org_name, None, 'orgs', org_id, data, old_org_id, None)
-
-    for data in org["ssos"]: _common_restore(mist_session, org_name, None, 'orgs', org_id, 'ssos', data)
-
-    for data in org["ssoroles"]:
-        cleaned_privileges = {
-            "privileges": [],
-            "org_id": org_id,
-            "name": data["name"]
-        }
-        for privilege in data["privileges"]: 
-            cleaned_privileges["privileges"].append(_clean_ssorole_privileges(privilege, org_id))
-        _common_restore(mist_session, org_name, None, 'orgs', org_id, 'ssoroles', cleaned_privileges)    
+            if "wxrules" in data:
+                for sub_data in data["wxrules"]:
+                    if "src_wxtags" in sub_data:
+                        sub_data["src_wxtags"] = _replace_id(sub_data["src_wxtags"], wxtags_id_dict)
+                    if "dst_allow_wxtags" in sub_data:
+                        sub_data["dst_allow_wxtags"] = _replace_id(sub_data["dst_allow_wxtags"], wxtags_id_dict)
+                    if "dst_deny_wxtags" in sub_data:
+                        sub_data["dst_deny_wxtags"] = _replace_id(sub_data["dst_deny_wxtags"], wxtags_id_dict)
+                _common_restore_many(mist_session, org_name, site["name"], 'sites', new_site_id, 'wxrules', data["wxrules"])
+
+    with profiling.phase("org templates"):
+        for data in org["templates"]:
+            if "applies" in data:
+                if "org_id" in data["applies"]:
+                    data["applies"]["org_id"] = org_id
+                if "site_ids" in data["applies"]:
+                    data["applies"]["site_ids"] = _replace_id(data["applies"]["site_ids"], site_id_dict)
+                if "sitegroup_ids" in data["applies"]:
+                    data["applies"]["sitegroup_ids"] = _replace_id(data["applies"]["sitegroup_ids"], sitegroup_id_dict)
+            if "exceptions" in data:
+                if "site_ids" in data["exceptions"]:
+                    data["exceptions"]["site_ids"] = _replace_id(data["exceptions"]["site_ids"], site_id_dict)
+                if "sitegroup_ids" in data["exceptions"]:
+                    data["exceptions"]["sitegroup_ids"] = _replace_id(data["exceptions"]["sitegroup_ids"], sitegroup_id_dict)
+            if "deviceprofile_ids" in data:
+                data["deviceprofile_ids"] = _replace_id(data["deviceprofile_ids"], deviceprofile_id_dict)
+            ids = _common_restore(mist_session, org_name, None, 'orgs', org_id, 'templates', data)
+            template_id_dict.update(ids)
+
+        for data in org["wlans"]:
+            _wlan_restore(mist_session, org_name, None, 'orgs', org_id, data, old_org_id, None)
+
+        _common_restore_many(mist_session, org_name, None, 'orgs', org_id, 'ssos', org["ssos"])
+
+        for data in org["ssoroles"]:
+            cleaned_privileges = {
+                "privileges": [],
+                "org_id": org_id,
+                "name": data["name"]
+            }
+            for privilege in data["privileges"]: 
+                cleaned_privileges["privileges"].append(_clean_ssorole_privileges(privilege, org_id))
+            _common_restore(mist_session, org_name, None, 'orgs', org_id, 'ssoroles', cleaned_privileges)    
 
 def _display_warning(message):
     resp = "x"
@@ -454,16 +492,24 @@ def _check_org_name(org_name):
 def start_restore_org(mist_session, org_id, org_name, source_org_name, check_org_name=True, in_backup_folder=False):
     if check_org_name: _check_org_name(org_name)
     if not in_backup_folder: _go_to_backup_folder(source_org_name)
+    global backup_container
+    file_path = backup_file
+    for other_file in [container_file, legacy_backup_file]:
+        if not os.path.isfile(file_path) and os.path.isfile(other_file):
+            file_path = other_file
+    backup = None
     try:
-        with open(backup_file) as f:
-            backup = json.load(f)
+        with profiling.phase("file I/O"):
+            backup = mist_backup.load(file_path, backup_as_of)
+        if isinstance(backup, mist_backup.ContainerBackup):
+            backup_container = backup
     except: 
-        print("unable to load the file backup %s" %(backup_file))
+        print("unable to load the file backup %s" %(file_path))
     finally:
         if backup:
-            console.info("File %s loaded succesfully." %backup_file)
+            console.info("File %s loaded succesfully." %file_path)
             _display_warning("Are you sure about this? Do you want to import the configuration into the organization %s with the id %s (y/N)? " %(org_name, org_id))
-            _restore_org(mist_session, org_id, org_name, backup["org"])
+            _restore_org(mist_session, org_id, org_name, backup.org)
             print()
             console.notice("Restoration process finished...")
 
@@ -478,6 +524,7 @@ def start(mist_session, org_id=None):
 
 
 if __name__ == "__main__":
+    profiling.from_environment()
     mist_session = mist_lib.Mist_Session(session_file)
     start(mist_session, org_id)
 
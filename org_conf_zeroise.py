@@ -37,6 +37,7 @@ ids_to_not_delete = []
 #### IMPORTS ####
 import mlib as mist_lib
 from mlib import cli
+from mlib.requests import registry
 from tabulate import tabulate
 import json
 from mlib.__debug import Console
@@ -46,7 +47,7 @@ console = Console(6)
 
 def delete_object(org_id, object_name, ids_to_not_delete):
     console.info("Removing all %s objects..." %object_name)
-    req = mist_lib.requests.route("orgs", object_name)
+    req = registry.get("orgs", object_name).module
     data = req.get(mist_session, org_id)["result"]
     for d in data:
         if not d["id"] in ids_to_not_delete:
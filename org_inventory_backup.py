@@ -1,17 +1,26 @@
 
 
 #### PARAMETERS #####
-backup_file = "./org_inventory_file.json"
+# single file backup: the inventory of each site and the device images are compressed
+# separately, so a site can be restored without reading the others (see mlib.container)
+backup_file = "./org_inventory_file.mbk"
 file_prefix = ".".join(backup_file.split(".")[:-1])
 session_file = "./session.py"
 org_id = "" #optional
+download_workers = 8
+# content-addressed store of the downloaded files, shared by the backups of all the orgs
+# (see mlib.blobstore), relative to the backup folder of the org. None to disable it
+blob_store = "../.blobs"
+# keep the device images next to the backup file once they are saved in it
+keep_image_files = False
 
 #### IMPORTS ####
 import mlib as mist_lib
-import urllib.request
 from mlib import cli
+from mlib.download import Downloader
+from mlib.container import ContainerWriter
 from tabulate import tabulate
-import json
+import glob
 import os
 
 from mlib.__debug import Console
@@ -75,13 +84,12 @@ def _backup_site_maps(mist_session, site):
             maps_ids[xmap["name"]] = {"old_id": xmap["id"]}
     return maps_ids
 
-def _backup_inventory(mist_session, org_id, org_name=None):
+def _backup_inventory(mist_session, downloader, org_id, org_name=None):
     backup["org"]["id"] = org_id
     console.notice("ORG %s > Backup processing..." %(org_name))
 
     console.info("ORG %s > Backuping inventory" %(org_name))
-    inventory = mist_lib.requests.orgs.inventory.get(mist_session, org_id)["result"]
-    for data in inventory:
+    for data in mist_lib.requests.orgs.inventory.get_iter(mist_session, org_id):
         if not data["magic"] == "":
             backup["org"]["inventory"].append({"serial": data["serial"], "magic": data["magic"]})
 
@@ -104,7 +112,7 @@ def _backup_inventory(mist_session, org_id, org_name=None):
             while "image%s_url"%i in device:
                 url = device["image%s_url"%i]
                 image_name = "%s_org_%s_device_%s_image_%s.png" %(file_prefix, org_id, device["serial"], i)
-                urllib.request.urlretrieve(url, image_name)
+                downloader.add(url, image_name)
                 i+=1
 
     
@@ -112,8 +120,19 @@ def _backup_inventory(mist_session, org_id, org_name=None):
 
 def _save_to_file(backup_file, backup):
     print("saving to file...")
-    with open(backup_file, "w") as f:
-        json.dump(backup, f)
+    with ContainerWriter(backup_file) as writer:
+        for name, value in backup["org"].items():
+            if name != "sites":
+                writer.add_section(name, value)
+        for site_name, site in backup["org"]["sites"].items():
+            writer.add_site(site_name, site)
+        image_names = sorted(glob.glob("%s_*" % file_prefix))
+        for image_name in image_names:
+            writer.add_file("files/%s" % os.path.basename(image_name), image_name)
+    # the images are only removed once the backup file is written
+    if not keep_image_files:
+        for image_name in image_names:
+            os.remove(image_name)
 
 def start_inventory_backup(mist_session, org_id, org_name, in_backup_folder=False):    
     if not in_backup_folder:
@@ -124,7 +143,9 @@ def start_inventory_backup(mist_session, org_id, org_name, in_backup_folder=Fals
             os.mkdir(org_name)
         os.chdir(org_name)
 
-    _backup_inventory(mist_session, org_id, org_name)
+    with Downloader(mist_session, download_workers, blob_store=blob_store) as downloader:
+        _backup_inventory(mist_session, downloader, org_id, org_name)
+    # the images are added to the backup file once downloaded
     _save_to_file(backup_file, backup)
 
     print("Inventory from organisation %s with id %s saved!" %(org_name, org_id))
@@ -27,6 +27,7 @@ org_id = ""
 import mlib as mist_lib
 from mlib.__debug import Console
 from mlib import cli
+from mlib.container import Container
 from tabulate import tabulate
 import json
 import os.path
@@ -35,13 +36,17 @@ console = Console(6)
 
 
 #### CONSTANTS ####
-backup_file = "./org_inventory_file.json"
+# single file backup (see mlib.container)
+backup_file = "./org_inventory_file.mbk"
+# backup file of the former versions of org_inventory_backup.py
+legacy_backup_file = "./org_inventory_file.json"
 file_prefix = ".".join(backup_file.split(".")[:-1])
 backup_directory = "./backup/"
 
 #### GLOBAL VARS ####
 
-
+# container of the backup being checked, with the device images
+backup_container = None
 
 site_id_dict = {}
 map_id_dict = {}
@@ -166,7 +171,7 @@ def _clean_ids(data):
 ## restore
 def _restore_device_image(org_id, site_id, device_id, i):
     image_name = "%s_org_%s_device_%s_image_%s.png" %(file_prefix, org_id, device_id, i)    
-    if os.path.isfile(image_name):
+    if os.path.isfile(image_name) or (backup_container != None and "files/%s" % os.path.basename(image_name) in backup_container):
         console.info("Image %s will be restored to device %s" %(image_name, device_id))
         return True
     else:
@@ -273,12 +278,21 @@ def _go_to_backup_folder(source_org_name=None):
         print("Backup folder for organization %s not found. Please select a folder in the following list." %(source_org_name))
         _select_backup_folder(folders)
 
+## backup file
+def _load_backup():
+    # only the sections and the sites used by the precheck are decoded from the container
+    global backup_container
+    if not os.path.isfile(backup_file) and os.path.isfile(legacy_backup_file):
+        with open(legacy_backup_file) as f:
+            return json.load(f)
+    backup_container = Container(backup_file)
+    return {"org": backup_container.org()}
+
 def start_precheck(mist_session, org_id, org_name=None, source_org_name=None, site_name=None, in_backup_folder=False): 
     print(os.getcwd())  
     if not in_backup_folder: _go_to_backup_folder(source_org_name)
     #try:
-    with open(backup_file) as f:
-        backup = json.load(f)
+    backup = _load_backup()
     console.info("File %s loaded succesfully." %backup_file)
     _precheck(mist_session, org_id, backup["org"], site_name)
     #except:
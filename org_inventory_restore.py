@@ -26,6 +26,7 @@ org_id = ""
 import mlib as mist_lib
 from mlib.__debug import Console
 from mlib import cli
+from mlib.container import Container
 from tabulate import tabulate
 import json
 import os.path
@@ -33,12 +34,18 @@ console = Console(6)
 
 
 #### CONSTANTS ####
-backup_file = "./org_inventory_file.json"
+# single file backup (see mlib.container)
+backup_file = "./org_inventory_file.mbk"
+# backup file of the former versions of org_inventory_backup.py
+legacy_backup_file = "./org_inventory_file.json"
 file_prefix = ".".join(backup_file.split(".")[:-1])
 backup_directory = "./backup/"
 
 #### GLOBAL VARS ####
 
+# container of the backup being restored, from where the device images are extracted
+backup_container = None
+
 missing_ids = {
     "sites": [],
     "maps": [],
@@ -170,9 +177,25 @@ def _clean_ids(data):
         del data["created_time"]
     return data
 
+## backup file
+def _load_backup():
+    # only the sections and the sites used by the restore are decoded from the container
+    global backup_container
+    if not os.path.isfile(backup_file) and os.path.isfile(legacy_backup_file):
+        with open(legacy_backup_file) as f:
+            return json.load(f)
+    backup_container = Container(backup_file)
+    return {"org": backup_container.org()}
+
+def _backup_file(file_name):
+    # the images of a container backup are extracted when used
+    if backup_container != None and not os.path.isfile(file_name):
+        return backup_container.extract(file_name) or file_name
+    return file_name
+
 ## restore
 def _restore_device_image(mist_session, source_org_id, org_id, site_id, device_serial, device_id, i):
-    image_name = "%s_org_%s_device_%s_image_%s.png" %(file_prefix, source_org_id, device_serial, i)    
+    image_name = _backup_file("%s_org_%s_device_%s_image_%s.png" %(file_prefix, source_org_id, device_serial, i))
     if os.path.isfile(image_name):
         console.info("Image %s will be restored to device %s" %(image_name, device_serial))
         mist_lib.requests.sites.devices.add_image(mist_session, site_id, device_id, i, image_name)
@@ -386,9 +409,9 @@ def _check_org_name(org_name):
 def start_restore_inventory(mist_session, dest_org_id, dest_org_name, source_mist_session=None, source_org_name=None, source_org_id=None, sites_list=None, check_org_name=True, in_backup_folder=False, ap_mac=None):
     if check_org_name: _check_org_name(dest_org_name)
     if not in_backup_folder: _go_to_backup_folder(source_org_name)
+    backup = None
     try:
-        with open(backup_file) as f:
-            backup = json.load(f)
+        backup = _load_backup()
     except: 
         print("unable to load the file backup %s" %(backup_file))
     finally:
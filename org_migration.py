@@ -1,5 +1,6 @@
 import mlib as mist_lib
 from mlib import cli
+from mlib import profiling
 
 import org_conf_backup
 import org_conf_restore
@@ -46,17 +47,19 @@ def _print_new_step(message):
 
 
 
-def _select_org(mist_session=None, host=None):
-    mist_session = mist_lib.Mist_Session(host=host)    
+def _select_org(mist_session=None, host=None, adapter=None):
+    mist_session = mist_lib.Mist_Session(host=host, adapter=adapter)    
     org_id = cli.select_org(mist_session)[0]
     org_name = mist_lib.orgs.info.get(mist_session, org_id)["result"]["name"]
     return (mist_session, org_id, org_name)
 
 if __name__ == "__main__":
+    profiling.from_environment()
     _print_new_step("Please select the SOURCE organization")
     source_mist_session, source_org_id, source_org_name = _select_org()
     _print_new_step("Please select the DESTINATION organization")
-    dest_mist_session, dest_org_id, dest_org_name = _select_org()
+    # the destination session shares the connection pool of the source session
+    dest_mist_session, dest_org_id, dest_org_name = _select_org(adapter=source_mist_session.adapter)
 
     _backup_org(source_mist_session, source_org_id, source_org_name)
     _backup_inventory(source_mist_session, source_org_id, source_org_name, in_backup_folder=True)
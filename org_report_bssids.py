@@ -49,17 +49,17 @@ def bssids_from_sites(mist_session, sites, org_info, site_ids):
 
 def bssids_from_orgs(mist_session, org_ids, site_ids):
     for org_id in org_ids:
-        org_sites = list(filter(lambda privilege: "org_id" in privilege and privilege["org_id"] == org_id, mist_session.privileges))
+        site_privileges = mist_session.privileges.sites(org_id)
         # the admin only has access to the org information if he/she has this privilege 
-        if len(org_sites) >= 1 and org_sites[0]["scope"] == "org":
+        if mist_session.privileges.org(org_id) != None:
             org_info = mist_lib.requests.orgs.info.get(mist_session, org_id)["result"]
             org_sites = mist_lib.requests.orgs.sites.get(mist_session, org_id)["result"]
             bssids_from_sites(mist_session, org_sites, org_info, site_ids)        
         # if the admin doesn't have access to the org level, but only the sites
-        elif len(org_sites) >= 1:
+        elif len(site_privileges) >= 1:
             org_info = {
-                "name":org_sites[0]["org_name"],
-                "id":org_sites[0]["org_id"]
+                "name":site_privileges[0]["org_name"],
+                "id":site_privileges[0]["org_id"]
             }
             org_sites = []
             # get the sites information
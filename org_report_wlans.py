@@ -59,9 +59,9 @@ def wlans_from_sites(mist_session, sites, org_info, site_ids):
 
 def wlans_from_orgs(mist_session, org_ids, site_ids):
     for org_id in org_ids:
-        org_sites = list(filter(lambda privilege: "org_id" in privilege and privilege["org_id"] == org_id, mist_session.privileges))
+        site_privileges = mist_session.privileges.sites(org_id)
         # the admin only has access to the org information if he/she has this privilege 
-        if len(org_sites) >= 1 and org_sites[0]["scope"] == "org":
+        if mist_session.privileges.org(org_id) != None:
             org_info = mist_lib.requests.orgs.info.get(mist_session, org_id)["result"]
             org_sites = mist_lib.requests.orgs.sites.get(mist_session, org_id)["result"]
             org_wlans = mist_lib.requests.orgs.wlans.report(mist_session, org_id, fields)        
@@ -83,8 +83,8 @@ def wlans_from_orgs(mist_session, org_ids, site_ids):
             wlans_from_sites(mist_session, org_sites, org_info, site_ids)        
         else:
             org_info = {
-                "name":org_sites[0]["org_name"],
-                "id":org_sites[0]["org_id"]
+                "name":site_privileges[0]["org_name"],
+                "id":site_privileges[0]["org_id"]
             }
             org_sites = []
             for site_id in site_ids:
@@ -94,7 +94,7 @@ def wlans_from_orgs(mist_session, org_ids, site_ids):
 
 #### SCRIPT ENTRYPOINT ####
 
-mist = mist_lib.Mist_Session()
+mist = mist_lib.Mist_Session(memo_ttl=60)
 
 org_ids = cli.select_org(mist, allow_many=True)
 if len(org_ids) == 1:
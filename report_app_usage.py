@@ -1,6 +1,7 @@
 #### IMPORTS ####
 import mlib as mist_lib
 from mlib import cli
+from mlib import profiling
 from mlib.__debug import Console
 import csv
 import datetime
@@ -33,7 +34,8 @@ def _convert_numbers(size):
 
 def _generate_site_report(mist_session, site_name, site_id, start, stop, interval):
     app_usage = []
-    clients = _get_clients_list(mist_session, site_id)
+    with profiling.phase("listing"):
+        clients = _get_clients_list(mist_session, site_id)
     console.info("%s clients to process... Please wait..." %(len(clients)))
     for client in clients:
         client_mac = client["mac"]
@@ -56,7 +58,7 @@ def _save_report(app_usage):
         for key in row:
             if not key in fields: fields.append(key)
 
-    with open(csv_file, 'w') as output_file:
+    with profiling.phase("file I/O"), open(csv_file, 'w') as output_file:
         dict_writer = csv.DictWriter(output_file, restval="-", fieldnames=fields, delimiter=csv_delimiter)
         dict_writer.writeheader()
         dict_writer.writerows(app_usage)
@@ -67,10 +69,12 @@ def generate_report(mist_session, site_ids, time):
     if type(site_ids) == str:
         site_ids = [ site_ids]
     for site_id in site_ids:
-        site_name = _get_site_name(mist_session, site_id)
-        console.info("Processing site %s (id %s)" %(site_name, site_id))
-        app_usage += _generate_site_report(mist_session, site_name, site_id, time["start"], time["stop"], time["interval"])
-    cli.show(app_usage)
+        with profiling.phase("site"):
+            site_name = _get_site_name(mist_session, site_id)
+            console.info("Processing site %s (id %s)" %(site_name, site_id))
+            app_usage += _generate_site_report(mist_session, site_name, site_id, time["start"], time["stop"], time["interval"])
+    with profiling.phase("display"):
+        cli.show(app_usage)
     _save_report(app_usage)
 
 def _ask_period(hours):
@@ -82,6 +86,7 @@ def _ask_period(hours):
 
 
 if __name__ == "__main__":
+    profiling.from_environment()
     mist_session = mist_lib.Mist_Session()
     site_id = cli.select_site(mist_session, allow_many=True)
     time = _ask_period(hours_to_report)
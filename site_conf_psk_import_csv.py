@@ -11,10 +11,12 @@ pskName2,pskValue2,Wlan2
 '''
 #### PARAMETERS #####
 csv_separator = ","
+bulk_workers = 10
 
 #### IMPORTS #####
 import mlib as mist_lib
 from mlib import cli
+from mlib import bulk
 from tabulate import tabulate
 import sys
 import csv
@@ -26,12 +28,16 @@ def import_psk(site_id, psks):
     print("")
     print("________________________________________")
     print("Starting PSKs import for site %s" %(site_id))
+    operations = []
     for psk in psks:     
         print('PSK %s' %(psk["username"]))
         pskObj = mist_lib.models.sites.psks.Psk()
         pskObj.define(name=psk["username"], passphrase=psk["passphrase"], ssid=psk["ssid"])
-        mist_lib.requests.sites.psks.create(mist, site_id, pskObj.toJSON())
-        print(pskObj.toJSON())
+        operations.append((mist_lib.requests.sites.psks, "create", (site_id, pskObj.toJSON())))
+    report = bulk.execute(mist, operations, workers=bulk_workers)
+    print(report)
+    for result in report.failed:
+        print("Unable to create PSK %s: %s" %(result.args[1]["name"], result.error))
 
 def read_csv(csv_file): 
     print("")   